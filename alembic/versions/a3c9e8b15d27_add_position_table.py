@@ -0,0 +1,86 @@
+"""Add position table
+
+Revision ID: a3c9e8b15d27
+Revises: f2a7d4c81e65
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+from meshtastic.protobuf.mesh_pb2 import MeshPacket, Position
+from meshtastic.protobuf.portnums_pb2 import PortNum
+from meshview.decode_payload import position_fix
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c9e8b15d27"
+down_revision: str | None = "f2a7d4c81e65"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+BACKFILL_CHUNK = 5000
+
+
+def upgrade() -> None:
+    position = op.create_table(
+        "position",
+        sa.Column("packet_id", sa.BigInteger(), primary_key=True),
+        sa.Column("node_id", sa.BigInteger(), nullable=False),
+        sa.Column("time_us", sa.BigInteger(), nullable=False),
+        sa.Column("latitude_i", sa.Integer(), nullable=False),
+        sa.Column("longitude_i", sa.Integer(), nullable=False),
+        sa.Column("altitude", sa.Integer(), nullable=True),
+        sa.Column("precision_bits", sa.Integer(), nullable=True),
+        sa.Column("sats_in_view", sa.Integer(), nullable=True),
+    )
+
+    # Decode the position packets already stored, oldest first in id chunks
+    conn = op.get_bind()
+    last_id = None
+    while True:
+        query = sa.text(
+            "SELECT id, from_node_id, import_time_us, payload FROM packet "
+            "WHERE portnum = :portnum"
+            + ("" if last_id is None else " AND id > :last_id")
+            + " ORDER BY id LIMIT :limit"
+        )
+        params = {"portnum": PortNum.POSITION_APP, "limit": BACKFILL_CHUNK}
+        if last_id is not None:
+            params["last_id"] = last_id
+        packets = conn.execute(query, params).fetchall()
+        if not packets:
+            break
+        last_id = packets[-1].id
+
+        rows = []
+        for packet in packets:
+            if packet.from_node_id is None or packet.import_time_us is None:
+                continue
+            try:
+                mesh_packet = MeshPacket.FromString(packet.payload)
+                fix = position_fix(Position.FromString(mesh_packet.decoded.payload))
+            except Exception:
+                continue
+            if fix:
+                rows.append(
+                    {
+                        "packet_id": packet.id,
+                        "node_id": packet.from_node_id,
+                        "time_us": packet.import_time_us,
+                        **fix,
+                    }
+                )
+        if rows:
+            op.bulk_insert(position, rows)
+
+    op.create_index("idx_position_node_time_us", "position", ["node_id", "time_us"], unique=False)
+    op.create_index("idx_position_time_us", "position", ["time_us"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("idx_position_time_us", table_name="position")
+    op.drop_index("idx_position_node_time_us", table_name="position")
+    op.drop_table("position")
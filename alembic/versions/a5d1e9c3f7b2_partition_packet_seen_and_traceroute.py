@@ -0,0 +1,166 @@
+"""Partition packet_seen and traceroute by day on PostgreSQL
+
+Revision ID: a5d1e9c3f7b2
+Revises: f3c8a6e1d4b9
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+import datetime
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a5d1e9c3f7b2"
+down_revision: str | None = "f3c8a6e1d4b9"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Both tables are partitioned on import_time_us. PostgreSQL requires the partition
+# key in every primary key, so it joins both; ingest checks packet_seen for repeated
+# receptions itself. table -> (original primary key, partitioned primary key)
+KEY = "import_time_us"
+PARTITIONED = {
+    "packet_seen": (
+        ("packet_id", "node_id", "rx_time"),
+        ("packet_id", "node_id", "rx_time", KEY),
+    ),
+    "traceroute": (("id",), ("id", KEY)),
+}
+
+
+def _owned_sequences(conn, table):
+    """(sequence, column) for the serial columns of ``table``."""
+    result = conn.execute(
+        sa.text(
+            "SELECT s.relname, a.attname FROM pg_depend d "
+            "JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S' "
+            "JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid "
+            "WHERE d.refobjid = CAST(:table AS regclass) AND d.deptype = 'a'"
+        ),
+        {"table": table},
+    )
+    return result.all()
+
+
+def upgrade() -> None:
+    # SQLite has no table partitioning; retention there stays a batched DELETE
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql":
+        return
+
+    # The existing rows stay where they are, in a partition covering everything
+    # before tomorrow; daily partitions are created from tomorrow on by startdb.py.
+    cutover_day = datetime.datetime.now(datetime.UTC).date() + datetime.timedelta(days=1)
+    cutover = datetime.datetime.combine(cutover_day, datetime.time.min, tzinfo=datetime.UTC)
+
+    inspector = sa.inspect(conn)
+    high = int(cutover.timestamp()) * 1_000_000
+    for table, (_, primary_key) in PARTITIONED.items():
+        legacy = f"{table}_before{cutover_day:%Y%m%d}"
+        indexes = inspector.get_indexes(table)
+        pk = inspector.get_pk_constraint(table)
+        foreign_keys = inspector.get_foreign_keys(table)
+        sequences = _owned_sequences(conn, table)
+
+        # The existing table becomes a partition as-is, so nothing is copied. Its
+        # index names move aside for the partitioned table's indexes.
+        op.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        for index in indexes:
+            op.execute(f"ALTER INDEX {index['name']} RENAME TO {index['name']}_legacy")
+
+        # Rows from before import_time_us was recorded take their packet's time, or
+        # 0 (expired at the next cleanup) if that is gone too.
+        op.execute(
+            f"UPDATE {legacy} SET {KEY} = COALESCE("
+            f"(SELECT p.import_time_us FROM packet p WHERE p.id = {legacy}.packet_id), 0) "
+            f"WHERE {KEY} IS NULL"
+        )
+        if pk["name"]:
+            op.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {pk['name']}")
+        op.execute(
+            f"ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_pkey "
+            f"PRIMARY KEY ({', '.join(primary_key)})"
+        )
+
+        op.execute(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ({KEY})"
+        )
+        op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({', '.join(primary_key)})")
+        # Serial ids must outlive the old table, which retention drops eventually
+        for sequence, column in sequences:
+            op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{column}")
+        for fk in foreign_keys:
+            op.execute(
+                f"ALTER TABLE {table} ADD FOREIGN KEY ({', '.join(fk['constrained_columns'])}) "
+                f"REFERENCES {fk['referred_table']} ({', '.join(fk['referred_columns'])})"
+            )
+        for index in indexes:
+            unique = "UNIQUE " if index["unique"] else ""
+            op.execute(
+                f"CREATE {unique}INDEX {index['name']} ON {table} "
+                f"({', '.join(index['column_names'])})"
+            )
+
+        # DEFAULT only catches rows outside every partition (gateway clocks far
+        # ahead), so creating a daily partition has little of it to scan.
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+        op.execute(
+            f"WITH moved AS (DELETE FROM {legacy} WHERE {KEY} >= {high} RETURNING *) "
+            f"INSERT INTO {table} SELECT * FROM moved"
+        )
+
+        # A constraint matching the partition bound lets ATTACH skip its own scan.
+        # Matching indexes on the old table are attached rather than rebuilt.
+        op.execute(
+            f"ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_bound "
+            f"CHECK ({KEY} IS NOT NULL AND {KEY} < {high})"
+        )
+        op.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ({high})"
+        )
+        op.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {legacy}_bound")
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql":
+        return
+
+    inspector = sa.inspect(conn)
+    for table, (primary_key, _) in PARTITIONED.items():
+        index_names = [index["name"] for index in inspector.get_indexes(table)]
+        partitions = (
+            conn.execute(
+                sa.text(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "WHERE i.inhparent = CAST(:table AS regclass)"
+                ),
+                {"table": table},
+            )
+            .scalars()
+            .all()
+        )
+        legacy = next(name for name in partitions if name.startswith(f"{table}_before"))
+
+        # Fold the other partitions back into the original table
+        for sequence, column in _owned_sequences(conn, table):
+            op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {legacy}.{column}")
+        op.execute(f"ALTER TABLE {table} DETACH PARTITION {legacy}")
+        for partition in partitions:
+            if partition != legacy:
+                op.execute(f"INSERT INTO {legacy} SELECT * FROM {partition}")
+        op.execute(f"DROP TABLE {table}")
+
+        op.execute(f"ALTER TABLE {legacy} RENAME TO {table}")
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {legacy}_pkey")
+        op.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey "
+            f"PRIMARY KEY ({', '.join(primary_key)})"
+        )
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {KEY} DROP NOT NULL")
+        for name in index_names:
+            op.execute(f"ALTER INDEX IF EXISTS {name}_legacy RENAME TO {name}")
@@ -0,0 +1,139 @@
+"""Add edge table
+
+Revision ID: b8d2f5e4a913
+Revises: a3c9e8b15d27
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+from meshtastic.protobuf.mesh_pb2 import MeshPacket, NeighborInfo, RouteDiscovery
+from meshtastic.protobuf.portnums_pb2 import PortNum
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d2f5e4a913"
+down_revision: str | None = "a3c9e8b15d27"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+BACKFILL_CHUNK = 5000
+
+
+def _add_edge(edges, from_node_id, to_node_id, edge_type, snr, seen_us):
+    key = (from_node_id, to_node_id, edge_type)
+    edge = edges.get(key)
+    if edge is None:
+        edges[key] = {
+            "from_node_id": from_node_id,
+            "to_node_id": to_node_id,
+            "type": edge_type,
+            "first_seen_us": seen_us,
+            "last_seen_us": seen_us,
+            "count": 1,
+            "last_snr": snr,
+        }
+        return
+    edge["count"] += 1
+    edge["first_seen_us"] = min(edge["first_seen_us"], seen_us)
+    if seen_us >= edge["last_seen_us"]:
+        edge["last_seen_us"] = seen_us
+        if snr is not None:
+            edge["last_snr"] = snr
+
+
+def _chunks(conn, query, params):
+    """Yield rows of ``query`` in id order, BACKFILL_CHUNK at a time."""
+    last_id = None
+    while True:
+        chunk_params = {**params, "limit": BACKFILL_CHUNK, "last_id": last_id or 0}
+        rows = conn.execute(sa.text(query), chunk_params).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield from rows
+
+
+def upgrade() -> None:
+    edge = op.create_table(
+        "edge",
+        sa.Column("from_node_id", sa.BigInteger(), primary_key=True),
+        sa.Column("to_node_id", sa.BigInteger(), primary_key=True),
+        sa.Column("type", sa.String(), primary_key=True),
+        sa.Column("first_seen_us", sa.BigInteger(), nullable=False),
+        sa.Column("last_seen_us", sa.BigInteger(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("last_snr", sa.Float(), nullable=True),
+    )
+
+    # Rebuild edges from the stored traceroutes and NEIGHBORINFO packets, counting
+    # them the way ingest does: a route's hops once per packet, plus the final hop
+    # to each gateway that uplinked an unfinished route.
+    conn = op.get_bind()
+    edges = {}
+    counted_packets = set()
+    for tr in _chunks(
+        conn,
+        "SELECT t.id, t.packet_id, t.gateway_node_id, t.done, t.route, t.import_time_us, "
+        "p.from_node_id, p.to_node_id FROM traceroute t JOIN packet p ON p.id = t.packet_id "
+        "WHERE t.id > :last_id ORDER BY t.id LIMIT :limit",
+        {},
+    ):
+        if tr.import_time_us is None:
+            continue
+        try:
+            route = RouteDiscovery.FromString(tr.route or b"")
+        except Exception:
+            continue
+        path = [tr.from_node_id, *route.route]
+        path.append(tr.to_node_id if tr.done else tr.gateway_node_id)
+        hops = list(enumerate(zip(path, path[1:], strict=False)))
+        if tr.packet_id in counted_packets:
+            hops = hops[-1:] if not tr.done else []
+        counted_packets.add(tr.packet_id)
+        for hop, (a, b) in hops:
+            if a is None or b is None:
+                continue
+            snr = None
+            if not tr.done and hop < len(route.snr_towards) and route.snr_towards[hop] != -128:
+                snr = route.snr_towards[hop] / 4
+            _add_edge(edges, a, b, "traceroute", snr, tr.import_time_us)
+
+    for packet in _chunks(
+        conn,
+        "SELECT id, from_node_id, import_time_us, payload FROM packet "
+        "WHERE portnum = :portnum AND id > :last_id ORDER BY id LIMIT :limit",
+        {"portnum": PortNum.NEIGHBORINFO_APP},
+    ):
+        if packet.from_node_id is None or packet.import_time_us is None:
+            continue
+        try:
+            mesh_packet = MeshPacket.FromString(packet.payload)
+            neighbor_info = NeighborInfo.FromString(mesh_packet.decoded.payload)
+        except Exception:
+            continue
+        for neighbor in neighbor_info.neighbors:
+            _add_edge(
+                edges,
+                neighbor.node_id,
+                packet.from_node_id,
+                "neighbor",
+                neighbor.snr,
+                packet.import_time_us,
+            )
+
+    rows = list(edges.values())
+    for start in range(0, len(rows), BACKFILL_CHUNK):
+        op.bulk_insert(edge, rows[start : start + BACKFILL_CHUNK])
+
+    op.create_index("idx_edge_last_seen_us", "edge", ["last_seen_us"], unique=False)
+    op.create_index("idx_edge_to_node_id", "edge", ["to_node_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("idx_edge_to_node_id", table_name="edge")
+    op.drop_index("idx_edge_last_seen_us", table_name="edge")
+    op.drop_table("edge")
@@ -0,0 +1,102 @@
+"""Add text_message table with search index
+
+Revision ID: c4e7a2d9f138
+Revises: b8d2f5e4a913
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+from meshtastic.protobuf.mesh_pb2 import MeshPacket
+from meshtastic.protobuf.portnums_pb2 import PortNum
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e7a2d9f138"
+down_revision: str | None = "b8d2f5e4a913"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+BACKFILL_CHUNK = 5000
+
+
+def upgrade() -> None:
+    text_message = op.create_table(
+        "text_message",
+        sa.Column("packet_id", sa.BigInteger(), primary_key=True),
+        sa.Column("time_us", sa.BigInteger(), nullable=False),
+        sa.Column("text", sa.String(), nullable=False),
+    )
+
+    # Decode the text messages already stored, oldest first in id chunks
+    conn = op.get_bind()
+    last_id = None
+    while True:
+        query = sa.text(
+            "SELECT id, import_time_us, payload FROM packet "
+            "WHERE portnum = :portnum"
+            + ("" if last_id is None else " AND id > :last_id")
+            + " ORDER BY id LIMIT :limit"
+        )
+        params = {"portnum": PortNum.TEXT_MESSAGE_APP, "limit": BACKFILL_CHUNK}
+        if last_id is not None:
+            params["last_id"] = last_id
+        packets = conn.execute(query, params).fetchall()
+        if not packets:
+            break
+        last_id = packets[-1].id
+
+        rows = []
+        for packet in packets:
+            if packet.import_time_us is None:
+                continue
+            try:
+                text = MeshPacket.FromString(packet.payload).decoded.payload.decode("utf-8")
+            except Exception:
+                continue
+            if text:
+                rows.append(
+                    {"packet_id": packet.id, "time_us": packet.import_time_us, "text": text}
+                )
+        if rows:
+            op.bulk_insert(text_message, rows)
+
+    op.create_index("idx_text_message_time_us", "text_message", ["time_us"], unique=False)
+
+    if conn.dialect.name == "sqlite":
+        # External-content FTS5 table over text_message; the trigram tokenizer
+        # answers case-insensitive substring queries.
+        op.execute(
+            "CREATE VIRTUAL TABLE text_message_fts USING fts5("
+            "text, content='text_message', content_rowid='packet_id', tokenize='trigram')"
+        )
+        op.execute("INSERT INTO text_message_fts(text_message_fts) VALUES ('rebuild')")
+        op.execute(
+            "CREATE TRIGGER text_message_ai AFTER INSERT ON text_message BEGIN "
+            "INSERT INTO text_message_fts(rowid, text) VALUES (new.packet_id, new.text); END"
+        )
+        op.execute(
+            "CREATE TRIGGER text_message_ad AFTER DELETE ON text_message BEGIN "
+            "INSERT INTO text_message_fts(text_message_fts, rowid, text) "
+            "VALUES ('delete', old.packet_id, old.text); END"
+        )
+    elif conn.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX idx_text_message_text_trgm ON text_message USING gin (text gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if conn.dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS text_message_ad")
+        op.execute("DROP TRIGGER IF EXISTS text_message_ai")
+        op.execute("DROP TABLE IF EXISTS text_message_fts")
+    elif conn.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS idx_text_message_text_trgm")
+    op.drop_index("idx_text_message_time_us", table_name="text_message")
+    op.drop_table("text_message")
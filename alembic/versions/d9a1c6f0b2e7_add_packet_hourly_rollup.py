@@ -0,0 +1,63 @@
+"""Add packet_hourly rollup table
+
+Revision ID: d9a1c6f0b2e7
+Revises: c4e7a2d9f138
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d9a1c6f0b2e7"
+down_revision: str | None = "c4e7a2d9f138"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "packet_hourly",
+        sa.Column("hour_us", sa.BigInteger(), primary_key=True),
+        sa.Column("channel", sa.String(), primary_key=True),
+        sa.Column("portnum", sa.Integer(), primary_key=True),
+        sa.Column("from_node_id", sa.BigInteger(), primary_key=True),
+        sa.Column("packets", sa.Integer(), nullable=False),
+        sa.Column("seen", sa.Integer(), nullable=False),
+    )
+
+    # Roll up the stored packets in one pass; receptions count in their packet's hour
+    op.execute(
+        """
+        INSERT INTO packet_hourly (hour_us, channel, portnum, from_node_id, packets, seen)
+        SELECT
+            p.import_time_us - p.import_time_us % 3600000000,
+            COALESCE(p.channel, ''),
+            COALESCE(p.portnum, 0),
+            COALESCE(p.from_node_id, 0),
+            COUNT(*),
+            COALESCE(SUM(s.seen), 0)
+        FROM packet p
+        LEFT JOIN (
+            SELECT packet_id, COUNT(*) AS seen FROM packet_seen GROUP BY packet_id
+        ) s ON s.packet_id = p.id
+        WHERE p.import_time_us IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+        """
+    )
+
+    op.create_index(
+        "idx_packet_hourly_from_node_hour_us",
+        "packet_hourly",
+        ["from_node_id", "hour_us"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_packet_hourly_from_node_hour_us", table_name="packet_hourly")
+    op.drop_table("packet_hourly")
@@ -0,0 +1,65 @@
+"""Add unique (node_id, public_key) index to node_public_key
+
+Revision ID: e5f1c2a9b7d3
+Revises: 23dad03d2e42
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5f1c2a9b7d3"
+down_revision: str | None = "23dad03d2e42"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # Fold duplicate (node_id, public_key) rows into the oldest one, keeping the
+    # widest first/last seen range, so the unique index can be created.
+    conn.execute(
+        sa.text("""
+            UPDATE node_public_key
+            SET first_seen_us = (
+                    SELECT MIN(k.first_seen_us) FROM node_public_key k
+                    WHERE k.node_id = node_public_key.node_id
+                      AND k.public_key = node_public_key.public_key
+                ),
+                last_seen_us = (
+                    SELECT MAX(k.last_seen_us) FROM node_public_key k
+                    WHERE k.node_id = node_public_key.node_id
+                      AND k.public_key = node_public_key.public_key
+                )
+            WHERE id IN (
+                SELECT MIN(id) FROM node_public_key
+                GROUP BY node_id, public_key
+                HAVING COUNT(*) > 1
+            )
+        """)
+    )
+    conn.execute(
+        sa.text("""
+            DELETE FROM node_public_key
+            WHERE id NOT IN (
+                SELECT MIN(id) FROM node_public_key GROUP BY node_id, public_key
+            )
+        """)
+    )
+
+    op.create_index(
+        "idx_node_public_key_node_id_public_key",
+        "node_public_key",
+        ["node_id", "public_key"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_node_public_key_node_id_public_key", table_name="node_public_key")
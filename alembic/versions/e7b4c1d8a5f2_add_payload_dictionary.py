@@ -0,0 +1,36 @@
+"""Add payload_dictionary table
+
+Revision ID: e7b4c1d8a5f2
+Revises: d9a1c6f0b2e7
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e7b4c1d8a5f2"
+down_revision: str | None = "d9a1c6f0b2e7"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Existing packet payloads are rewritten in the new format by startdb.py while it
+    # runs ([ingest] rewrite_payloads), not here, so upgrading stays quick.
+    op.create_table(
+        "payload_dictionary",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("created_us", sa.BigInteger(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    # Rows already written in the compact format stay that way; older code can't
+    # read them, so rewrite with payload_format = full before downgrading.
+    op.drop_table("payload_dictionary")
@@ -0,0 +1,90 @@
+"""Add telemetry table
+
+Revision ID: f2a7d4c81e65
+Revises: e5f1c2a9b7d3
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+from meshtastic.protobuf.mesh_pb2 import MeshPacket
+from meshtastic.protobuf.portnums_pb2 import PortNum
+from meshtastic.protobuf.telemetry_pb2 import Telemetry
+from meshview.decode_payload import telemetry_metrics
+
+# revision identifiers, used by Alembic.
+revision: str = "f2a7d4c81e65"
+down_revision: str | None = "e5f1c2a9b7d3"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+BACKFILL_CHUNK = 5000
+
+
+def upgrade() -> None:
+    telemetry = op.create_table(
+        "telemetry",
+        sa.Column("packet_id", sa.BigInteger(), primary_key=True),
+        sa.Column("metric", sa.String(), primary_key=True),
+        sa.Column("node_id", sa.BigInteger(), nullable=False),
+        sa.Column("time_us", sa.BigInteger(), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+    )
+
+    # Decode the telemetry packets already stored, oldest first in id chunks
+    conn = op.get_bind()
+    last_id = None
+    while True:
+        query = sa.text(
+            "SELECT id, from_node_id, import_time_us, payload FROM packet "
+            "WHERE portnum = :portnum"
+            + ("" if last_id is None else " AND id > :last_id")
+            + " ORDER BY id LIMIT :limit"
+        )
+        params = {"portnum": PortNum.TELEMETRY_APP, "limit": BACKFILL_CHUNK}
+        if last_id is not None:
+            params["last_id"] = last_id
+        packets = conn.execute(query, params).fetchall()
+        if not packets:
+            break
+        last_id = packets[-1].id
+
+        rows = []
+        for packet in packets:
+            if packet.from_node_id is None or packet.import_time_us is None:
+                continue
+            try:
+                mesh_packet = MeshPacket.FromString(packet.payload)
+                metrics = telemetry_metrics(Telemetry.FromString(mesh_packet.decoded.payload))
+            except Exception:
+                continue
+            rows.extend(
+                {
+                    "packet_id": packet.id,
+                    "metric": metric,
+                    "node_id": packet.from_node_id,
+                    "time_us": packet.import_time_us,
+                    "value": value,
+                }
+                for metric, value in metrics
+            )
+        if rows:
+            op.bulk_insert(telemetry, rows)
+
+    op.create_index(
+        "idx_telemetry_node_metric_time_us",
+        "telemetry",
+        ["node_id", "metric", "time_us"],
+        unique=False,
+    )
+    op.create_index("idx_telemetry_time_us", "telemetry", ["time_us"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("idx_telemetry_time_us", table_name="telemetry")
+    op.drop_index("idx_telemetry_node_metric_time_us", table_name="telemetry")
+    op.drop_table("telemetry")
@@ -0,0 +1,170 @@
+"""Intern channel and topic names
+
+Revision ID: f3c8a6e1d4b9
+Revises: e7b4c1d8a5f2
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f3c8a6e1d4b9"
+down_revision: str | None = "e7b4c1d8a5f2"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+BACKFILL_CHUNK = 5000
+
+CHANNEL_ID = "(SELECT c.id FROM channel c WHERE c.name = {table}.channel)"
+TOPIC_ID = "(SELECT t.id FROM topic t WHERE t.name = packet_seen.topic)"
+CHANNEL_NAME = "(SELECT c.name FROM channel c WHERE c.id = {table}.channel_id)"
+TOPIC_NAME = "(SELECT t.name FROM topic t WHERE t.id = packet_seen.topic_id)"
+
+
+def _packet_hourly_columns(channel_column):
+    return (
+        sa.Column("hour_us", sa.BigInteger(), primary_key=True),
+        channel_column,
+        sa.Column("portnum", sa.Integer(), primary_key=True),
+        sa.Column("from_node_id", sa.BigInteger(), primary_key=True),
+        sa.Column("packets", sa.Integer(), nullable=False),
+        sa.Column("seen", sa.Integer(), nullable=False),
+    )
+
+
+# Same rollup as d9a1c6f0b2e7, keyed by the given channel expression
+PACKET_HOURLY_ROLLUP = """
+    INSERT INTO packet_hourly (hour_us, {column}, portnum, from_node_id, packets, seen)
+    SELECT
+        p.import_time_us - p.import_time_us % 3600000000,
+        {value},
+        COALESCE(p.portnum, 0),
+        COALESCE(p.from_node_id, 0),
+        COUNT(*),
+        COALESCE(SUM(s.seen), 0)
+    FROM packet p
+    LEFT JOIN (
+        SELECT packet_id, COUNT(*) AS seen FROM packet_seen GROUP BY packet_id
+    ) s ON s.packet_id = p.id
+    WHERE p.import_time_us IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+"""
+
+
+def _backfill(packet_sql, packet_seen_sql, leftover_sql):
+    """Run the per-chunk updates over packet ids, then ``leftover_sql`` once for
+    packet_seen rows whose packet is gone."""
+    conn = op.get_bind()
+    last_id = None
+    while True:
+        query = sa.text(
+            "SELECT id FROM packet"
+            + ("" if last_id is None else " WHERE id > :last_id")
+            + " ORDER BY id LIMIT :limit"
+        )
+        params = {"limit": BACKFILL_CHUNK}
+        if last_id is not None:
+            params["last_id"] = last_id
+        ids = conn.execute(query, params).scalars().all()
+        if not ids:
+            break
+        chunk = {"first_id": ids[0], "last_id": ids[-1]}
+        conn.execute(sa.text(packet_sql + " WHERE id BETWEEN :first_id AND :last_id"), chunk)
+        conn.execute(
+            sa.text(packet_seen_sql + " WHERE packet_id BETWEEN :first_id AND :last_id"), chunk
+        )
+        last_id = ids[-1]
+    conn.execute(sa.text(leftover_sql))
+
+
+def upgrade() -> None:
+    for table in ("channel", "topic"):
+        op.create_table(
+            table,
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("name", sa.String(), nullable=False, unique=True),
+        )
+
+    op.execute(
+        "INSERT INTO channel (name) "
+        "SELECT channel FROM packet WHERE channel IS NOT NULL "
+        "UNION SELECT channel FROM packet_seen WHERE channel IS NOT NULL"
+    )
+    op.execute(
+        "INSERT INTO topic (name) SELECT DISTINCT topic FROM packet_seen WHERE topic IS NOT NULL"
+    )
+
+    op.add_column("packet", sa.Column("channel_id", sa.Integer(), nullable=True))
+    op.add_column("packet_seen", sa.Column("channel_id", sa.Integer(), nullable=True))
+    op.add_column("packet_seen", sa.Column("topic_id", sa.Integer(), nullable=True))
+
+    seen_set = (
+        f"UPDATE packet_seen SET channel_id = {CHANNEL_ID.format(table='packet_seen')}, "
+        f"topic_id = {TOPIC_ID}"
+    )
+    _backfill(
+        f"UPDATE packet SET channel_id = {CHANNEL_ID.format(table='packet')}",
+        seen_set,
+        seen_set + " WHERE packet_id NOT IN (SELECT id FROM packet)",
+    )
+
+    # The rollup is derived from packet, so rebuild it keyed by channel id
+    op.drop_index("idx_packet_hourly_from_node_hour_us", table_name="packet_hourly")
+    op.drop_table("packet_hourly")
+    op.create_table(
+        "packet_hourly",
+        *_packet_hourly_columns(sa.Column("channel_id", sa.Integer(), primary_key=True)),
+    )
+    op.execute(PACKET_HOURLY_ROLLUP.format(column="channel_id", value="COALESCE(p.channel_id, 0)"))
+    op.create_index(
+        "idx_packet_hourly_from_node_hour_us",
+        "packet_hourly",
+        ["from_node_id", "hour_us"],
+        unique=False,
+    )
+
+    # No indexes cover these columns, so SQLite (3.35+) drops them in place
+    op.drop_column("packet_seen", "topic")
+    op.drop_column("packet_seen", "channel")
+    op.drop_column("packet", "channel")
+
+
+def downgrade() -> None:
+    op.add_column("packet", sa.Column("channel", sa.String(), nullable=True))
+    op.add_column("packet_seen", sa.Column("channel", sa.String(), nullable=True))
+    op.add_column("packet_seen", sa.Column("topic", sa.String(), nullable=True))
+
+    seen_set = (
+        f"UPDATE packet_seen SET channel = {CHANNEL_NAME.format(table='packet_seen')}, "
+        f"topic = {TOPIC_NAME}"
+    )
+    _backfill(
+        f"UPDATE packet SET channel = {CHANNEL_NAME.format(table='packet')}",
+        seen_set,
+        seen_set + " WHERE packet_id NOT IN (SELECT id FROM packet)",
+    )
+
+    op.drop_index("idx_packet_hourly_from_node_hour_us", table_name="packet_hourly")
+    op.drop_table("packet_hourly")
+    op.create_table(
+        "packet_hourly",
+        *_packet_hourly_columns(sa.Column("channel", sa.String(), primary_key=True)),
+    )
+    op.execute(PACKET_HOURLY_ROLLUP.format(column="channel", value="COALESCE(p.channel, '')"))
+    op.create_index(
+        "idx_packet_hourly_from_node_hour_us",
+        "packet_hourly",
+        ["from_node_id", "hour_us"],
+        unique=False,
+    )
+
+    op.drop_column("packet_seen", "topic_id")
+    op.drop_column("packet_seen", "channel_id")
+    op.drop_column("packet", "channel_id")
+    op.drop_table("topic")
+    op.drop_table("channel")
@@ -0,0 +1,74 @@
+"""Raw MQTT capture files for offline load testing and replay.
+
+A capture is a sequence of records, each a fixed header followed by the topic and
+the undecoded MQTT payload::
+
+    <f64 receive time> <u16 topic length> <u32 payload length> topic payload
+
+Records are written exactly as received, before any parsing or decryption, so a
+replay exercises the same code path as live traffic.
+"""
+
+import logging
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("<dHI")
+FLUSH_INTERVAL = 1.0  # seconds
+
+
+class CaptureWriter:
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._file = open(path, "ab")
+        self._last_flush = time.monotonic()
+
+    def write(self, topic, payload, recv_time=None):
+        topic_bytes = topic.encode("utf-8")
+        self._file.write(
+            HEADER.pack(
+                time.time() if recv_time is None else recv_time, len(topic_bytes), len(payload)
+            )
+        )
+        self._file.write(topic_bytes)
+        self._file.write(payload)
+        self.records += 1
+
+        now = time.monotonic()
+        if now - self._last_flush >= FLUSH_INTERVAL:
+            self._file.flush()
+            self._last_flush = now
+
+    def close(self):
+        self._file.close()
+
+
+async def capture_messages(messages, path):
+    """Pass (topic, payload) pairs through unchanged, recording each one to ``path``."""
+    writer = CaptureWriter(path)
+    logger.info(f"Capturing raw MQTT messages to {path}")
+    try:
+        async for topic, payload in messages:
+            writer.write(topic, payload)
+            yield topic, payload
+    finally:
+        writer.close()
+        logger.info(f"Closed capture {path} after {writer.records} messages")
+
+
+def read_capture(path):
+    """Yield (receive time, topic, payload) for every complete record in ``path``."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            recv_time, topic_length, payload_length = HEADER.unpack(header)
+            body = f.read(topic_length + payload_length)
+            if len(body) < topic_length + payload_length:
+                logger.warning(f"Ignoring truncated record at the end of {path}")
+                return
+            yield recv_time, body[:topic_length].decode("utf-8"), body[topic_length:]
@@ -1,7 +1,9 @@
+import math
+
+from google.protobuf.descriptor import FieldDescriptor
 from google.protobuf.message import DecodeError
 
 from meshtastic.protobuf.mesh_pb2 import (
-    MeshPacket,
     NeighborInfo,
     Position,
     RouteDiscovery,
@@ -11,6 +13,7 @@ from meshtastic.protobuf.mesh_pb2 import (
 from meshtastic.protobuf.mqtt_pb2 import MapReport
 from meshtastic.protobuf.portnums_pb2 import PortNum
 from meshtastic.protobuf.telemetry_pb2 import Telemetry
+from meshview import payload_codec
 
 
 def text_message(payload):
@@ -29,6 +32,45 @@ DECODE_MAP = {
 }
 
 
+# Telemetry variants stored in the telemetry table, and the metric name prefix used
+# for each ("device.battery_level", "environment.temperature", ...).
+TELEMETRY_GROUPS = {
+    "device_metrics": "device",
+    "environment_metrics": "environment",
+    "power_metrics": "power",
+    "air_quality_metrics": "air_quality",
+}
+
+
+def telemetry_metrics(telemetry):
+    """Flatten a Telemetry message into (metric, value) pairs for the fields it sets."""
+    variant = telemetry.WhichOneof("variant")
+    group = TELEMETRY_GROUPS.get(variant)
+    if group is None:
+        return []
+    metrics = []
+    for field, value in getattr(telemetry, variant).ListFields():
+        if field.type == FieldDescriptor.TYPE_FLOAT:
+            # Round away float32 noise (4.1 arrives as 4.099999904632568)
+            value = float(f"{value:.7g}")
+        if math.isfinite(value):
+            metrics.append((f"{group}.{field.name}", float(value)))
+    return metrics
+
+
+def position_fix(position):
+    """Return the stored columns of a Position message, or None when it has no fix."""
+    if not position.latitude_i or not position.longitude_i:
+        return None
+    return {
+        "latitude_i": position.latitude_i,
+        "longitude_i": position.longitude_i,
+        "altitude": position.altitude if position.HasField("altitude") else None,
+        "precision_bits": position.precision_bits or None,
+        "sats_in_view": position.sats_in_view or None,
+    }
+
+
 def decode_payload(portnum, payload):
     if portnum not in DECODE_MAP:
         return None
@@ -42,7 +84,9 @@ def decode_payload(portnum, payload):
 
 def decode(packet):
     try:
-        mesh_packet = MeshPacket.FromString(packet.payload)
+        mesh_packet = payload_codec.decode(
+            packet.payload, packet.id, packet.from_node_id, packet.to_node_id
+        )
     except DecodeError:
         return None, None
 
@@ -0,0 +1,132 @@
+"""Duplicate uplink suppression ahead of the database.
+
+A packet heard by many gateways, or received twice through overlapping topic
+subscriptions, arrives as several envelopes. ``UPLINKS`` remembers recently seen
+(packet_id, gateway, rx_time) uplinks so exact repeats can be dropped before any
+decrypt or database work, and the packet ids already written so the Packet insert
+can be skipped for further uplinks of the same packet.
+"""
+
+import sys
+import time
+from collections import OrderedDict
+
+from meshview import metrics
+
+
+class RecentKeys:
+    """Insertion-ordered set whose entries expire after ``ttl`` seconds.
+
+    At most ``max_entries`` keys are kept; the oldest are dropped first.
+    """
+
+    def __init__(self, ttl=600.0, max_entries=200_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        self._expire(time.monotonic())
+        return key in self._entries
+
+    def add(self, key):
+        """Remember ``key``; return True if it was not already present."""
+        now = time.monotonic()
+        self._expire(now)
+        if key in self._entries:
+            return False
+        self._entries[key] = now
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def _expire(self, now):
+        cutoff = now - self.ttl
+        entries = self._entries
+        while entries:
+            key, added = next(iter(entries.items()))
+            if added >= cutoff:
+                break
+            del entries[key]
+
+    def approx_bytes(self):
+        size = sys.getsizeof(self._entries)
+        if self._entries:
+            key = next(iter(self._entries))
+            per_key = sys.getsizeof(key) + sys.getsizeof(0.0)
+            if isinstance(key, tuple):
+                per_key += sum(sys.getsizeof(part) for part in key)
+            size += per_key * len(self._entries)
+        return size
+
+
+class UplinkFilter:
+    def __init__(self, ttl=600.0, max_entries=200_000):
+        self.enabled = True
+        self.uplinks = RecentKeys(ttl, max_entries)
+        self.packet_ids = RecentKeys(ttl, max_entries)
+        self.checked = 0
+        self.duplicates = 0
+        self.packet_inserts_skipped = 0
+
+    def configure(self, ttl, max_entries):
+        self.enabled = ttl > 0 and max_entries > 0
+        for keys in (self.uplinks, self.packet_ids):
+            keys.ttl = ttl
+            keys.max_entries = max_entries
+
+    def is_duplicate(self, envelope):
+        """Return True if this exact uplink was already seen within the window."""
+        packet = envelope.packet
+        if not self.enabled or not packet.id:
+            return False
+        self.checked += 1
+        if self.uplinks.add((packet.id, envelope.gateway_id, packet.rx_time)):
+            return False
+        self.duplicates += 1
+        return True
+
+    def packet_written(self, packet_id):
+        """Return True if ``packet_id`` is known to be in the packet table already."""
+        if self.enabled and packet_id in self.packet_ids:
+            self.packet_inserts_skipped += 1
+            return True
+        return False
+
+    def remember_packets(self, packet_ids):
+        if self.enabled:
+            for packet_id in packet_ids:
+                self.packet_ids.add(packet_id)
+
+    def summary(self):
+        hit_rate = self.duplicates / self.checked * 100 if self.checked else 0.0
+        memory_kb = (self.uplinks.approx_bytes() + self.packet_ids.approx_bytes()) / 1024
+        return (
+            f"{self.duplicates}/{self.checked} duplicate uplinks dropped ({hit_rate:.1f}%), "
+            f"{self.packet_inserts_skipped} packet inserts skipped, "
+            f"{len(self.uplinks)} uplinks + {len(self.packet_ids)} packet ids tracked "
+            f"(~{memory_kb:.0f} KiB)"
+        )
+
+
+UPLINKS = UplinkFilter()
+
+metrics.REGISTRY.counter(
+    "meshview_dedupe_packet_inserts_skipped_total",
+    "Packet inserts skipped because another uplink already wrote the packet",
+    fn=lambda: UPLINKS.packet_inserts_skipped,
+)
+metrics.REGISTRY.gauge(
+    "meshview_dedupe_entries",
+    "Keys remembered by the duplicate uplink filter",
+    ("kind",),
+    fn=lambda: {("uplink",): len(UPLINKS.uplinks), ("packet_id",): len(UPLINKS.packet_ids)},
+)
+metrics.REGISTRY.gauge(
+    "meshview_dedupe_memory_bytes",
+    "Approximate memory held by the duplicate uplink filter",
+    fn=lambda: UPLINKS.uplinks.approx_bytes() + UPLINKS.packet_ids.approx_bytes(),
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, ForeignKey, Index, desc
+from sqlalchemy import DDL, BigInteger, ForeignKey, Index, desc, event
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -34,6 +34,24 @@ class Node(Base):
         return {column.name: getattr(self, column.name) for column in self.__table__.columns}
 
 
+class Channel(Base):
+    """Interned channel name; packet, packet_seen and packet_hourly store its id."""
+
+    __tablename__ = "channel"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(nullable=False, unique=True)
+
+
+class Topic(Base):
+    """Interned MQTT topic; packet_seen stores its id."""
+
+    __tablename__ = "topic"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(nullable=False, unique=True)
+
+
 class Packet(Base):
     __tablename__ = "packet"
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
@@ -50,7 +68,8 @@ class Packet(Base):
     )
     payload: Mapped[bytes] = mapped_column(nullable=True)
     import_time_us: Mapped[int] = mapped_column(BigInteger, nullable=True)
-    channel: Mapped[str] = mapped_column(nullable=True)
+    channel_id: Mapped[int] = mapped_column(nullable=True)
+    channel = None  # name for channel_id, filled in by store from its name cache
 
     __table_args__ = (
         Index("idx_packet_from_node_id", "from_node_id"),
@@ -60,6 +79,16 @@ class Packet(Base):
     )
 
 
+class PayloadDictionary(Base):
+    """Preset deflate dictionary referenced by compressed Packet.payload rows."""
+
+    __tablename__ = "payload_dictionary"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    created_us: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    data: Mapped[bytes] = mapped_column(nullable=False)
+
+
 class PacketSeen(Base):
     __tablename__ = "packet_seen"
     packet_id = mapped_column(ForeignKey("packet.id"), primary_key=True)
@@ -72,10 +101,12 @@ class PacketSeen(Base):
     rx_time: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     hop_limit: Mapped[int] = mapped_column(nullable=True)
     hop_start: Mapped[int] = mapped_column(nullable=True)
-    channel: Mapped[str] = mapped_column(nullable=True)
+    channel_id: Mapped[int] = mapped_column(nullable=True)
+    channel = None  # names for channel_id and topic_id, filled in by store
     rx_snr: Mapped[float] = mapped_column(nullable=True)
     rx_rssi: Mapped[int] = mapped_column(nullable=True)
-    topic: Mapped[str] = mapped_column(nullable=True)
+    topic_id: Mapped[int] = mapped_column(nullable=True)
+    topic = None
     import_time_us: Mapped[int] = mapped_column(BigInteger, nullable=True)
 
     __table_args__ = (
@@ -118,4 +149,118 @@ class NodePublicKey(Base):
     __table_args__ = (
         Index("idx_node_public_key_node_id", "node_id"),
         Index("idx_node_public_key_public_key", "public_key"),
+        Index("idx_node_public_key_node_id_public_key", "node_id", "public_key", unique=True),
+    )
+
+
+class Telemetry(Base):
+    """One decoded TELEMETRY_APP metric sample, e.g. ("device.battery_level", 87)."""
+
+    __tablename__ = "telemetry"
+
+    packet_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    metric: Mapped[str] = mapped_column(primary_key=True)
+    node_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    time_us: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    value: Mapped[float] = mapped_column(nullable=False)
+
+    __table_args__ = (
+        Index("idx_telemetry_node_metric_time_us", "node_id", "metric", "time_us"),
+        Index("idx_telemetry_time_us", "time_us"),
     )
+
+
+class Position(Base):
+    """One decoded POSITION_APP fix, kept so tracks don't need the raw payloads."""
+
+    __tablename__ = "position"
+
+    packet_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    node_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    time_us: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    latitude_i: Mapped[int] = mapped_column(nullable=False)
+    longitude_i: Mapped[int] = mapped_column(nullable=False)
+    altitude: Mapped[int] = mapped_column(nullable=True)
+    precision_bits: Mapped[int] = mapped_column(nullable=True)
+    sats_in_view: Mapped[int] = mapped_column(nullable=True)
+
+    __table_args__ = (
+        Index("idx_position_node_time_us", "node_id", "time_us"),
+        Index("idx_position_time_us", "time_us"),
+    )
+
+
+class Edge(Base):
+    """A directed link between two nodes, seen in traceroutes or NEIGHBORINFO reports."""
+
+    __tablename__ = "edge"
+
+    from_node_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    to_node_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    type: Mapped[str] = mapped_column(primary_key=True)
+    first_seen_us: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    last_seen_us: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    count: Mapped[int] = mapped_column(nullable=False, default=1)
+    last_snr: Mapped[float] = mapped_column(nullable=True)
+
+    __table_args__ = (
+        Index("idx_edge_last_seen_us", "last_seen_us"),
+        Index("idx_edge_to_node_id", "to_node_id"),
+    )
+
+
+ROLLUP_INTERVAL_US = 3_600_000_000  # packet_hourly bucket width
+
+
+class PacketHourly(Base):
+    """Packets and receptions per hour, channel, port and sender, counted at ingest."""
+
+    __tablename__ = "packet_hourly"
+
+    hour_us: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    channel_id: Mapped[int] = mapped_column(primary_key=True)  # 0 when the packet had none
+    portnum: Mapped[int] = mapped_column(primary_key=True)
+    from_node_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    packets: Mapped[int] = mapped_column(nullable=False, default=0)
+    seen: Mapped[int] = mapped_column(nullable=False, default=0)
+
+    __table_args__ = (Index("idx_packet_hourly_from_node_hour_us", "from_node_id", "hour_us"),)
+
+
+class TextMessage(Base):
+    """Decoded TEXT_MESSAGE_APP text, indexed for substring search."""
+
+    __tablename__ = "text_message"
+
+    packet_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    time_us: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    text: Mapped[str] = mapped_column(nullable=False)
+
+    __table_args__ = (Index("idx_text_message_time_us", "time_us"),)
+
+
+# Search index for text_message. SQLite keeps an external-content FTS5 table with
+# the trigram tokenizer (case-insensitive substring matches) in step via triggers;
+# Postgres uses a pg_trgm GIN index that serves ILIKE '%...%' directly.
+TEXT_MESSAGE_SEARCH_DDL = {
+    "sqlite": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS text_message_fts USING fts5("
+        "text, content='text_message', content_rowid='packet_id', tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS text_message_ai AFTER INSERT ON text_message BEGIN "
+        "INSERT INTO text_message_fts(rowid, text) VALUES (new.packet_id, new.text); END",
+        "CREATE TRIGGER IF NOT EXISTS text_message_ad AFTER DELETE ON text_message BEGIN "
+        "INSERT INTO text_message_fts(text_message_fts, rowid, text) "
+        "VALUES ('delete', old.packet_id, old.text); END",
+    ),
+    "postgresql": (
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS idx_text_message_text_trgm "
+        "ON text_message USING gin (text gin_trgm_ops)",
+    ),
+}
+
+for _dialect, _statements in TEXT_MESSAGE_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(
+            TextMessage.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect)
+        )
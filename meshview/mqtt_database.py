@@ -33,3 +33,43 @@ def init_database(database_connection_string):
 async def create_tables():
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+
+
+# SQLite PRAGMA auto_vacuum values
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+async def enable_incremental_vacuum():
+    """Switch a SQLite file to auto_vacuum=INCREMENTAL.
+
+    Existing files only change mode through a full VACUUM, so this runs one when
+    needed and returns True; it returns False when the file was already converted.
+    """
+    async with engine.connect() as conn:
+        mode = (await conn.exec_driver_sql("PRAGMA auto_vacuum;")).scalar()
+        if mode == AUTO_VACUUM_INCREMENTAL:
+            return False
+        await conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL;")
+        await conn.exec_driver_sql("VACUUM;")
+    return True
+
+
+async def free_pages():
+    """Return (freelist page count, page size in bytes) for a SQLite file."""
+    async with engine.connect() as conn:
+        count = (await conn.exec_driver_sql("PRAGMA freelist_count;")).scalar()
+        page_size = (await conn.exec_driver_sql("PRAGMA page_size;")).scalar()
+    return count, page_size
+
+
+async def incremental_vacuum(pages):
+    """Return up to ``pages`` free pages to the filesystem; returns how many were freed."""
+    async with engine.connect() as conn:
+        before = (await conn.exec_driver_sql("PRAGMA freelist_count;")).scalar()
+        await conn.commit()
+        # The pragma frees one page per step and execute() only steps once;
+        # executescript() steps it to completion.
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        after = (await conn.exec_driver_sql("PRAGMA freelist_count;")).scalar()
+    return before - after
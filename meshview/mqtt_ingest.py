@@ -0,0 +1,161 @@
+"""Write-behind ingestion stage between the MQTT reader and the database.
+
+Envelopes are queued as they arrive and flushed by a single writer task in
+multi-row transactions, either when ``batch_size`` envelopes are waiting or when
+``flush_interval`` seconds have passed since the first one was queued.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+
+from meshview import mqtt_store
+
+logger = logging.getLogger(__name__)
+
+INGEST_MODES = ("batch", "direct")
+
+
+class BatchWriter:
+    def __init__(self, batch_size=500, flush_interval=0.25, queue_size=5000, lock=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.lock = lock or contextlib.nullcontext()
+        self.flushed_batches = 0
+        self.flushed_envelopes = 0
+        self.failed_batches = 0
+        self.flush_started = None
+        self.queued = 0  # envelopes put so far
+        self.done = 0  # of those, how many have been through flush (in order)
+        self._done_changed = asyncio.Condition()
+
+    def lag(self):
+        """Seconds the flush in progress has been running (0 when idle)."""
+        if self.flush_started is None:
+            return 0.0
+        return time.perf_counter() - self.flush_started
+
+    def is_behind(self, threshold):
+        return self.queue.full() or self.lag() > threshold
+
+    async def put(self, topic, env):
+        """Queue an envelope, waiting if the writer has fallen ``queue_size`` behind."""
+        await self.queue.put((topic, env))
+        self.queued += 1
+
+    async def wait_flushed(self):
+        """Wait until every envelope queued so far has been written."""
+        target = self.queued
+        async with self._done_changed:
+            await self._done_changed.wait_for(lambda: self.done >= target)
+
+    async def run(self):
+        """Drain the queue forever, flushing whatever is pending when cancelled."""
+        loop = asyncio.get_running_loop()
+        items = []
+        try:
+            while True:
+                items.append(await self.queue.get())
+                deadline = loop.time() + self.flush_interval
+                while len(items) < self.batch_size:
+                    if not self.queue.empty():
+                        items.append(self.queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except TimeoutError:
+                        break
+
+                await self.flush(items)
+                items = []
+        finally:
+            while not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            if items:
+                logger.info(f"Flushing {len(items)} queued envelopes before shutdown")
+                await asyncio.shield(self.flush(items))
+
+    async def flush(self, items):
+        batch = mqtt_store.IngestBatch()
+        for topic, env in items:
+            try:
+                mqtt_store.collect_envelope(batch, topic, env)
+            except Exception:
+                logger.exception("Error collecting envelope for batch write")
+
+        start = self.flush_started = time.perf_counter()
+        async with self.lock:
+            try:
+                await mqtt_store.write_batch(batch)
+            except Exception:
+                # One bad row should not cost the whole batch: replay it through the
+                # per-envelope path, which isolates failures to a single envelope.
+                self.failed_batches += 1
+                logger.exception(
+                    f"Batch write of {len(batch)} envelopes failed, retrying one by one"
+                )
+                for topic, env in batch.envelopes:
+                    try:
+                        await mqtt_store.process_envelope(topic, env)
+                    except Exception:
+                        logger.exception("Error processing envelope")
+
+        self.flush_started = None
+        self.flushed_batches += 1
+        self.flushed_envelopes += len(batch)
+        self.done += len(items)
+        async with self._done_changed:
+            self._done_changed.notify_all()
+        logger.debug(
+            f"Flushed {len(batch)} envelopes in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+
+
+async def drain_spool(spool, deliver, is_behind, flushed=None, chunk_size=500, interval=1.0):
+    """Replay envelopes from ``spool`` in order through ``deliver`` whenever the
+    writer has caught up (``is_behind()`` is false), logging depth while non-empty.
+
+    ``flushed`` is awaited before the spool's offset moves past a chunk, for a
+    ``deliver`` that only queues envelopes (``BatchWriter.wait_flushed``).
+    """
+    last_report = 0.0
+    while True:
+        if not spool.depth or is_behind():
+            if spool.depth and time.monotonic() - last_report >= 30:
+                logger.info(f"Spool: {spool.summary()}")
+                last_report = time.monotonic()
+            await asyncio.sleep(interval)
+            continue
+
+        for topic, env in spool.read(chunk_size):
+            await deliver(topic, env)
+        if flushed is not None:
+            await flushed()
+        spool.commit()
+        if not spool.depth:
+            logger.info(f"Spool drained: {spool.summary()}")
+        await asyncio.sleep(0)
+
+
+async def flush_node_cache(interval, lock=None):
+    """Write dirty nodes from ``mqtt_store.NODE_CACHE`` every ``interval`` seconds."""
+    lock = lock or contextlib.nullcontext()
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            async with lock:
+                try:
+                    written = await mqtt_store.NODE_CACHE.flush()
+                except Exception:
+                    logger.exception("Error flushing node cache")
+                    continue
+            if written:
+                logger.debug(f"Flushed {written} nodes")
+    finally:
+        written = await asyncio.shield(mqtt_store.NODE_CACHE.flush())
+        logger.info(f"Flushed {written} nodes before shutdown")
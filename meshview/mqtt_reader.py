@@ -3,6 +3,8 @@ import base64
 import logging
 import random
 import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 
 import aiomqtt
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
@@ -10,6 +12,8 @@ from google.protobuf.message import DecodeError
 
 from meshtastic.protobuf.mesh_pb2 import Data
 from meshtastic.protobuf.mqtt_pb2 import ServiceEnvelope
+from meshtastic.protobuf.portnums_pb2 import PortNum
+from meshview import capture, dedupe, metrics
 from meshview.config import CONFIG
 
 PRIMARY_KEY = base64.b64decode("1PG7OiApB1nwvP+rz05pAQ==")
@@ -66,19 +70,38 @@ def _parse_secondary_keys():
     else:
         values = [raw_value]
 
+    # Entries are either "<base64 key>" or "<channel name>:<base64 key>"; ':' is not
+    # part of the base64 alphabet so the split is unambiguous.
     keys = []
     for value in values:
         try:
             cleaned = _strip_quotes(str(value).strip())
-            if cleaned:
-                keys.append(base64.b64decode(cleaned))
+            name, _, encoded = cleaned.rpartition(":")
+            if encoded:
+                keys.append((base64.b64decode(encoded), name.strip() or None))
         except (TypeError, ValueError):
             logger.warning("Invalid base64 key in mqtt.secondary_keys: %s", value)
     return keys
 
 
+def _parse_decode_workers():
+    raw_value = CONFIG.get("mqtt", {}).get("decode_workers", "0")
+    try:
+        return max(int(raw_value), 0)
+    except (TypeError, ValueError):
+        logger.warning("Invalid mqtt.decode_workers: %s", raw_value)
+        return 0
+
+
 SKIP_NODE_IDS = _parse_skip_node_ids()
-SECONDARY_KEYS = _parse_secondary_keys()
+_SECONDARY_KEY_ENTRIES = _parse_secondary_keys()
+SECONDARY_KEYS = list(dict.fromkeys(key for key, _ in _SECONDARY_KEY_ENTRIES))
+KEY_CHANNEL_NAMES = {}
+for _key, _name in _SECONDARY_KEY_ENTRIES:
+    if _name:
+        KEY_CHANNEL_NAMES.setdefault(_key, []).append(_name)
+DECODE_WORKERS = _parse_decode_workers()
+CAPTURE_FILE = str(CONFIG.get("mqtt", {}).get("capture_file", "")).strip()
 
 logger.info("Primary key: %s", PRIMARY_KEY)
 if SECONDARY_KEYS:
@@ -92,11 +115,15 @@ else:
 def decrypt(packet, key):
     if packet.HasField("decoded"):
         return True
+    return _decrypt_with(packet, algorithms.AES(key))
+
+
+def _decrypt_with(packet, algorithm):
     packet_id = packet.id.to_bytes(8, "little")
     from_node_id = getattr(packet, "from").to_bytes(8, "little")
     nonce = packet_id + from_node_id
 
-    cipher = Cipher(algorithms.AES(key), modes.CTR(nonce))
+    cipher = Cipher(algorithm, modes.CTR(nonce))
     decryptor = cipher.decryptor()
     raw_proto = decryptor.update(packet.encrypted) + decryptor.finalize()
     try:
@@ -108,11 +135,183 @@ def decrypt(packet, key):
     return True
 
 
-async def get_topic_envelopes(mqtt_server, mqtt_port, topics, mqtt_user, mqtt_passwd):
+def channel_hash(name, key):
+    """Meshtastic channel hash: XOR of the channel name bytes and the key bytes."""
+    return _xor_bytes(name.encode("utf-8")) ^ _xor_bytes(key)
+
+
+def _xor_bytes(data):
+    value = 0
+    for byte in data:
+        value ^= byte
+    return value
+
+
+class Keyring:
+    """Decryption keys indexed by the MeshPacket ``channel`` hash byte.
+
+    For each packet the candidate order is: the key that last worked for the same
+    (topic, channel hash), keys whose hash matches the envelope's channel name or a
+    configured channel name, and finally every remaining key in configured order.
+    """
+
+    MAX_RECENT = 10_000
+
+    def __init__(self, keys, channel_names=None):
+        channel_names = channel_names or {}
+        self.keys = list(keys)
+        self.labels = []
+        self.algorithms = [algorithms.AES(key) for key in self.keys]
+        self.hits = [0] * len(self.keys)
+        self.misses = [0] * len(self.keys)
+        self.recent = {}
+        self._by_key_xor = {}
+        self._by_hash = {}
+
+        for index, key in enumerate(self.keys):
+            self._by_key_xor.setdefault(_xor_bytes(key), []).append(index)
+            names = channel_names.get(key, [])
+            for name in names:
+                self._by_hash.setdefault(channel_hash(name, key), []).append(index)
+            fingerprint = base64.b64encode(key).decode("ascii")[:6]
+            self.labels.append("/".join([fingerprint, *names]))
+
+    def candidates(self, topic, channel_name, hash_byte):
+        ordered = []
+        recent = self.recent.get((topic, hash_byte))
+        if recent is not None:
+            ordered.append(recent)
+        ordered.extend(self._by_key_xor.get(hash_byte ^ _xor_bytes(channel_name.encode()), ()))
+        ordered.extend(self._by_hash.get(hash_byte, ()))
+        ordered.extend(range(len(self.keys)))
+        return dict.fromkeys(ordered)
+
+    def decrypt(self, packet, topic="", channel_name=""):
+        """Decrypt ``packet`` in place; return (key index or None, indices that failed)."""
+        if packet.HasField("decoded"):
+            return None, ()
+
+        failed = []
+        for index in self.candidates(topic, channel_name, packet.channel):
+            if _decrypt_with(packet, self.algorithms[index]):
+                if len(self.recent) >= self.MAX_RECENT:
+                    self.recent.clear()
+                self.recent[(topic, packet.channel)] = index
+                return index, failed
+            failed.append(index)
+        return None, failed
+
+    def record(self, key_index, failed):
+        if key_index is not None:
+            self.hits[key_index] += 1
+        for index in failed:
+            self.misses[index] += 1
+
+    def summary(self):
+        return ", ".join(
+            f"{label} {hits} hit/{misses} miss"
+            for label, hits, misses in zip(self.labels, self.hits, self.misses, strict=True)
+        )
+
+
+@dataclass
+class DecodeStats:
+    """Counters for the decode stage, logged alongside the message rate."""
+
+    received: int = 0
+    decode_errors: int = 0
+    undecrypted: int = 0
+    parse_seconds: float = 0.0
+    decrypt_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    pool_pending: int = 0
+    pool_pending_max: int = 0
+
+    def record(self, result):
+        self.received += 1
+        self.parse_seconds += result.parse_seconds
+        self.decrypt_seconds += result.decrypt_seconds
+        if result.error == "decode":
+            self.decode_errors += 1
+        elif result.error == "decrypt":
+            self.undecrypted += 1
+
+    def summary(self):
+        received = max(self.received, 1)
+        return (
+            f"parse {self.parse_seconds / received * 1e6:.0f}us/msg, "
+            f"decrypt {self.decrypt_seconds / received * 1e6:.0f}us/msg, "
+            f"decode errors {self.decode_errors}, undecrypted {self.undecrypted}, "
+            f"pool pending {self.pool_pending} (max {self.pool_pending_max}), "
+            f"pool wait {self.pool_wait_seconds / received * 1e6:.0f}us/msg"
+        )
+
+
+@dataclass
+class DecodeResult:
+    envelope: ServiceEnvelope | None
+    parse_seconds: float = 0.0
+    decrypt_seconds: float = 0.0
+    error: str | None = None
+    key_index: int | None = None
+    failed_keys: tuple = ()
+
+
+def decode_envelope(topic, payload, keyring, is_duplicate=None):
+    """Parse a raw MQTT payload and decrypt its packet with the keyring.
+
+    When ``is_duplicate`` is given, envelopes it rejects are returned undecrypted
+    with error "duplicate".
+    """
+    start = time.perf_counter()
+    try:
+        envelope = ServiceEnvelope.FromString(payload)
+    except DecodeError:
+        return DecodeResult(None, time.perf_counter() - start, error="decode")
+    parsed = time.perf_counter()
+    if is_duplicate is not None and is_duplicate(envelope):
+        return DecodeResult(None, parsed - start, error="duplicate")
+
+    key_index, failed = keyring.decrypt(envelope.packet, topic, envelope.channel_id)
+    decrypted = time.perf_counter()
+
+    error = None if envelope.packet.HasField("decoded") else "decrypt"
+    return DecodeResult(
+        envelope, parsed - start, decrypted - parsed, error, key_index, tuple(failed)
+    )
+
+
+_POOL_KEYRING = None
+
+
+def _init_decode_worker(keys, channel_names):
+    global _POOL_KEYRING
+    _POOL_KEYRING = Keyring(keys, channel_names)
+
+
+def _decode_in_worker(topic, payload):
+    return decode_envelope(topic, payload, _POOL_KEYRING)
+
+
+def _duplicate_result(payload, is_duplicate):
+    """A "duplicate" DecodeResult if ``is_duplicate`` rejects the envelope, else None.
+
+    Parsing is cheap next to decrypting, so the pool path does this before
+    submitting and repeated uplinks never reach a worker.
+    """
+    start = time.perf_counter()
+    try:
+        envelope = ServiceEnvelope.FromString(payload)
+    except DecodeError:
+        return None  # the worker reports it
+    if is_duplicate(envelope):
+        return DecodeResult(None, time.perf_counter() - start, error="duplicate")
+    return None
+
+
+async def _receive_messages(mqtt_server, mqtt_port, topics, mqtt_user, mqtt_passwd):
+    """Yield (topic, payload) forever, reconnecting whenever the broker drops us."""
     identifier = str(random.getrandbits(16))
-    keyring = [PRIMARY_KEY, *SECONDARY_KEYS]
-    msg_count = 0
-    start_time = None
     while True:
         try:
             async with aiomqtt.Client(
@@ -127,39 +326,184 @@ async def get_topic_envelopes(mqtt_server, mqtt_port, topics, mqtt_user, mqtt_pa
                     logger.info(f"Subscribing to: {topic}")
                     await client.subscribe(topic)
 
-                # Reset start time when connected
-                if start_time is None:
-                    start_time = time.time()
-
                 async for msg in client.messages:
-                    try:
-                        envelope = ServiceEnvelope.FromString(msg.payload)
-                    except DecodeError:
-                        continue
-
-                    for key in keyring:
-                        if decrypt(envelope.packet, key):
-                            break
-                    if not envelope.packet.decoded:
-                        continue
-
-                    # Skip packets from configured node IDs
-                    if getattr(envelope.packet, "from", None) in SKIP_NODE_IDS:
-                        continue
-
-                    msg_count += 1
-                    # FIXME: make this interval configurable or time based
-                    if (
-                        msg_count % 10000 == 0
-                    ):  # Log notice every 10000 messages (approx every hour at 3/sec)
-                        elapsed_time = time.time() - start_time
-                        msg_rate = msg_count / elapsed_time if elapsed_time > 0 else 0
-                        logger.info(
-                            f"Processed {msg_count} messages so far... ({msg_rate:.2f} msg/sec)"
-                        )
-
-                    yield msg.topic.value, envelope
+                    yield msg.topic.value, msg.payload
 
         except aiomqtt.MqttError as e:
             logger.error(f"MQTT error: {e}, reconnecting in 1s...")
             await asyncio.sleep(1)
+
+
+async def _pooled_results(messages, keyring, workers, stats, is_duplicate=None):
+    """Decode messages on a process pool, yielding results in arrival order.
+
+    Envelopes ``is_duplicate`` rejects are answered in this process without
+    decrypting, as in ``decode_envelope``.
+
+    At most ``workers * 32`` messages are in flight; beyond that the MQTT reader
+    waits for the oldest result before accepting more.
+    """
+    loop = asyncio.get_running_loop()
+    in_flight = asyncio.Queue(maxsize=workers * 32)
+
+    async def submit():
+        # Ends with (None, error, None) so the consumer stops, or raises what the
+        # reader raised, instead of waiting forever
+        try:
+            async for topic, payload in messages:
+                duplicate = is_duplicate and _duplicate_result(payload, is_duplicate)
+                if duplicate:
+                    future = loop.create_future()
+                    future.set_result(duplicate)
+                else:
+                    future = loop.run_in_executor(pool, _decode_in_worker, topic, payload)
+                await in_flight.put((topic, future, time.perf_counter()))
+                stats.pool_pending = in_flight.qsize()
+                stats.pool_pending_max = max(stats.pool_pending_max, stats.pool_pending)
+        except Exception as e:
+            await in_flight.put((None, e, None))
+        else:
+            await in_flight.put((None, None, None))
+
+    logger.info(f"Decoding MQTT payloads on {workers} worker processes")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_decode_worker,
+        initargs=(keyring.keys, KEY_CHANNEL_NAMES),
+    ) as pool:
+        submitter = asyncio.create_task(submit())
+        try:
+            while True:
+                topic, future, submitted = await in_flight.get()
+                if topic is None:
+                    error = future  # what the reader raised, if anything
+                    if error is not None:
+                        raise error
+                    return
+                result = await future
+                stats.pool_pending = in_flight.qsize()
+                stats.pool_wait_seconds += time.perf_counter() - submitted
+                yield topic, result
+        finally:
+            submitter.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _inline_results(messages, keyring):
+    async for topic, payload in messages:
+        yield topic, decode_envelope(topic, payload, keyring, dedupe.UPLINKS.is_duplicate)
+
+
+# --- Metrics
+MESSAGES = metrics.REGISTRY.counter(
+    "meshview_mqtt_messages_total",
+    "Envelopes passed on for ingest, by topic (without the gateway suffix) and portnum",
+    ("topic", "portnum"),
+)
+DROPPED = metrics.REGISTRY.counter(
+    "meshview_mqtt_dropped_total",
+    "MQTT messages deliberately not passed on for ingest, by reason",
+    ("reason",),
+)
+FAILURES = metrics.REGISTRY.counter(
+    "meshview_mqtt_failures_total",
+    "MQTT messages that could not be parsed (decode) or decrypted with any key (decrypt)",
+    ("stage",),
+)
+STATS = DecodeStats()
+KEYRING = None
+_PORTNUM_NAMES = {}
+
+
+def _portnum_name(portnum):
+    name = _PORTNUM_NAMES.get(portnum)
+    if name is None:
+        try:
+            name = PortNum.Name(portnum)
+        except ValueError:
+            name = str(portnum)
+        _PORTNUM_NAMES[portnum] = name
+    return name
+
+
+def _metric_topic(topic):
+    # Topics end with the uplinking gateway id; drop it to keep label cardinality low
+    root, _, last = topic.rpartition("/")
+    return root if last.startswith("!") else topic
+
+
+def _keyring_attempts():
+    if KEYRING is None:
+        return {}
+    samples = {}
+    for label, hits, misses in zip(KEYRING.labels, KEYRING.hits, KEYRING.misses, strict=True):
+        samples[(label, "hit")] = hits
+        samples[(label, "miss")] = misses
+    return samples
+
+
+metrics.REGISTRY.counter(
+    "meshview_decode_seconds_total",
+    "Time spent in each decode stage",
+    ("stage",),
+    fn=lambda: {
+        ("parse",): STATS.parse_seconds,
+        ("decrypt",): STATS.decrypt_seconds,
+        ("pool_wait",): STATS.pool_wait_seconds,
+    },
+)
+metrics.REGISTRY.counter(
+    "meshview_mqtt_received_total", "Raw MQTT messages received", fn=lambda: STATS.received
+)
+metrics.REGISTRY.gauge(
+    "meshview_decode_pool_pending",
+    "Messages waiting on the decode process pool",
+    fn=lambda: STATS.pool_pending,
+)
+metrics.REGISTRY.counter(
+    "meshview_keyring_attempts_total",
+    "Decrypt attempts per configured key",
+    ("key", "result"),
+    fn=_keyring_attempts,
+)
+
+
+async def get_topic_envelopes(mqtt_server, mqtt_port, topics, mqtt_user, mqtt_passwd):
+    messages = _receive_messages(mqtt_server, mqtt_port, topics, mqtt_user, mqtt_passwd)
+    if CAPTURE_FILE:
+        messages = capture.capture_messages(messages, CAPTURE_FILE)
+    async for topic, envelope in decode_messages(messages):
+        yield topic, envelope
+
+
+async def decode_messages(messages):
+    """Decode and decrypt raw (topic, payload) pairs, yielding (topic, envelope) for
+    everything that should be ingested."""
+    global KEYRING
+    keyring = KEYRING = Keyring([PRIMARY_KEY, *SECONDARY_KEYS], KEY_CHANNEL_NAMES)
+
+    if DECODE_WORKERS:
+        results = _pooled_results(
+            messages, keyring, DECODE_WORKERS, STATS, dedupe.UPLINKS.is_duplicate
+        )
+    else:
+        results = _inline_results(messages, keyring)
+
+    async for topic, result in results:
+        STATS.record(result)
+        keyring.record(result.key_index, result.failed_keys)
+        envelope = result.envelope
+        if result.error == "duplicate":
+            DROPPED.inc("duplicate")
+        elif result.error is not None:
+            FAILURES.inc(result.error)
+        if envelope is None or not envelope.packet.decoded:
+            continue
+
+        # Skip packets from configured node IDs
+        if getattr(envelope.packet, "from", None) in SKIP_NODE_IDS:
+            DROPPED.inc("skipped_node")
+            continue
+
+        MESSAGES.inc(_metric_topic(topic), _portnum_name(envelope.packet.decoded.portnum))
+        yield topic, envelope
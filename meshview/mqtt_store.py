@@ -1,8 +1,9 @@
 import logging
 import re
 import time
+from dataclasses import dataclass, field
 
-from sqlalchemy import select, update
+from sqlalchemy import func, select
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
@@ -10,157 +11,642 @@ from sqlalchemy.exc import IntegrityError
 from meshtastic.protobuf.config_pb2 import Config
 from meshtastic.protobuf.mesh_pb2 import HardwareModel
 from meshtastic.protobuf.portnums_pb2 import PortNum
-from meshview import decode_payload, mqtt_database
-from meshview.models import Node, NodePublicKey, Packet, PacketSeen, Traceroute
+from meshview import decode_payload, dedupe, metrics, mqtt_database, payload_codec
+from meshview.models import (
+    ROLLUP_INTERVAL_US,
+    Channel,
+    Edge,
+    Node,
+    NodePublicKey,
+    Packet,
+    PacketHourly,
+    PacketSeen,
+    Position,
+    Telemetry,
+    TextMessage,
+    Topic,
+    Traceroute,
+)
 
 logger = logging.getLogger(__name__)
 
-MQTT_GATEWAY_CACHE: set[int] = set()
+DB_WRITE_SECONDS = metrics.REGISTRY.histogram(
+    "meshview_db_write_seconds", "Ingest database write latency by statement", ("statement",)
+)
 
+NODE_COLUMNS = tuple(column.name for column in Node.__table__.columns)
 
-async def process_envelope(topic, env):
-    # MAP_REPORT_APP
-    if env.packet.decoded.portnum == PortNum.MAP_REPORT_APP:
-        node_id = getattr(env.packet, "from")
-        user_id = f"!{node_id:0{8}x}"
+# Fields that are only timestamps; a report that changes nothing else is a no-op
+# apart from the throttled last_seen_us bump.
+_NODE_TIME_FIELDS = ("id", "first_seen_us", "last_seen_us")
 
-        map_report = decode_payload.decode_payload(
-            PortNum.MAP_REPORT_APP, env.packet.decoded.payload
+
+def _now_us():
+    return int(time.time() * 1_000_000)
+
+
+# Dialects with INSERT ... ON CONFLICT, which write_batch needs throughout
+BATCH_DIALECTS = ("sqlite", "postgresql")
+
+
+def _dialect_insert(dialect, model):
+    if dialect == "sqlite":
+        return sqlite_insert(model)
+    if dialect == "postgresql":
+        return pg_insert(model)
+    return None
+
+
+def _insert_ignore(dialect, model, index_elements):
+    """Build an INSERT ... ON CONFLICT DO NOTHING statement, or None if unsupported."""
+    stmt = _dialect_insert(dialect, model)
+    if stmt is None:
+        return None
+    return stmt.on_conflict_do_nothing(index_elements=index_elements)
+
+
+def _upsert_node(dialect, columns):
+    """Build a Node upsert keyed on ``id`` that updates ``columns`` on conflict."""
+    stmt = _dialect_insert(dialect, Node)
+    if stmt is None:
+        return None
+
+    set_ = {col: stmt.excluded[col] for col in columns if col not in ("id", "first_seen_us")}
+    set_["first_seen_us"] = func.coalesce(Node.first_seen_us, stmt.excluded.first_seen_us)
+    return stmt.on_conflict_do_update(index_elements=["id"], set_=set_)
+
+
+def _upsert_public_key(dialect):
+    """Build a NodePublicKey upsert that only bumps ``last_seen_us`` for known keys."""
+    stmt = _dialect_insert(dialect, NodePublicKey)
+    if stmt is None:
+        return None
+    return stmt.on_conflict_do_update(
+        index_elements=["node_id", "public_key"],
+        set_={"last_seen_us": stmt.excluded.last_seen_us},
+    )
+
+
+def _upsert_edge(dialect):
+    """Build an Edge upsert that adds to ``count`` and keeps the latest sighting."""
+    stmt = _dialect_insert(dialect, Edge)
+    if stmt is None:
+        return None
+    return stmt.on_conflict_do_update(
+        index_elements=["from_node_id", "to_node_id", "type"],
+        set_={
+            "last_seen_us": stmt.excluded.last_seen_us,
+            "count": Edge.count + stmt.excluded.count,
+            "last_snr": func.coalesce(stmt.excluded.last_snr, Edge.last_snr),
+        },
+    )
+
+
+def _upsert_packet_hourly(dialect):
+    """Build a PacketHourly upsert that adds to the existing counts."""
+    stmt = _dialect_insert(dialect, PacketHourly)
+    if stmt is None:
+        return None
+    return stmt.on_conflict_do_update(
+        index_elements=["hour_us", "channel_id", "portnum", "from_node_id"],
+        set_={
+            "packets": PacketHourly.packets + stmt.excluded.packets,
+            "seen": PacketHourly.seen + stmt.excluded.seen,
+        },
+    )
+
+
+async def _unstored_receptions(session, rows):
+    """The packet_seen ``rows`` whose (packet_id, node_id, rx_time) isn't stored yet.
+
+    On PostgreSQL packet_seen is partitioned and its primary key includes
+    import_time_us, so ON CONFLICT no longer catches a repeated reception; the
+    stored ones are looked up instead. Ingest is the only writer, so none can
+    appear in between.
+    """
+    if not rows or session.get_bind().dialect.name != "postgresql":
+        return rows
+    result = await session.execute(
+        select(PacketSeen.packet_id, PacketSeen.node_id, PacketSeen.rx_time).where(
+            PacketSeen.packet_id.in_({row["packet_id"] for row in rows})
         )
+    )
+    stored = {tuple(key) for key in result}
+    return [row for row in rows if (row["packet_id"], row["node_id"], row["rx_time"]) not in stored]
 
+
+async def _insert_or_ignore(session, model, index_elements, values):
+    """Insert ``values`` unless the row exists; returns whether a row was written."""
+    stmt = _insert_ignore(session.get_bind().dialect.name, model, index_elements)
+    with DB_WRITE_SECONDS.time(f"{model.__tablename__}_insert"):
+        if stmt is not None:
+            result = await session.execute(stmt.values(**values))
+            return result.rowcount > 0
+
+        try:
+            async with session.begin_nested():
+                session.add(model(**values))
+                await session.flush()
+        except IntegrityError:
+            return False
+        return True
+
+
+class InternCache:
+    """name -> id for an interned lookup table (Channel, Topic).
+
+    Unknown names are inserted in a transaction of their own, so an id is only
+    cached once it is committed and can't vanish with a failed batch. Rows are
+    never deleted, so cached ids stay valid.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.ids = {}
+
+    async def resolve(self, names):
+        missing = {name for name in names if name is not None and name not in self.ids}
+        if not missing:
+            return
         async with mqtt_database.async_session() as session:
-            try:
-                hw_model = (
-                    HardwareModel.Name(map_report.hw_model)
-                    if hasattr(HardwareModel, "Name")
-                    else "unknown"
-                )
-                role = (
-                    Config.DeviceConfig.Role.Name(map_report.role)
-                    if hasattr(Config.DeviceConfig.Role, "Name")
-                    else "unknown"
-                )
-                node = (
-                    await session.execute(select(Node).where(Node.node_id == node_id))
-                ).scalar_one_or_none()
-
-                now_us = int(time.time() * 1_000_000)
-
-                if node:
-                    node.node_id = node_id
-                    node.long_name = map_report.long_name
-                    node.short_name = map_report.short_name
-                    node.hw_model = hw_model
-                    node.role = role
-                    node.channel = env.channel_id
-                    node.last_lat = map_report.latitude_i
-                    node.last_long = map_report.longitude_i
-                    node.firmware = map_report.firmware_version
-                    node.last_seen_us = now_us
-                    if node.first_seen_us is None:
-                        node.first_seen_us = now_us
-                else:
-                    node = Node(
-                        id=user_id,
-                        node_id=node_id,
-                        long_name=map_report.long_name,
-                        short_name=map_report.short_name,
-                        hw_model=hw_model,
-                        role=role,
-                        channel=env.channel_id,
-                        firmware=map_report.firmware_version,
-                        last_lat=map_report.latitude_i,
-                        last_long=map_report.longitude_i,
-                        first_seen_us=now_us,
-                        last_seen_us=now_us,
+            for name in missing:
+                await _insert_or_ignore(session, self.model, ["name"], {"name": name})
+            result = await session.execute(
+                select(self.model.name, self.model.id).where(self.model.name.in_(missing))
+            )
+            await session.commit()
+        self.ids.update(result.all())
+
+
+CHANNELS = InternCache(Channel)
+TOPICS = InternCache(Topic)
+
+
+async def _intern_names(rows):
+    """Swap the channel and topic names in ``rows`` for their interned ids, in place.
+
+    Must run before the caller's session writes anything: new names are committed
+    from a separate session, which would wait on SQLite's write lock.
+    """
+    for cache, key in ((CHANNELS, "channel"), (TOPICS, "topic")):
+        named = [row for row in rows if key in row]
+        await cache.resolve(row[key] for row in named)
+        for row in named:
+            row[f"{key}_id"] = cache.ids.get(row.pop(key))
+
+
+def _gateway_node_id(env):
+    if not env.gateway_id:
+        return None
+    return int(env.gateway_id[1:], 16)
+
+
+def _packet_values(env, now_us):
+    return {
+        "id": env.packet.id,
+        "portnum": env.packet.decoded.portnum,
+        "from_node_id": getattr(env.packet, "from"),
+        "to_node_id": env.packet.to,
+        "payload": payload_codec.encode(env.packet),
+        "import_time_us": now_us,
+        "channel": env.channel_id,
+    }
+
+
+def _packet_seen_values(topic, env, gateway_node_id, now_us):
+    return {
+        "packet_id": env.packet.id,
+        "node_id": gateway_node_id,
+        "channel": env.channel_id,
+        "rx_time": env.packet.rx_time,
+        "rx_snr": env.packet.rx_snr,
+        "rx_rssi": env.packet.rx_rssi,
+        "hop_limit": env.packet.hop_limit,
+        "hop_start": env.packet.hop_start,
+        "topic": topic,
+        "import_time_us": now_us,
+    }
+
+
+def _traceroute_values(env, gateway_node_id, now_us):
+    return {
+        "packet_id": env.packet.id,
+        "route": env.packet.decoded.payload,
+        "done": not env.packet.decoded.want_response,
+        "gateway_node_id": gateway_node_id,
+        "import_time_us": now_us,
+    }
+
+
+def _telemetry_values(env, telemetry, now_us):
+    node_id = getattr(env.packet, "from")
+    return [
+        {
+            "packet_id": env.packet.id,
+            "metric": metric,
+            "node_id": node_id,
+            "time_us": now_us,
+            "value": value,
+        }
+        for metric, value in decode_payload.telemetry_metrics(telemetry)
+    ]
+
+
+def _position_values(env, fix, now_us):
+    return {
+        "packet_id": env.packet.id,
+        "node_id": getattr(env.packet, "from"),
+        "time_us": now_us,
+        **fix,
+    }
+
+
+def _rollup_key(env, now_us):
+    """packet_hourly key an envelope's packet and receptions are counted under."""
+    return (
+        now_us - now_us % ROLLUP_INTERVAL_US,
+        env.channel_id,
+        env.packet.decoded.portnum,
+        getattr(env.packet, "from"),
+    )
+
+
+def _packet_hourly_rows(counts):
+    # Channel names are already interned by the packet and packet_seen rows
+    return [
+        {
+            "hour_us": hour_us,
+            "channel_id": CHANNELS.ids[channel],
+            "portnum": portnum,
+            "from_node_id": from_node_id,
+            "packets": packets,
+            "seen": seen,
+        }
+        for (hour_us, channel, portnum, from_node_id), (packets, seen) in counts.items()
+    ]
+
+
+def _text_message_values(env, text, now_us):
+    return {"packet_id": env.packet.id, "time_us": now_us, "text": text}
+
+
+def _edge_values(from_node_id, to_node_id, edge_type, snr, now_us):
+    return {
+        "from_node_id": from_node_id,
+        "to_node_id": to_node_id,
+        "type": edge_type,
+        "first_seen_us": now_us,
+        "last_seen_us": now_us,
+        "count": 1,
+        "last_snr": snr,
+    }
+
+
+def _traceroute_edges(env, gateway_node_id, new_packet, now_us):
+    """Edges along a traceroute path, the same path ``/api/edges`` used to rebuild.
+
+    Every gateway uplinks the same route, so its hops are only counted for the first
+    copy of a packet; the final hop to an unfinished route's gateway is per gateway.
+    """
+    route = decode_payload.decode_payload(PortNum.TRACEROUTE_APP, env.packet.decoded.payload)
+    if route is None:
+        return []
+    done = not env.packet.decoded.want_response
+    path = [getattr(env.packet, "from"), *route.route]
+    path.append(env.packet.to if done else gateway_node_id)
+
+    edges = []
+    for hop, (a, b) in enumerate(zip(path, path[1:], strict=False)):
+        # snr_towards lines up with the forward hops of a request still in flight;
+        # -128 marks a hop whose SNR is unknown.
+        snr = None
+        if not done and hop < len(route.snr_towards) and route.snr_towards[hop] != -128:
+            snr = route.snr_towards[hop] / 4
+        edges.append(_edge_values(a, b, "traceroute", snr, now_us))
+    if not new_packet:
+        return edges[-1:] if not done else []
+    return edges
+
+
+def _neighbor_edges(env, now_us):
+    neighbor_info = decode_payload.decode_payload(
+        PortNum.NEIGHBORINFO_APP, env.packet.decoded.payload
+    )
+    if neighbor_info is None:
+        return []
+    node_id = getattr(env.packet, "from")
+    return [
+        _edge_values(neighbor.node_id, node_id, "neighbor", neighbor.snr, now_us)
+        for neighbor in neighbor_info.neighbors
+    ]
+
+
+def _merge_edges(edges, new_edges):
+    """Coalesce edge rows by key so a batch writes each edge once."""
+    for values in new_edges:
+        key = (values["from_node_id"], values["to_node_id"], values["type"])
+        existing = edges.get(key)
+        if existing is None:
+            edges[key] = values
+            continue
+        existing["count"] += values["count"]
+        existing["last_seen_us"] = values["last_seen_us"]
+        if values["last_snr"] is not None:
+            existing["last_snr"] = values["last_snr"]
+
+
+def _public_key_values(node_id, public_key, now_us):
+    return {
+        "node_id": node_id,
+        "public_key": public_key,
+        "first_seen_us": now_us,
+        "last_seen_us": now_us,
+    }
+
+
+def _map_report_values(env, map_report, now_us):
+    node_id = getattr(env.packet, "from")
+    hw_model = (
+        HardwareModel.Name(map_report.hw_model) if hasattr(HardwareModel, "Name") else "unknown"
+    )
+    role = (
+        Config.DeviceConfig.Role.Name(map_report.role)
+        if hasattr(Config.DeviceConfig.Role, "Name")
+        else "unknown"
+    )
+    return {
+        "id": f"!{node_id:0{8}x}",
+        "node_id": node_id,
+        "long_name": map_report.long_name,
+        "short_name": map_report.short_name,
+        "hw_model": hw_model,
+        "role": role,
+        "channel": env.channel_id,
+        "firmware": map_report.firmware_version,
+        "last_lat": map_report.latitude_i,
+        "last_long": map_report.longitude_i,
+        "first_seen_us": now_us,
+        "last_seen_us": now_us,
+    }
+
+
+def _node_info_values(env, user, now_us):
+    if user.id[0] == "!" and re.fullmatch(r"[0-9a-fA-F]+", user.id[1:]):
+        node_id = int(user.id[1:], 16)
+    else:
+        node_id = None
+
+    hw_model = (
+        HardwareModel.Name(user.hw_model)
+        if user.hw_model in HardwareModel.values()
+        else f"unknown({user.hw_model})"
+    )
+    role = (
+        Config.DeviceConfig.Role.Name(user.role)
+        if hasattr(Config.DeviceConfig.Role, "Name")
+        else "unknown"
+    )
+    return {
+        "id": user.id,
+        "node_id": node_id,
+        "long_name": user.long_name,
+        "short_name": user.short_name,
+        "hw_model": hw_model,
+        "role": role,
+        "channel": env.channel_id,
+        "first_seen_us": now_us,
+        "last_seen_us": now_us,
+    }
+
+
+class NodeCache:
+    """In-memory copy of the node table with coalesced write-back.
+
+    Ingestion applies NODEINFO, POSITION and MAP_REPORT updates here instead of
+    reading and rewriting the row. Rows whose fields actually changed are marked
+    dirty and written by ``flush`` in one bulk upsert. Reports that change nothing
+    only advance ``last_seen_us`` in memory, and are written at most once per
+    ``last_seen_interval_us``.
+    """
+
+    def __init__(self, last_seen_interval_us=60_000_000):
+        self.last_seen_interval_us = last_seen_interval_us
+        self.nodes = {}
+        self.ids_by_node_id = {}
+        self.persisted_last_seen = {}
+        self.pending_gateways = set()
+        self.dirty = set()
+        self.skipped_writes = 0
+        self.flushed_rows = 0
+
+    async def load(self):
+        async with mqtt_database.async_session() as session:
+            result = await session.execute(select(*Node.__table__.columns))
+            for row in result.mappings():
+                self._store(dict(row))
+                self.persisted_last_seen[row["id"]] = row["last_seen_us"]
+        logger.info(f"Loaded {len(self.nodes)} nodes into the node cache")
+
+    def _store(self, state):
+        self.nodes[state["id"]] = state
+        if state["node_id"] is not None:
+            self.ids_by_node_id[state["node_id"]] = state["id"]
+
+    def _merge(self, key, values):
+        state = self.nodes.get(key)
+        if state is None:
+            state = dict.fromkeys(NODE_COLUMNS)
+            state.update(values)
+            state["id"] = key
+            if state["node_id"] in self.pending_gateways:
+                self.pending_gateways.discard(state["node_id"])
+                state["is_mqtt_gateway"] = True
+            self._store(state)
+            self.dirty.add(key)
+            return
+
+        changed = False
+        for column, value in values.items():
+            if column in _NODE_TIME_FIELDS:
+                continue
+            if state[column] != value:
+                if column == "node_id":
+                    self.ids_by_node_id.pop(state["node_id"], None)
+                state[column] = value
+                changed = True
+        if changed:
+            self._store(state)
+
+        last_seen_us = values.get("last_seen_us")
+        if last_seen_us is not None:
+            state["last_seen_us"] = max(state["last_seen_us"] or 0, last_seen_us)
+        if state["first_seen_us"] is None:
+            state["first_seen_us"] = values.get("first_seen_us", last_seen_us)
+            changed = True
+
+        persisted = self.persisted_last_seen.get(key) or 0
+        if changed or (state["last_seen_us"] or 0) - persisted >= self.last_seen_interval_us:
+            self.dirty.add(key)
+        elif key not in self.dirty:
+            self.skipped_writes += 1
+
+    def apply_map_report(self, values):
+        key = self.ids_by_node_id.get(values["node_id"], values["id"])
+        self._merge(key, values)
+
+    def apply_node_info(self, values):
+        self._merge(values["id"], values)
+
+    def apply_position(self, node_id, latitude_i, longitude_i, now_us):
+        # Positions only update nodes we already know about.
+        key = self.ids_by_node_id.get(node_id)
+        if key is None:
+            return
+        self._merge(
+            key,
+            {
+                "last_lat": latitude_i,
+                "last_long": longitude_i,
+                "first_seen_us": now_us,
+                "last_seen_us": now_us,
+            },
+        )
+
+    def mark_gateway(self, node_id):
+        key = self.ids_by_node_id.get(node_id)
+        if key is None:
+            self.pending_gateways.add(node_id)
+            return
+        state = self.nodes[key]
+        if not state["is_mqtt_gateway"]:
+            state["is_mqtt_gateway"] = True
+            self.dirty.add(key)
+
+    def evict_older_than(self, cutoff_us):
+        """Forget nodes that retention cleanup removed from the database."""
+        for key, state in list(self.nodes.items()):
+            if state["last_seen_us"] is not None and state["last_seen_us"] < cutoff_us:
+                del self.nodes[key]
+                self.ids_by_node_id.pop(state["node_id"], None)
+                self.persisted_last_seen.pop(key, None)
+                self.dirty.discard(key)
+
+    async def flush(self):
+        """Write every dirty node in one upsert; return the number of rows written."""
+        if not self.dirty:
+            return 0
+
+        # Cleared up front so changes made while writing mark their node again
+        keys = list(self.dirty)
+        self.dirty.clear()
+        rows = [dict(self.nodes[key]) for key in keys if key in self.nodes]
+
+        try:
+            async with mqtt_database.async_session() as session:
+                stmt = _upsert_node(session.get_bind().dialect.name, NODE_COLUMNS)
+                try:
+                    with DB_WRITE_SECONDS.time("node_upsert"):
+                        await session.execute(stmt, rows)
+                        await session.commit()
+                except Exception:
+                    # Fall back to row-by-row so one conflicting node (e.g. a node_id
+                    # claimed by two ids) cannot block every other update.
+                    await session.rollback()
+                    logger.exception(
+                        f"Bulk node upsert of {len(rows)} rows failed, retrying singly"
                     )
-                    session.add(node)
-            except Exception as e:
-                print(f"Error processing MAP_REPORT_APP: {e}")
+                    written = []
+                    for row in rows:
+                        try:
+                            async with session.begin_nested():
+                                await session.execute(stmt, row)
+                            written.append(row)
+                        except Exception as e:
+                            logger.warning(f"Dropping node update for {row['id']}: {e}")
+                    await session.commit()
+                    rows = written
+        except BaseException:
+            # Nothing was committed; keep the nodes dirty for the next flush
+            self.dirty.update(key for key in keys if key in self.nodes)
+            raise
 
-            await session.commit()
+        for row in rows:
+            self.persisted_last_seen[row["id"]] = row["last_seen_us"]
+        self.flushed_rows += len(rows)
+        return len(rows)
+
+
+NODE_CACHE = NodeCache()
+
+metrics.REGISTRY.gauge(
+    "meshview_node_cache_nodes", "Nodes held in memory", fn=lambda: len(NODE_CACHE.nodes)
+)
+metrics.REGISTRY.gauge(
+    "meshview_node_cache_dirty",
+    "Nodes waiting to be written back",
+    fn=lambda: len(NODE_CACHE.dirty),
+)
+metrics.REGISTRY.counter(
+    "meshview_node_cache_skipped_writes_total",
+    "Node reports that changed nothing and needed no write",
+    fn=lambda: NODE_CACHE.skipped_writes,
+)
+metrics.REGISTRY.counter(
+    "meshview_node_cache_flushed_rows_total",
+    "Node rows written back to the database",
+    fn=lambda: NODE_CACHE.flushed_rows,
+)
+
+
+async def process_envelope(topic, env):
+    # MAP_REPORT_APP
+    if env.packet.decoded.portnum == PortNum.MAP_REPORT_APP:
+        map_report = decode_payload.decode_payload(
+            PortNum.MAP_REPORT_APP, env.packet.decoded.payload
+        )
+        try:
+            NODE_CACHE.apply_map_report(_map_report_values(env, map_report, _now_us()))
+        except Exception as e:
+            print(f"Error processing MAP_REPORT_APP: {e}")
 
     if not env.packet.id:
         return
 
-    async with mqtt_database.async_session() as session:
-        # --- Packet insert with ON CONFLICT DO NOTHING
-        result = await session.execute(select(Packet).where(Packet.id == env.packet.id))
-        packet = result.scalar_one_or_none()
-        if not packet:
-            now_us = int(time.time() * 1_000_000)
-            packet_values = {
-                "id": env.packet.id,
-                "portnum": env.packet.decoded.portnum,
-                "from_node_id": getattr(env.packet, "from"),
-                "to_node_id": env.packet.to,
-                "payload": env.packet.SerializeToString(),
-                "import_time_us": now_us,
-                "channel": env.channel_id,
-            }
-            dialect = session.get_bind().dialect.name
-            stmt = None
-
-            if dialect == "sqlite":
-                stmt = (
-                    sqlite_insert(Packet)
-                    .values(**packet_values)
-                    .on_conflict_do_nothing(index_elements=["id"])
-                )
-            elif dialect == "postgresql":
-                stmt = (
-                    pg_insert(Packet)
-                    .values(**packet_values)
-                    .on_conflict_do_nothing(index_elements=["id"])
-                )
+    # Rows are built up front so their channel and topic can be interned first
+    packet_written = dedupe.UPLINKS.packet_written(env.packet.id)
+    node_id = _gateway_node_id(env)
+    packet_values = None if packet_written else _packet_values(env, _now_us())
+    seen_values = None
+    if node_id is not None:
+        seen_values = _packet_seen_values(topic, env, node_id, _now_us())
+    await _intern_names([values for values in (packet_values, seen_values) if values])
 
-            if stmt is not None:
-                await session.execute(stmt)
-            else:
-                try:
-                    async with session.begin_nested():
-                        session.add(Packet(**packet_values))
-                        await session.flush()
-                except IntegrityError:
-                    pass
-
-        # --- PacketSeen (no conflict handling here, normal insert)
+    async with mqtt_database.async_session() as session:
+        # --- Packet insert with ON CONFLICT DO NOTHING, unless another uplink wrote it
+        packet_inserted = False
+        if not packet_written:
+            packet_inserted = await _insert_or_ignore(session, Packet, ["id"], packet_values)
 
-        if not env.gateway_id:
+        # --- PacketSeen insert, skipping receptions that are already stored
+        if node_id is None:
             print("WARNING: Missing gateway_id, skipping PacketSeen entry")
             # Most likely a misconfiguration of a mqtt publisher?
             return
-        else:
-            node_id = int(env.gateway_id[1:], 16)
 
-        if node_id not in MQTT_GATEWAY_CACHE:
-            MQTT_GATEWAY_CACHE.add(node_id)
-            await session.execute(
-                update(Node).where(Node.node_id == node_id).values(is_mqtt_gateway=True)
-            )
+        NODE_CACHE.mark_gateway(node_id)
 
-        result = await session.execute(
-            select(PacketSeen).where(
-                PacketSeen.packet_id == env.packet.id,
-                PacketSeen.node_id == node_id,
-                PacketSeen.rx_time == env.packet.rx_time,
-            )
-        )
-        if not result.scalar_one_or_none():
-            now_us = int(time.time() * 1_000_000)
-            seen = PacketSeen(
-                packet_id=env.packet.id,
-                node_id=int(env.gateway_id[1:], 16),
-                channel=env.channel_id,
-                rx_time=env.packet.rx_time,
-                rx_snr=env.packet.rx_snr,
-                rx_rssi=env.packet.rx_rssi,
-                hop_limit=env.packet.hop_limit,
-                hop_start=env.packet.hop_start,
-                topic=topic,
-                import_time_us=now_us,
-            )
-            session.add(seen)
+        seen_inserted = False
+        if await _unstored_receptions(session, [seen_values]):
+            seen_inserted = await _insert_or_ignore(session, PacketSeen, None, seen_values)
+
+        # --- Hourly rollup of what was actually written
+        if packet_inserted or seen_inserted:
+            counts = {_rollup_key(env, _now_us()): (int(packet_inserted), int(seen_inserted))}
+            with DB_WRITE_SECONDS.time("packet_hourly_upsert"):
+                await session.execute(
+                    _upsert_packet_hourly(session.get_bind().dialect.name),
+                    _packet_hourly_rows(counts),
+                )
 
         # --- NODEINFO_APP handling
         if env.packet.decoded.portnum == PortNum.NODEINFO_APP:
@@ -169,73 +655,18 @@ async def process_envelope(topic, env):
                     PortNum.NODEINFO_APP, env.packet.decoded.payload
                 )
                 if user and user.id:
-                    if user.id[0] == "!" and re.fullmatch(r"[0-9a-fA-F]+", user.id[1:]):
-                        node_id = int(user.id[1:], 16)
-                    else:
-                        node_id = None
-
-                    hw_model = (
-                        HardwareModel.Name(user.hw_model)
-                        if user.hw_model in HardwareModel.values()
-                        else f"unknown({user.hw_model})"
-                    )
-                    role = (
-                        Config.DeviceConfig.Role.Name(user.role)
-                        if hasattr(Config.DeviceConfig.Role, "Name")
-                        else "unknown"
-                    )
+                    now_us = _now_us()
+                    values = _node_info_values(env, user, now_us)
+                    NODE_CACHE.apply_node_info(values)
 
-                    node = (
-                        await session.execute(select(Node).where(Node.id == user.id))
-                    ).scalar_one_or_none()
-
-                    now_us = int(time.time() * 1_000_000)
-
-                    if node:
-                        node.node_id = node_id
-                        node.long_name = user.long_name
-                        node.short_name = user.short_name
-                        node.hw_model = hw_model
-                        node.role = role
-                        node.channel = env.channel_id
-                        node.last_seen_us = now_us
-                        if node.first_seen_us is None:
-                            node.first_seen_us = now_us
-                    else:
-                        node = Node(
-                            id=user.id,
-                            node_id=node_id,
-                            long_name=user.long_name,
-                            short_name=user.short_name,
-                            hw_model=hw_model,
-                            role=role,
-                            channel=env.channel_id,
-                            first_seen_us=now_us,
-                            last_seen_us=now_us,
-                        )
-                        session.add(node)
-
-                    if user.public_key:
-                        public_key_hex = user.public_key.hex()
-                        existing_key = (
+                    if user.public_key and values["node_id"] is not None:
+                        with DB_WRITE_SECONDS.time("node_public_key_upsert"):
                             await session.execute(
-                                select(NodePublicKey).where(
-                                    NodePublicKey.node_id == node_id,
-                                    NodePublicKey.public_key == public_key_hex,
-                                )
-                            )
-                        ).scalar_one_or_none()
-
-                        if existing_key:
-                            existing_key.last_seen_us = now_us
-                        else:
-                            new_key = NodePublicKey(
-                                node_id=node_id,
-                                public_key=public_key_hex,
-                                first_seen_us=now_us,
-                                last_seen_us=now_us,
+                                _upsert_public_key(session.get_bind().dialect.name),
+                                _public_key_values(
+                                    values["node_id"], user.public_key.hex(), now_us
+                                ),
                             )
-                            session.add(new_key)
             except Exception as e:
                 print(f"Error processing NODEINFO_APP: {e}")
 
@@ -244,41 +675,234 @@ async def process_envelope(topic, env):
             position = decode_payload.decode_payload(
                 PortNum.POSITION_APP, env.packet.decoded.payload
             )
-            if position and position.latitude_i and position.longitude_i:
-                from_node_id = getattr(env.packet, "from")
-                node = (
-                    await session.execute(select(Node).where(Node.node_id == from_node_id))
-                ).scalar_one_or_none()
-                if node:
-                    now_us = int(time.time() * 1_000_000)
-                    node.last_lat = position.latitude_i
-                    node.last_long = position.longitude_i
-                    node.last_seen_us = now_us
-                    if node.first_seen_us is None:
-                        node.first_seen_us = now_us
-                    session.add(node)
+            fix = decode_payload.position_fix(position) if position else None
+            if fix:
+                now_us = _now_us()
+                NODE_CACHE.apply_position(
+                    getattr(env.packet, "from"),
+                    position.latitude_i,
+                    position.longitude_i,
+                    now_us,
+                )
+                if not packet_written:
+                    await _insert_or_ignore(
+                        session, Position, ["packet_id"], _position_values(env, fix, now_us)
+                    )
+
+        # --- TELEMETRY_APP: one row per metric, written once per packet
+        if env.packet.decoded.portnum == PortNum.TELEMETRY_APP and not packet_written:
+            telemetry = decode_payload.decode_payload(
+                PortNum.TELEMETRY_APP, env.packet.decoded.payload
+            )
+            if telemetry:
+                for values in _telemetry_values(env, telemetry, _now_us()):
+                    await _insert_or_ignore(session, Telemetry, ["packet_id", "metric"], values)
+
+        # --- TEXT_MESSAGE_APP: decoded text for search, written once per packet
+        if env.packet.decoded.portnum == PortNum.TEXT_MESSAGE_APP and not packet_written:
+            text = decode_payload.decode_payload(
+                PortNum.TEXT_MESSAGE_APP, env.packet.decoded.payload
+            )
+            if text:
+                await _insert_or_ignore(
+                    session, TextMessage, ["packet_id"], _text_message_values(env, text, _now_us())
+                )
 
         # --- TRACEROUTE_APP (no conflict handling, normal insert)
+        edges = []
         if env.packet.decoded.portnum == PortNum.TRACEROUTE_APP:
-            packet_id = env.packet.id
-            if packet_id is not None:
-                now_us = int(time.time() * 1_000_000)
-                session.add(
-                    Traceroute(
-                        packet_id=packet_id,
-                        route=env.packet.decoded.payload,
-                        done=not env.packet.decoded.want_response,
-                        gateway_node_id=int(env.gateway_id[1:], 16),
-                        import_time_us=now_us,
-                    )
-                )
+            now_us = _now_us()
+            session.add(Traceroute(**_traceroute_values(env, node_id, now_us)))
+            edges = _traceroute_edges(env, node_id, not packet_written, now_us)
 
-        await session.commit()
+        # --- NEIGHBORINFO_APP: one edge per reported neighbor, once per packet
+        if env.packet.decoded.portnum == PortNum.NEIGHBORINFO_APP and not packet_written:
+            edges = _neighbor_edges(env, _now_us())
 
+        if edges:
+            with DB_WRITE_SECONDS.time("edge_upsert"):
+                await session.execute(_upsert_edge(session.get_bind().dialect.name), edges)
 
-async def load_gateway_cache():
-    async with mqtt_database.async_session() as session:
-        result = await session.execute(
-            select(Node.node_id).where(Node.is_mqtt_gateway == True)  # noqa: E712
+        with DB_WRITE_SECONDS.time("commit"):
+            await session.commit()
+    dedupe.UPLINKS.remember_packets((env.packet.id,))
+
+
+@dataclass
+class IngestBatch:
+    """Rows collected from many envelopes, written together by ``write_batch``."""
+
+    envelopes: list = field(default_factory=list)
+    packets: dict = field(default_factory=dict)
+    packets_seen: dict = field(default_factory=dict)
+    traceroutes: list = field(default_factory=list)
+    telemetry: list = field(default_factory=list)
+    positions: list = field(default_factory=list)
+    edges: dict = field(default_factory=dict)
+    text_messages: list = field(default_factory=list)
+    rollup_keys: dict = field(default_factory=dict)
+    public_keys: dict = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.envelopes)
+
+
+def collect_envelope(batch, topic, env):
+    """Decode an envelope into row dicts on ``batch`` without touching the database.
+
+    Mirrors ``process_envelope``: rows for the same key are coalesced so that every
+    table can be written with a single statement per flush. Node changes go to
+    ``NODE_CACHE``, which has its own write-back schedule.
+    """
+    batch.envelopes.append((topic, env))
+    now_us = _now_us()
+    portnum = env.packet.decoded.portnum
+
+    if portnum == PortNum.MAP_REPORT_APP:
+        map_report = decode_payload.decode_payload(
+            PortNum.MAP_REPORT_APP, env.packet.decoded.payload
         )
-        MQTT_GATEWAY_CACHE.update(result.scalars().all())
+        try:
+            NODE_CACHE.apply_map_report(_map_report_values(env, map_report, now_us))
+        except Exception as e:
+            logger.warning(f"Error processing MAP_REPORT_APP: {e}")
+
+    if not env.packet.id:
+        return
+
+    gateway_node_id = _gateway_node_id(env)
+    if gateway_node_id is None:
+        logger.warning("Missing gateway_id, skipping packet %s", env.packet.id)
+        return
+
+    new_packet = env.packet.id not in batch.packets and not dedupe.UPLINKS.packet_written(
+        env.packet.id
+    )
+    if new_packet:
+        batch.packets[env.packet.id] = _packet_values(env, now_us)
+    batch.rollup_keys.setdefault(env.packet.id, _rollup_key(env, now_us))
+    NODE_CACHE.mark_gateway(gateway_node_id)
+
+    seen_key = (env.packet.id, gateway_node_id, env.packet.rx_time)
+    batch.packets_seen.setdefault(
+        seen_key, _packet_seen_values(topic, env, gateway_node_id, now_us)
+    )
+
+    if portnum == PortNum.NODEINFO_APP:
+        try:
+            user = decode_payload.decode_payload(PortNum.NODEINFO_APP, env.packet.decoded.payload)
+            if user and user.id:
+                values = _node_info_values(env, user, now_us)
+                NODE_CACHE.apply_node_info(values)
+                if user.public_key and values["node_id"] is not None:
+                    batch.public_keys[(values["node_id"], user.public_key.hex())] = now_us
+        except Exception as e:
+            logger.warning(f"Error processing NODEINFO_APP: {e}")
+
+    elif portnum == PortNum.POSITION_APP:
+        position = decode_payload.decode_payload(PortNum.POSITION_APP, env.packet.decoded.payload)
+        fix = decode_payload.position_fix(position) if position else None
+        if fix:
+            NODE_CACHE.apply_position(
+                getattr(env.packet, "from"), position.latitude_i, position.longitude_i, now_us
+            )
+            if new_packet:
+                batch.positions.append(_position_values(env, fix, now_us))
+
+    elif portnum == PortNum.TELEMETRY_APP and new_packet:
+        telemetry = decode_payload.decode_payload(PortNum.TELEMETRY_APP, env.packet.decoded.payload)
+        if telemetry:
+            batch.telemetry.extend(_telemetry_values(env, telemetry, now_us))
+
+    elif portnum == PortNum.TEXT_MESSAGE_APP and new_packet:
+        text = decode_payload.decode_payload(PortNum.TEXT_MESSAGE_APP, env.packet.decoded.payload)
+        if text:
+            batch.text_messages.append(_text_message_values(env, text, now_us))
+
+    elif portnum == PortNum.TRACEROUTE_APP:
+        batch.traceroutes.append(_traceroute_values(env, gateway_node_id, now_us))
+        _merge_edges(batch.edges, _traceroute_edges(env, gateway_node_id, new_packet, now_us))
+
+    elif portnum == PortNum.NEIGHBORINFO_APP and new_packet:
+        _merge_edges(batch.edges, _neighbor_edges(env, now_us))
+
+
+async def write_batch(batch):
+    """Write everything collected in ``batch`` in one transaction.
+
+    Each table gets a single executemany statement, so a flush costs a handful of
+    round trips regardless of how many envelopes it holds.
+    """
+    await _intern_names([*batch.packets.values(), *batch.packets_seen.values()])
+
+    async with mqtt_database.async_session() as session:
+        dialect = session.get_bind().dialect.name
+
+        # RETURNING reports the rows that were actually new, for the hourly rollup
+        counts = {}
+        if batch.packets:
+            with DB_WRITE_SECONDS.time("packet_insert"):
+                result = await session.execute(
+                    _insert_ignore(dialect, Packet, ["id"]).returning(Packet.id),
+                    list(batch.packets.values()),
+                )
+            for packet_id in result.scalars():
+                counts.setdefault(batch.rollup_keys[packet_id], [0, 0])[0] += 1
+
+        packets_seen = await _unstored_receptions(session, list(batch.packets_seen.values()))
+        if packets_seen:
+            with DB_WRITE_SECONDS.time("packet_seen_insert"):
+                result = await session.execute(
+                    _insert_ignore(dialect, PacketSeen, None).returning(PacketSeen.packet_id),
+                    packets_seen,
+                )
+            for packet_id in result.scalars():
+                counts.setdefault(batch.rollup_keys[packet_id], [0, 0])[1] += 1
+
+        if counts:
+            with DB_WRITE_SECONDS.time("packet_hourly_upsert"):
+                await session.execute(_upsert_packet_hourly(dialect), _packet_hourly_rows(counts))
+
+        if batch.traceroutes:
+            with DB_WRITE_SECONDS.time("traceroute_insert"):
+                await session.execute(Traceroute.__table__.insert(), batch.traceroutes)
+
+        if batch.telemetry:
+            with DB_WRITE_SECONDS.time("telemetry_insert"):
+                await session.execute(
+                    _insert_ignore(dialect, Telemetry, ["packet_id", "metric"]), batch.telemetry
+                )
+
+        if batch.positions:
+            with DB_WRITE_SECONDS.time("position_insert"):
+                await session.execute(
+                    _insert_ignore(dialect, Position, ["packet_id"]), batch.positions
+                )
+
+        if batch.text_messages:
+            with DB_WRITE_SECONDS.time("text_message_insert"):
+                await session.execute(
+                    _insert_ignore(dialect, TextMessage, ["packet_id"]), batch.text_messages
+                )
+
+        if batch.edges:
+            with DB_WRITE_SECONDS.time("edge_upsert"):
+                await session.execute(_upsert_edge(dialect), list(batch.edges.values()))
+
+        if batch.public_keys:
+            with DB_WRITE_SECONDS.time("node_public_key_upsert"):
+                await session.execute(
+                    _upsert_public_key(dialect),
+                    [
+                        _public_key_values(node_id, public_key, seen_us)
+                        for (node_id, public_key), seen_us in batch.public_keys.items()
+                    ],
+                )
+
+        with DB_WRITE_SECONDS.time("commit"):
+            await session.commit()
+    dedupe.UPLINKS.remember_packets(batch.packets)
+
+
+async def load_node_cache():
+    await NODE_CACHE.load()
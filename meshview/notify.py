@@ -63,3 +63,47 @@ def subscribe(node_id):
         raise
     finally:
         remove_event(event)
+
+
+# -------------------------
+# Live packet stream
+# -------------------------
+class PacketSubscription:
+    """One /api/stream/packets client.
+
+    ``matches`` decides which packets it wants. Packets are queued as
+    (packet, serialized) pairs; a client that falls ``queue_size`` packets behind
+    is evicted rather than slowing everyone else down.
+    """
+
+    def __init__(self, matches, queue_size):
+        self.matches = matches
+        self.queue = asyncio.Queue(queue_size)
+        self.evicted = False
+
+
+packet_subscriptions = set()
+
+
+def notify_packets(packets):
+    """Queue each (packet, serialized) pair for every subscription that wants it."""
+    for subscription in list(packet_subscriptions):
+        for item in packets:
+            if not subscription.matches(item[0]):
+                continue
+            try:
+                subscription.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                subscription.evicted = True
+                packet_subscriptions.discard(subscription)
+                break
+
+
+@contextlib.contextmanager
+def subscribe_packets(matches, queue_size):
+    subscription = PacketSubscription(matches, queue_size)
+    packet_subscriptions.add(subscription)
+    try:
+        yield subscription
+    finally:
+        packet_subscriptions.discard(subscription)
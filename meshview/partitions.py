@@ -0,0 +1,100 @@
+"""Daily range partitions for the largest PostgreSQL tables.
+
+packet_seen and traceroute are partitioned on import_time_us, when the row was
+stored, so a range expires exactly when retention says it does. PostgreSQL requires
+the partition key in every unique constraint, so it joins both primary keys and
+ingest checks packet_seen for repeated receptions itself (see mqtt_store). Everything stored before partitioning was enabled stays in
+``<table>_before<YYYYMMDD>``, the old table attached as one partition up to that
+day. Rows outside every range (gateway clocks far ahead) go to the small DEFAULT
+partition. Retention cleanup empties both with ordinary deletes until a whole
+range has expired; expiring a whole range is a DROP TABLE of its partition.
+
+packet itself isn't partitioned: PostgreSQL requires the partition key in every
+unique constraint, and packets are deduplicated on id alone. SQLite has no
+partitioning and keeps using batched deletes.
+"""
+
+import datetime
+import logging
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("packet_seen", "traceroute")
+
+# Partitions are created this many days ahead, so gateways with clocks slightly
+# ahead still land in a daily partition rather than DEFAULT.
+DAYS_AHEAD = 3
+
+
+def partition_name(table, day):
+    return f"{table}_p{day:%Y%m%d}"
+
+
+def _day_start_us(day):
+    start = datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.UTC)
+    return int(start.timestamp()) * 1_000_000
+
+
+async def _partitions(conn, table):
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:table AS regclass)"
+        ),
+        {"table": table},
+    )
+    return result.scalars().all()
+
+
+async def create_partitions(conn, today, days_ahead=DAYS_AHEAD):
+    """Create the missing daily partitions for the days after ``today``.
+
+    Today is left alone: if its partition doesn't exist yet, its rows are already in
+    DEFAULT, and a partition can't be created over rows DEFAULT holds. Returns the
+    names of the partitions created.
+    """
+    created = []
+    for table in PARTITIONED_TABLES:
+        existing = set(await _partitions(conn, table))
+        for offset in range(1, days_ahead + 1):
+            day = today + datetime.timedelta(days=offset)
+            name = partition_name(table, day)
+            if name in existing:
+                continue
+            low = _day_start_us(day)
+            high = _day_start_us(day + datetime.timedelta(days=1))
+            try:
+                async with conn.begin_nested():
+                    await conn.exec_driver_sql(
+                        f"CREATE TABLE {name} PARTITION OF {table} "
+                        f"FOR VALUES FROM ({low}) TO ({high})"
+                    )
+            except DBAPIError as e:
+                # DEFAULT already holds rows for that day, e.g. from a gateway whose
+                # clock runs days ahead; they stay there until retention removes them.
+                logger.warning(f"Could not create partition {name}: {e}")
+                continue
+            created.append(name)
+    return created
+
+
+async def drop_partitions_before(conn, cutoff_us):
+    """Drop the partitions that end at or before ``cutoff_us``; returns their names."""
+    dropped = []
+    for table in PARTITIONED_TABLES:
+        for name in await _partitions(conn, table):
+            match = re.fullmatch(rf"{table}_(p|before)(\d{{8}})", name)
+            if not match:
+                continue
+            # A daily partition ends the day after its date, the pre-partitioning one on it
+            end = datetime.datetime.strptime(match[2], "%Y%m%d").date()
+            if match[1] == "p":
+                end += datetime.timedelta(days=1)
+            if _day_start_us(end) <= cutoff_us:
+                await conn.exec_driver_sql(f'DROP TABLE "{name}"')
+                dropped.append(name)
+    return dropped
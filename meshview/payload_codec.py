@@ -0,0 +1,202 @@
+"""Storage format for ``Packet.payload``.
+
+Legacy rows hold a full serialized MeshPacket. A serialized protobuf never starts
+with a 0x00 byte (field number 0 is invalid), so compact rows are marked by one::
+
+    0x00 0x01 <MeshPacket>                          compact
+    0x00 0x02 <u16 dictionary id> <raw deflate>     compact, then compressed
+
+The compact MeshPacket keeps only what readers use. Reception details (rx_time,
+SNR, hops, relay) are per gateway and already live in packet_seen, and id/from/to
+are columns on the row, so they are dropped on write and restored on read.
+
+Compression uses a preset dictionary stored in the payload_dictionary table
+(id 0 means none). Packets are a few dozen bytes, too short for deflate to find
+repeats on its own; a dictionary built from earlier traffic supplies them.
+"""
+
+import logging
+import struct
+import time
+import zlib
+from collections import Counter
+
+from google.protobuf.message import DecodeError
+from sqlalchemy import select
+
+from meshtastic.protobuf.mesh_pb2 import MeshPacket
+from meshview.models import PayloadDictionary
+
+logger = logging.getLogger(__name__)
+
+MAGIC = 0x00
+FORMAT_COMPACT = 0x01
+FORMAT_DEFLATE = 0x02
+DEFLATE_HEADER = struct.Struct("<BBH")
+
+# Fields written to storage; everything else is dropped or restored from columns
+KEPT_FIELDS = (
+    "channel",
+    "decoded",
+    "encrypted",
+    "want_ack",
+    "priority",
+    "delayed",
+    "public_key",
+    "pki_encrypted",
+)
+
+MAX_DICTIONARY_SIZE = 32768  # deflate's window; anything further back is unreachable
+
+# Writers only start using a dictionary this long after it was created, so readers
+# refreshing on DICTIONARY_REFRESH_INTERVAL have loaded it before rows need it.
+DICTIONARY_REFRESH_INTERVAL = 60  # seconds
+DICTIONARY_GRACE_US = 3 * DICTIONARY_REFRESH_INTERVAL * 1_000_000
+
+# Format new rows are written in; set from [ingest] payload_format by startdb.py
+PAYLOAD_FORMATS = ("full", "compact", "compressed")
+WRITE_FORMAT = "full"
+
+DICTIONARIES = {}  # id -> bytes
+_created_us = {}  # id -> created_us
+_missing = set()
+
+
+def compact(packet):
+    """Copy of ``packet`` with only the stored fields set."""
+    stored = MeshPacket()
+    stored.CopyFrom(packet)
+    for field, _ in stored.ListFields():
+        if field.name not in KEPT_FIELDS:
+            stored.ClearField(field.name)
+    return stored
+
+
+def encode(packet):
+    """Serialize ``packet`` for Packet.payload in WRITE_FORMAT."""
+    if WRITE_FORMAT == "full":
+        return packet.SerializeToString()
+    body = compact(packet).SerializeToString()
+    if WRITE_FORMAT == "compressed":
+        return compress(body, current_dictionary_id())
+    return bytes((MAGIC, FORMAT_COMPACT)) + body
+
+
+def compress(body, dictionary_id):
+    """Deflate a compact body with the given dictionary (0 for none), falling back to
+    the uncompressed compact form when that is smaller."""
+    zdict = DICTIONARIES.get(dictionary_id) if dictionary_id else None
+    if zdict:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    compressed = compressor.compress(body) + compressor.flush()
+    if DEFLATE_HEADER.size + len(compressed) >= 2 + len(body):
+        return bytes((MAGIC, FORMAT_COMPACT)) + body
+    return DEFLATE_HEADER.pack(MAGIC, FORMAT_DEFLATE, dictionary_id if zdict else 0) + compressed
+
+
+def needs_rewrite(data):
+    """Whether a stored payload should be rewritten to match WRITE_FORMAT."""
+    if not data:
+        return False
+    if WRITE_FORMAT == "full":
+        return is_compact(data)
+    if not is_compact(data):
+        return True
+    return WRITE_FORMAT == "compressed" and data[1] == FORMAT_COMPACT
+
+
+def is_compact(data):
+    return bool(data) and data[0] == MAGIC
+
+
+def decode(data, packet_id=None, from_node_id=None, to_node_id=None):
+    """Parse a stored payload of either format into a MeshPacket.
+
+    Raises DecodeError for data that isn't a payload, including compressed rows
+    whose dictionary hasn't been loaded.
+    """
+    if not is_compact(data):
+        return MeshPacket.FromString(data)
+
+    if len(data) < 2:
+        raise DecodeError("Truncated payload header")
+    if data[1] == FORMAT_COMPACT:
+        body = data[2:]
+    elif data[1] == FORMAT_DEFLATE:
+        if len(data) < DEFLATE_HEADER.size:
+            raise DecodeError("Truncated payload header")
+        _, _, dictionary_id = DEFLATE_HEADER.unpack_from(data)
+        zdict = None
+        if dictionary_id:
+            zdict = DICTIONARIES.get(dictionary_id)
+            if zdict is None:
+                if dictionary_id not in _missing:
+                    _missing.add(dictionary_id)
+                    logger.warning(f"Payload dictionary {dictionary_id} is not loaded")
+                raise DecodeError(f"Unknown payload dictionary {dictionary_id}")
+        if zdict:
+            decompressor = zlib.decompressobj(-15, zdict=zdict)
+        else:
+            decompressor = zlib.decompressobj(-15)
+        try:
+            body = decompressor.decompress(data[DEFLATE_HEADER.size :]) + decompressor.flush()
+        except zlib.error as e:
+            raise DecodeError(str(e)) from e
+    else:
+        raise DecodeError(f"Unknown payload format {data[1]}")
+
+    packet = MeshPacket.FromString(body)
+    if packet_id is not None:
+        packet.id = packet_id
+    if from_node_id is not None:
+        setattr(packet, "from", from_node_id)
+    if to_node_id is not None:
+        packet.to = to_node_id
+    return packet
+
+
+def train_dictionary(samples, size=MAX_DICTIONARY_SIZE, fragment=16, step=4):
+    """Build a preset dictionary from sample compact bodies.
+
+    Counts fixed-size fragments across the samples and keeps those that recur,
+    least common first: deflate encodes nearer matches more cheaply, and the end
+    of the dictionary is nearest to the data.
+    """
+    counts = Counter()
+    for sample in samples:
+        seen = set()
+        for start in range(0, max(len(sample) - fragment, 0) + 1, step):
+            piece = sample[start : start + fragment]
+            if piece not in seen:
+                seen.add(piece)
+                counts[piece] += 1
+
+    chosen = []
+    total = 0
+    for piece, count in counts.most_common():
+        if count < 2 or total + len(piece) > size:
+            break
+        chosen.append(piece)
+        total += len(piece)
+    return b"".join(reversed(chosen))
+
+
+async def load_dictionaries(session):
+    """Load dictionaries added since the last call into DICTIONARIES."""
+    stmt = select(PayloadDictionary)
+    if DICTIONARIES:
+        stmt = stmt.where(PayloadDictionary.id.not_in(list(DICTIONARIES)))
+    for dictionary in (await session.execute(stmt)).scalars():
+        DICTIONARIES[dictionary.id] = dictionary.data
+        _created_us[dictionary.id] = dictionary.created_us
+        _missing.discard(dictionary.id)
+        logger.info(f"Loaded payload dictionary {dictionary.id} ({len(dictionary.data)} bytes)")
+
+
+def current_dictionary_id():
+    """Newest loaded dictionary that every reader has had time to load, or 0."""
+    cutoff_us = int(time.time() * 1_000_000) - DICTIONARY_GRACE_US
+    usable = [id_ for id_, created_us in _created_us.items() if created_us <= cutoff_us]
+    return max(usable, default=0)
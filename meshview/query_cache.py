@@ -0,0 +1,238 @@
+"""Cached responses for the web server's read endpoints.
+
+Aggregates like /api/stats or /api/edges only change as fast as ingest writes, so
+their JSON bodies are kept and reused, keyed on the path and its query string.
+An entry is served as-is for its endpoint's ``ttl``. After that it is checked
+against ``DATA_VERSION``: if the database hasn't changed since the entry was
+computed it stays valid (up to ``MAX_AGE``, since many queries are relative to
+the current time), otherwise it is recomputed.
+
+``DATA_VERSION`` is SQLite's ``PRAGMA data_version``, which changes whenever
+another connection commits, or on PostgreSQL the total of rows inserted, updated
+and deleted in every table (from the statistics collector, so up to a second or
+so behind).
+
+``conditional`` adds ETags for endpoints clients poll. The tag is derived from a
+cheap watermark query rather than the response, so an unchanged resource is
+answered 304 without running the endpoint at all. Stacked over ``cached``, the
+watermark is stored with each entry and an entry computed under another
+watermark is a miss, so a body is never sent under a tag it doesn't match.
+"""
+
+import asyncio
+import functools
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+
+from aiohttp import web
+from sqlalchemy import text
+
+from meshview import database, metrics
+
+logger = logging.getLogger(__name__)
+
+_WATERMARK = "query_cache.watermark"  # request key set by conditional for cached
+
+MAX_AGE = 600  # seconds an entry may live even when the database is unchanged
+
+
+class DataVersion:
+    """Token that changes whenever the database does; re-read at most every
+    ``check_interval`` seconds."""
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.value = None
+        self.checked_at = 0.0
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def current(self):
+        if time.monotonic() - self.checked_at < self.check_interval:
+            return self.value
+        async with self._lock:
+            if time.monotonic() - self.checked_at >= self.check_interval:
+                try:
+                    self.value = await self._read()
+                except Exception as e:
+                    logger.warning(f"Could not read the database version: {e}")
+                    self.value = None
+                self.checked_at = time.monotonic()
+        return self.value
+
+    async def _read(self):
+        if database.engine.dialect.name == "sqlite":
+            # data_version is only comparable on the same connection, so keep one
+            if self._conn is None:
+                self._conn = await database.engine.connect()
+            try:
+                value = (await self._conn.exec_driver_sql("PRAGMA data_version")).scalar()
+                await self._conn.rollback()
+            except Exception:
+                conn, self._conn = self._conn, None
+                await conn.close()
+                raise
+            return value
+        async with database.async_session() as session:
+            return await session.scalar(
+                text("SELECT sum(n_tup_ins + n_tup_upd + n_tup_del) FROM pg_stat_user_tables")
+            )
+
+    async def close(self):
+        """Return the connection kept for SQLite to the pool."""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await conn.close()
+
+
+class ResponseCache:
+    """LRU cache of response bodies, holding at most ``max_bytes`` of them."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (body, stored_at, version, watermark)
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key, ttl, watermark=None):
+        entry = self._entries.get(key)
+        if entry is not None:
+            body, stored_at, version, entry_watermark = entry
+            age = time.monotonic() - stored_at
+            if entry_watermark == watermark and (
+                age < ttl
+                or (
+                    age < MAX_AGE
+                    and version is not None
+                    and version == await DATA_VERSION.current()
+                )
+            ):
+                self._entries.move_to_end(key)
+                self.hits[key[0]] = self.hits.get(key[0], 0) + 1
+                return body
+            self._remove(key)
+        self.misses[key[0]] = self.misses.get(key[0], 0) + 1
+        return None
+
+    def put(self, key, body, version, watermark=None):
+        if self.max_bytes <= 0 or len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (body, time.monotonic(), version, watermark)
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        body, _, _, _ = self._entries.pop(key)
+        self.bytes -= len(body)
+
+
+DATA_VERSION = DataVersion()
+RESPONSES = ResponseCache()
+
+
+def cached(ttl):
+    """Cache a JSON handler's successful responses for ``ttl`` seconds (see module doc).
+
+    Goes under the ``@routes.get`` decorator.
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            if RESPONSES.max_bytes <= 0:
+                return await handler(request)
+            key = (request.path, tuple(sorted(request.query.items())))
+            watermark = request.get(_WATERMARK)
+            body = await RESPONSES.get(key, ttl, watermark)
+            if body is not None:
+                return web.Response(body=body, content_type="application/json")
+
+            # Read before computing: a change made meanwhile then invalidates the entry
+            version = await DATA_VERSION.current()
+            response = await handler(request)
+            if response.status == 200 and isinstance(response.body, bytes):
+                RESPONSES.put(key, response.body, version, watermark)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def conditional(watermark, max_age):
+    """Answer If-None-Match with 304 while ``watermark(request)`` is unchanged.
+
+    ``watermark`` is an async callable returning a value that changes whenever the
+    response would; the ETag is a hash of it, the path and the query string.
+    Responses also tell clients to wait ``max_age`` seconds before asking again.
+    Goes under the ``@routes.get`` decorator, above ``cached``.
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            try:
+                value = await watermark(request)
+            except Exception as e:
+                logger.warning(f"Could not compute ETag for {request.path}: {e}")
+                return await handler(request)
+
+            request[_WATERMARK] = value
+            key = repr((request.path, sorted(request.query.items()), value))
+            etag = hashlib.sha1(key.encode()).hexdigest()[:24]
+            cache_control = f"max-age={max_age}"
+            if any(tag.value in (etag, "*") for tag in request.if_none_match or ()):
+                NOT_MODIFIED.inc(request.path)
+                response = web.Response(status=304, headers={"Cache-Control": cache_control})
+            else:
+                response = await handler(request)
+                if response.status != 200:
+                    return response
+                response.headers["Cache-Control"] = cache_control
+            response.etag = etag
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+NOT_MODIFIED = metrics.REGISTRY.counter(
+    "meshview_not_modified_total",
+    "Requests answered 304 Not Modified from a matching ETag, by path",
+    ("path",),
+)
+metrics.REGISTRY.counter(
+    "meshview_response_cache_hits_total",
+    "Responses served from the response cache, by path",
+    ("path",),
+    fn=lambda: {(path,): count for path, count in RESPONSES.hits.items()},
+)
+metrics.REGISTRY.counter(
+    "meshview_response_cache_misses_total",
+    "Responses computed because nothing valid was cached, by path",
+    ("path",),
+    fn=lambda: {(path,): count for path, count in RESPONSES.misses.items()},
+)
+metrics.REGISTRY.counter(
+    "meshview_response_cache_evictions_total",
+    "Entries dropped to stay under the response cache's memory cap",
+    fn=lambda: RESPONSES.evictions,
+)
+metrics.REGISTRY.gauge(
+    "meshview_response_cache_bytes", "Bytes of cached response bodies", fn=lambda: RESPONSES.bytes
+)
+metrics.REGISTRY.gauge(
+    "meshview_response_cache_entries", "Cached responses", fn=lambda: len(RESPONSES)
+)
@@ -0,0 +1,52 @@
+"""Coalescing of identical concurrent store queries.
+
+When several requests ask for the same thing at once (a shared link to the stats
+page, every open map polling together), only the first runs the query; the rest
+wait for its result. Callers share the returned objects, so they must not modify
+them. Nothing is kept once the call finishes; that is query_cache's job.
+"""
+
+import asyncio
+import functools
+
+from meshview import metrics
+
+_in_flight = {}  # (function, args, kwargs) -> asyncio.Task
+
+CALLS = metrics.REGISTRY.counter(
+    "meshview_store_calls_total",
+    "Calls to coalesced store functions, by function and whether they ran the query "
+    "(leader) or waited for an identical call already running (coalesced)",
+    ("function", "result"),
+)
+
+
+def _finished(key, task):
+    _in_flight.pop(key, None)
+    if not task.cancelled():
+        # Mark a failure as seen even if every caller was cancelled meanwhile
+        task.exception()
+
+
+def coalesce(fn):
+    """Share one in-flight call of ``fn`` among concurrent calls with equal arguments.
+
+    Arguments must be hashable. A caller being cancelled doesn't cancel the query
+    for the others.
+    """
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        key = (name, args, tuple(sorted(kwargs.items())))
+        task = _in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            _in_flight[key] = task
+            task.add_done_callback(functools.partial(_finished, key))
+            CALLS.inc(name, "leader")
+        else:
+            CALLS.inc(name, "coalesced")
+        return await asyncio.shield(task)
+
+    return wrapper
@@ -0,0 +1,172 @@
+"""Crash-safe, append-only on-disk spool for MQTT envelopes.
+
+When the database writer falls behind, envelopes are appended to ``spool.dat``
+instead of piling up in memory, and replayed in order once the writer recovers.
+
+Each record is a fixed header followed by the topic and the serialized envelope::
+
+    <u32 payload length> <u32 crc32> <f64 receive time> <u16 topic length> topic payload
+
+The read position is kept in ``spool.offset`` and replaced atomically after each
+replayed chunk, so a crash replays at most one chunk twice (which the database's
+ON CONFLICT handling absorbs). A record torn by a crash mid-append fails its
+checksum and is truncated away when the spool is reopened.
+"""
+
+import logging
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+
+from meshtastic.protobuf.mqtt_pb2 import ServiceEnvelope
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("<IIdH")
+
+
+class Spool:
+    def __init__(self, directory, fsync_interval=1.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.directory / "spool.dat"
+        self.offset_path = self.directory / "spool.offset"
+        self.fsync_interval = fsync_interval
+
+        self.read_offset = self._load_offset()
+        self.depth = 0
+        self.oldest_time = None
+        self.appended = 0
+        self.replayed = 0
+        self._last_fsync = 0.0
+        self._pending = (0, 0)
+
+        self._recover()
+        self._writer = open(self.data_path, "ab")
+        self._reader = open(self.data_path, "rb")
+
+    def _load_offset(self):
+        try:
+            return int(self.offset_path.read_text().strip() or 0)
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            logger.warning(f"Ignoring unreadable spool offset in {self.offset_path}")
+            return 0
+
+    def _recover(self):
+        """Count pending records and cut off a torn record at the end of the file."""
+        if not self.data_path.exists():
+            self.read_offset = 0
+            return
+
+        size = self.data_path.stat().st_size
+        if self.read_offset > size:
+            self.read_offset = 0
+        with open(self.data_path, "rb") as f:
+            f.seek(self.read_offset)
+            end = self.read_offset
+            while (record := self._read_record(f)) is not None:
+                recv_time, _, _ = record
+                if self.oldest_time is None:
+                    self.oldest_time = recv_time
+                self.depth += 1
+                end = f.tell()
+
+        if end < size:
+            logger.warning(f"Truncating {size - end} bytes of incomplete spool data")
+            os.truncate(self.data_path, end)
+        if self.depth:
+            logger.info(f"Spool {self.data_path} has {self.depth} envelopes waiting to replay")
+
+    @staticmethod
+    def _read_record(f):
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        length, crc, recv_time, topic_length = HEADER.unpack(header)
+        body = f.read(topic_length + length)
+        if len(body) < topic_length + length or zlib.crc32(body) != crc:
+            return None
+        return recv_time, body[:topic_length].decode("utf-8"), body[topic_length:]
+
+    def __len__(self):
+        return self.depth
+
+    def age(self):
+        """Seconds since the oldest pending envelope was received (0 when empty)."""
+        return time.time() - self.oldest_time if self.depth else 0.0
+
+    def append(self, topic, env):
+        topic_bytes = topic.encode("utf-8")
+        payload = env.SerializeToString()
+        recv_time = time.time()
+        body = topic_bytes + payload
+        self._writer.write(HEADER.pack(len(payload), zlib.crc32(body), recv_time, len(topic_bytes)))
+        self._writer.write(body)
+        self._writer.flush()
+        if recv_time - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._writer.fileno())
+            self._last_fsync = recv_time
+
+        if not self.depth:
+            self.oldest_time = recv_time
+        self.depth += 1
+        self.appended += 1
+
+    def read(self, max_records):
+        """Return up to ``max_records`` pending (topic, envelope) pairs.
+
+        They stay pending until ``commit`` is called, so they are replayed again if
+        the process dies before they reach the writer.
+        """
+        self._reader.seek(self.read_offset)
+        records = []
+        consumed = 0
+        while consumed < max_records:
+            record = self._read_record(self._reader)
+            if record is None:
+                break
+            consumed += 1
+            _, topic, payload = record
+            try:
+                records.append((topic, ServiceEnvelope.FromString(payload)))
+            except Exception:
+                logger.exception("Skipping unreadable spooled envelope")
+        self._pending = (self._reader.tell() if consumed else self.read_offset, consumed)
+        return records
+
+    def commit(self):
+        """Mark everything returned by the last ``read`` as replayed."""
+        offset, consumed = self._pending
+        self._pending = (self.read_offset, 0)
+        self.depth = max(self.depth - consumed, 0)
+        self.replayed += consumed
+        if self.depth:
+            self._reader.seek(offset)
+            self.oldest_time = self._read_record(self._reader)[0]
+        else:
+            # Fully drained: start the file over instead of growing it forever
+            self._writer.truncate(0)
+            self.oldest_time = None
+            offset = 0
+        self.read_offset = offset
+
+        tmp_path = self.offset_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.offset_path)
+
+    def summary(self):
+        return (
+            f"{self.depth} envelopes spooled (oldest {self.age():.1f}s), "
+            f"{self.appended} appended, {self.replayed} replayed"
+        )
+
+    def close(self):
+        self._writer.close()
+        self._reader.close()
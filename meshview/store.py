@@ -1,21 +1,103 @@
 import logging
+import time
 from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import Text, and_, cast, func, or_, select
+from sqlalchemy import Text, and_, cast, column, func, literal, or_, select, text, union_all
 from sqlalchemy.orm import lazyload
 
-from meshview import database, models
-from meshview.models import Node, Packet, PacketSeen, Traceroute
+from meshview import database, models, payload_codec, singleflight
+from meshview.models import (
+    ROLLUP_INTERVAL_US,
+    Channel,
+    Edge,
+    Node,
+    Packet,
+    PacketHourly,
+    PacketSeen,
+    Position,
+    Telemetry,
+    TextMessage,
+    Topic,
+    Traceroute,
+)
 
 logger = logging.getLogger(__name__)
 
 
+class InternedNames:
+    """Read-side copy of an interned name table (Channel, Topic).
+
+    The writer only ever adds rows, so the copy is reloaded when a lookup misses,
+    at most once per ``reload_interval`` seconds.
+    """
+
+    def __init__(self, model, reload_interval=30):
+        self.model = model
+        self.reload_interval = reload_interval
+        self.names = {}
+        self.loaded_at = None
+
+    async def _reload(self, session):
+        now = time.monotonic()
+        if self.loaded_at is not None and now - self.loaded_at < self.reload_interval:
+            return
+        result = await session.execute(select(self.model.id, self.model.name))
+        self.names = dict(result.all())
+        self.loaded_at = now
+
+    def _matching(self, name):
+        wanted = name.lower()
+        return [id_ for id_, known in self.names.items() if known.lower() == wanted]
+
+    async def ids_for(self, session, name):
+        """Ids of every name equal to ``name`` ignoring case."""
+        ids = self._matching(name)
+        if not ids:
+            await self._reload(session)
+            ids = self._matching(name)
+        return ids
+
+    async def names_for(self, session, ids):
+        if any(id_ not in self.names for id_ in ids):
+            await self._reload(session)
+        return [self.names[id_] for id_ in ids if id_ in self.names]
+
+    async def by_id(self, session, ids):
+        """Mapping of id -> name covering ``ids`` where known."""
+        if any(id_ is not None and id_ not in self.names for id_ in ids):
+            await self._reload(session)
+        return self.names
+
+
+CHANNEL_NAMES = InternedNames(Channel)
+TOPIC_NAMES = InternedNames(Topic)
+
+
+async def _with_names(session, rows):
+    """Fill in ``channel`` (and ``topic`` on PacketSeen) from the name caches."""
+    rows = list(rows)
+    channels = await CHANNEL_NAMES.by_id(session, {row.channel_id for row in rows})
+    for row in rows:
+        row.channel = channels.get(row.channel_id)
+    seen = [row for row in rows if isinstance(row, PacketSeen)]
+    if seen:
+        topics = await TOPIC_NAMES.by_id(session, {row.topic_id for row in seen})
+        for row in seen:
+            row.topic = topics.get(row.topic_id)
+    return rows
+
+
 async def get_node(node_id):
     async with database.async_session() as session:
         result = await session.execute(select(Node).where(Node.node_id == node_id))
         return result.scalar_one_or_none()
 
 
+async def load_payload_dictionaries():
+    async with database.async_session() as session:
+        await payload_codec.load_dictionaries(session)
+
+
 async def get_fuzzy_nodes(query):
     async with database.async_session() as session:
         q = select(Node).where(
@@ -35,6 +117,7 @@ async def get_packets(
     after=None,
     contains=None,  # substring search
     limit=50,
+    before=None,
 ):
     async with database.async_session() as session:
         stmt = select(models.Packet)
@@ -64,6 +147,8 @@ async def get_packets(
         # Timestamp filter using microseconds
         if after is not None:
             conditions.append(models.Packet.import_time_us > after)
+        if before is not None:
+            conditions.append(models.Packet.import_time_us < before)
 
         # Case-insensitive substring search on payload (BLOB → TEXT)
         if contains:
@@ -83,7 +168,71 @@ async def get_packets(
 
         # Run query
         result = await session.execute(stmt)
-        return result.scalars().all()
+        return await _with_names(session, result.scalars())
+
+
+async def get_packets_after(after, limit=500):
+    """Packets imported after ``after`` (microseconds), oldest first."""
+    async with database.async_session() as session:
+        stmt = (
+            select(models.Packet)
+            .where(models.Packet.import_time_us > after)
+            .order_by(models.Packet.import_time_us)
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        return await _with_names(session, result.scalars())
+
+
+def _text_search_condition(contains):
+    """WHERE clause selecting TextMessage rows whose text contains ``contains``."""
+    dialect = database.engine.dialect.name
+    if dialect == "sqlite" and len(contains) >= 3:
+        # The trigram FTS index needs at least one full trigram in the query
+        phrase = '"' + contains.replace('"', '""') + '"'
+        matches = text("SELECT rowid FROM text_message_fts WHERE text_message_fts MATCH :phrase")
+        return TextMessage.packet_id.in_(matches.bindparams(phrase=phrase).columns(column("rowid")))
+    if dialect == "postgresql":
+        return TextMessage.text.ilike(f"%{contains}%")
+    return func.lower(TextMessage.text).like(f"%{contains.lower()}%")
+
+
+async def search_text_messages(
+    contains,
+    from_node_id=None,
+    to_node_id=None,
+    node_id=None,
+    after=None,
+    before=None,
+    limit=50,
+):
+    """Return text message Packets containing ``contains`` (case-insensitive), newest first.
+
+    Matching runs on the text_message search index, so ``limit`` and the time
+    bounds page through every match rather than the newest raw packets.
+    """
+    conditions = [_text_search_condition(contains)]
+    if from_node_id is not None:
+        conditions.append(Packet.from_node_id == from_node_id)
+    if to_node_id is not None:
+        conditions.append(Packet.to_node_id == to_node_id)
+    if node_id is not None:
+        conditions.append(or_(Packet.from_node_id == node_id, Packet.to_node_id == node_id))
+    if after is not None:
+        conditions.append(TextMessage.time_us > after)
+    if before is not None:
+        conditions.append(TextMessage.time_us < before)
+
+    stmt = (
+        select(Packet)
+        .join(TextMessage, TextMessage.packet_id == Packet.id)
+        .where(and_(*conditions))
+        .order_by(TextMessage.time_us.desc())
+        .limit(limit)
+    )
+    async with database.async_session() as session:
+        result = await session.execute(stmt)
+        return await _with_names(session, result.scalars())
 
 
 async def get_packets_from(node_id=None, portnum=None, since=None, limit=500):
@@ -99,14 +248,17 @@ async def get_packets_from(node_id=None, portnum=None, since=None, limit=500):
             start_us = now_us - int(since.total_seconds() * 1_000_000)
             q = q.where(Packet.import_time_us > start_us)
         result = await session.execute(q.limit(limit).order_by(Packet.import_time_us.desc()))
-        return result.scalars()
+        return await _with_names(session, result.scalars())
 
 
 async def get_packet(packet_id):
     async with database.async_session() as session:
         q = select(Packet).where(Packet.id == packet_id)
         result = await session.execute(q)
-        return result.scalar_one_or_none()
+        packet = result.scalar_one_or_none()
+        if packet is not None:
+            await _with_names(session, [packet])
+        return packet
 
 
 async def get_packets_seen(packet_id):
@@ -116,7 +268,7 @@ async def get_packets_seen(packet_id):
             .where(PacketSeen.packet_id == packet_id)
             .order_by(PacketSeen.import_time_us.desc())
         )
-        return result.scalars()
+        return await _with_names(session, result.scalars())
 
 
 async def has_packets(node_id, portnum):
@@ -130,6 +282,100 @@ async def has_packets(node_id, portnum):
         )
 
 
+async def get_telemetry(node_id, metrics=None, since=None, until=None, limit=500):
+    """Return (metric, time_us, value) rows for a node, newest ``limit`` per metric.
+
+    ``metrics`` entries are full metric names ("device.voltage") or group names
+    ("device") matching every metric in that group.
+    """
+    conditions = [Telemetry.node_id == node_id]
+    if metrics:
+        conditions.append(
+            or_(
+                *(
+                    Telemetry.metric == name if "." in name else Telemetry.metric.like(f"{name}.%")
+                    for name in metrics
+                )
+            )
+        )
+    if since is not None:
+        conditions.append(Telemetry.time_us > since)
+    if until is not None:
+        conditions.append(Telemetry.time_us <= until)
+
+    ranked = (
+        select(
+            Telemetry.metric,
+            Telemetry.time_us,
+            Telemetry.value,
+            func.row_number()
+            .over(partition_by=Telemetry.metric, order_by=Telemetry.time_us.desc())
+            .label("rank"),
+        )
+        .where(and_(*conditions))
+        .subquery()
+    )
+    stmt = (
+        select(ranked.c.metric, ranked.c.time_us, ranked.c.value)
+        .where(ranked.c.rank <= limit)
+        .order_by(ranked.c.metric, ranked.c.time_us)
+    )
+    async with database.async_session() as session:
+        result = await session.execute(stmt)
+        return result.all()
+
+
+async def get_track(node_id, since=None, until=None, buckets=None):
+    """Return (total fixes, rows) for a node's position history, oldest first.
+
+    Rows are (time_us, latitude_i, longitude_i, altitude, precision_bits, sats_in_view).
+    With ``buckets``, a window holding more fixes than that is split into as many
+    equal time buckets and only the last fix of each (plus the very first) is read,
+    so a weeks-long track costs an index scan instead of a full fetch.
+    """
+    conditions = [Position.node_id == node_id]
+    if since is not None:
+        conditions.append(Position.time_us > since)
+    if until is not None:
+        conditions.append(Position.time_us <= until)
+    columns = (
+        Position.time_us,
+        Position.latitude_i,
+        Position.longitude_i,
+        Position.altitude,
+        Position.precision_bits,
+        Position.sats_in_view,
+    )
+
+    async with database.async_session() as session:
+        total, first_us, last_us = (
+            await session.execute(
+                select(func.count(), func.min(Position.time_us), func.max(Position.time_us)).where(
+                    and_(*conditions)
+                )
+            )
+        ).one()
+        if not total:
+            return 0, []
+
+        if buckets is None or total <= buckets:
+            stmt = select(*columns).where(and_(*conditions)).order_by(Position.time_us)
+            return total, (await session.execute(stmt)).all()
+
+        span_us = max(last_us - first_us, 1)
+        bucket = (Position.time_us - first_us) * buckets // span_us
+        bucket_ends = union_all(
+            select(func.max(Position.time_us)).where(and_(*conditions)).group_by(bucket),
+            select(literal(first_us)),
+        )
+        stmt = (
+            select(*columns)
+            .where(Position.node_id == node_id, Position.time_us.in_(bucket_ends))
+            .order_by(Position.time_us)
+        )
+        return total, (await session.execute(stmt)).all()
+
+
 async def get_traceroute(packet_id):
     async with database.async_session() as session:
         result = await session.execute(
@@ -156,6 +402,24 @@ async def get_traceroutes(since):
             yield tr
 
 
+@singleflight.coalesce
+async def get_edges(since=None, until=None, edge_type=None, node_id=None):
+    """Return Edge rows last seen in the window, optionally of one type or touching one node."""
+    stmt = select(Edge)
+    if since is not None:
+        stmt = stmt.where(Edge.last_seen_us > since)
+    if until is not None:
+        stmt = stmt.where(Edge.last_seen_us <= until)
+    if edge_type is not None:
+        stmt = stmt.where(Edge.type == edge_type)
+    if node_id is not None:
+        stmt = stmt.where(or_(Edge.from_node_id == node_id, Edge.to_node_id == node_id))
+
+    async with database.async_session() as session:
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+
 async def get_mqtt_neighbors(since):
     now_us = int(datetime.now().timestamp() * 1_000_000)
     start_us = now_us - int(since.total_seconds() * 1_000_000)
@@ -241,6 +505,61 @@ async def get_top_traffic_nodes():
         return []
 
 
+@singleflight.coalesce
+async def get_top_nodes_by_seen(period_type="day", length=1, channel=None, limit=20, offset=0):
+    """Nodes ordered by how often their packets were heard in the window ending at the
+    newest packet; returns (rows, total node count)."""
+    multiplier = 3600 if period_type == "hour" else 86400
+    window_us = length * multiplier * 1_000_000
+
+    max_packet_import = select(func.max(Packet.import_time_us)).scalar_subquery()
+    max_seen_import = select(func.max(PacketSeen.import_time_us)).scalar_subquery()
+
+    sent_cte = (
+        select(Packet.from_node_id.label("node_id"), func.count().label("sent"))
+        .where(Packet.import_time_us >= max_packet_import - window_us)
+        .group_by(Packet.from_node_id)
+        .cte("sent")
+    )
+
+    seen_cte = (
+        select(Packet.from_node_id.label("node_id"), func.count().label("seen"))
+        .select_from(PacketSeen)
+        .join(Packet, Packet.id == PacketSeen.packet_id)
+        .where(PacketSeen.import_time_us >= max_seen_import - window_us)
+        .group_by(Packet.from_node_id)
+        .cte("seen")
+    )
+
+    query = (
+        select(
+            Node.node_id,
+            Node.long_name,
+            Node.short_name,
+            Node.channel,
+            func.coalesce(sent_cte.c.sent, 0).label("sent"),
+            func.coalesce(seen_cte.c.seen, 0).label("seen"),
+        )
+        .select_from(Node)
+        .outerjoin(sent_cte, sent_cte.c.node_id == Node.node_id)
+        .outerjoin(seen_cte, seen_cte.c.node_id == Node.node_id)
+        .order_by(func.coalesce(seen_cte.c.seen, 0).desc())
+        .limit(limit)
+        .offset(offset)
+    )
+
+    count_query = select(func.count()).select_from(Node)
+
+    if channel:
+        query = query.where(Node.channel == channel)
+        count_query = count_query.where(Node.channel == channel)
+
+    async with database.async_session() as session:
+        rows = (await session.execute(query)).all()
+        total = (await session.execute(count_query)).scalar() or 0
+    return rows, total
+
+
 async def get_node_traffic(node_id: int):
     try:
         async with database.async_session() as session:
@@ -274,6 +593,22 @@ async def get_node_traffic(node_id: int):
         return []
 
 
+@singleflight.coalesce
+async def get_nodes_watermark():
+    """(newest last_seen_us, node count); changes whenever any node row does."""
+    async with database.async_session() as session:
+        result = await session.execute(select(func.max(Node.last_seen_us), func.count(Node.id)))
+        return tuple(result.one())
+
+
+@singleflight.coalesce
+async def get_packets_watermark():
+    """Newest packet import_time_us."""
+    async with database.async_session() as session:
+        return await session.scalar(select(func.max(Packet.import_time_us)))
+
+
+@singleflight.coalesce
 async def get_nodes(node_id=None, role=None, channel=None, hw_model=None, days_active=None):
     """
     Fetches nodes from the database based on optional filtering criteria.
@@ -329,6 +664,93 @@ async def get_nodes(node_id=None, role=None, channel=None, hw_model=None, days_a
         return []  # Return an empty list in case of failure
 
 
+def _rollup_boundary_us(start_us):
+    """First packet_hourly bucket that lies entirely inside a window starting at ``start_us``."""
+    return -(-start_us // ROLLUP_INTERVAL_US) * ROLLUP_INTERVAL_US
+
+
+async def _channel_ids(session, channel):
+    """Interned ids matching a channel filter, or None when there is no filter."""
+    if not channel:
+        return None
+    return await CHANNEL_NAMES.ids_for(session, channel)
+
+
+def _stats_filters(model, channel_ids=None, portnum=None, from_node=None):
+    """Filters shared by Packet and PacketHourly, which name these columns alike."""
+    conditions = []
+    if channel_ids is not None:
+        conditions.append(model.channel_id.in_(channel_ids))
+    if portnum is not None:
+        conditions.append(model.portnum == portnum)
+    if from_node:
+        conditions.append(model.from_node_id == from_node)
+    return conditions
+
+
+async def _rollup_total(session, seen, start_us, channel_ids=None, portnum=None, from_node=None):
+    """Count packets (or receptions when ``seen``) since ``start_us``.
+
+    Whole hours come from packet_hourly; only the partial hour at the start of the
+    window is counted from raw rows.
+    """
+    column = PacketHourly.seen if seen else PacketHourly.packets
+    q = select(func.coalesce(func.sum(column), 0)).where(
+        *_stats_filters(PacketHourly, channel_ids, portnum, from_node)
+    )
+    if start_us is None:
+        return (await session.execute(q)).scalar() or 0
+
+    boundary_us = _rollup_boundary_us(start_us)
+    rolled = (await session.execute(q.where(PacketHourly.hour_us >= boundary_us))).scalar() or 0
+
+    raw = select(func.count(PacketSeen.packet_id if seen else Packet.id))
+    if seen:
+        raw = raw.select_from(PacketSeen).join(Packet, Packet.id == PacketSeen.packet_id)
+    raw = raw.where(
+        Packet.import_time_us >= start_us,
+        Packet.import_time_us < boundary_us,
+        *_stats_filters(Packet, channel_ids, portnum, from_node),
+    )
+    return rolled + ((await session.execute(raw)).scalar() or 0)
+
+
+async def _raw_packet_stats(
+    session, start_us, time_format_sqlite, time_format_pg, channel_ids, portnum, to_node, from_node
+):
+    if session.get_bind().dialect.name == "postgresql":
+        period_expr = func.to_char(
+            func.to_timestamp(Packet.import_time_us / 1_000_000.0),
+            time_format_pg,
+        )
+    else:
+        period_expr = func.strftime(
+            time_format_sqlite,
+            func.datetime(Packet.import_time_us / 1_000_000, "unixepoch"),
+        )
+
+    q = select(
+        period_expr.label("period"),
+        func.count().label("count"),
+    ).where(Packet.import_time_us >= start_us)
+
+    # Filters
+    if channel_ids is not None:
+        q = q.where(Packet.channel_id.in_(channel_ids))
+    if portnum is not None:
+        q = q.where(Packet.portnum == portnum)
+    if to_node is not None:
+        q = q.where(Packet.to_node_id == to_node)
+    if from_node is not None:
+        q = q.where(Packet.from_node_id == from_node)
+
+    q = q.group_by('period').order_by('period')
+
+    result = await session.execute(q)
+    return [{"period": row.period, "count": row.count} for row in result]
+
+
+@singleflight.coalesce
 async def get_packet_stats(
     period_type: str = "day",
     length: int = 14,
@@ -350,38 +772,57 @@ async def get_packet_stats(
     else:
         raise ValueError("period_type must be 'hour' or 'day'")
 
+    start_us = int(start_time.timestamp() * 1_000_000)
+
     async with database.async_session() as session:
-        dialect = session.get_bind().dialect.name
-        if dialect == "postgresql":
-            period_expr = func.to_char(
-                func.to_timestamp(Packet.import_time_us / 1_000_000.0),
+        channel_ids = await _channel_ids(session, channel)
+        if to_node is not None:
+            # packet_hourly isn't keyed by recipient; the to_node index keeps this cheap
+            data = await _raw_packet_stats(
+                session,
+                start_us,
+                time_format_sqlite,
                 time_format_pg,
+                channel_ids,
+                portnum,
+                to_node,
+                from_node,
             )
         else:
-            period_expr = func.strftime(
-                time_format_sqlite,
-                func.datetime(Packet.import_time_us / 1_000_000, "unixepoch"),
+            # Whole hours from the rollup, the partial first hour from raw packets
+            boundary_us = _rollup_boundary_us(start_us)
+            q = (
+                select(PacketHourly.hour_us, func.sum(PacketHourly.packets).label("count"))
+                .where(
+                    PacketHourly.hour_us >= boundary_us,
+                    *_stats_filters(PacketHourly, channel_ids, portnum, from_node),
+                )
+                .group_by(PacketHourly.hour_us)
             )
+            counts = {}
+            for row in await session.execute(q):
+                hour_start = datetime.fromtimestamp(row.hour_us / 1_000_000, timezone.utc)  # noqa: UP017
+                period = hour_start.strftime(time_format_sqlite)
+                counts[period] = counts.get(period, 0) + row.count
 
-        q = select(
-            period_expr.label("period"),
-            func.count().label("count"),
-        ).where(Packet.import_time_us >= int(start_time.timestamp() * 1_000_000))
-
-        # Filters
-        if channel:
-            q = q.where(func.lower(Packet.channel) == channel.lower())
-        if portnum is not None:
-            q = q.where(Packet.portnum == portnum)
-        if to_node is not None:
-            q = q.where(Packet.to_node_id == to_node)
-        if from_node is not None:
-            q = q.where(Packet.from_node_id == from_node)
-
-        q = q.group_by('period').order_by('period')
-
-        result = await session.execute(q)
-        data = [{"period": row.period, "count": row.count} for row in result]
+            partial = (
+                await session.execute(
+                    select(func.count(Packet.id)).where(
+                        Packet.import_time_us >= start_us,
+                        Packet.import_time_us < boundary_us,
+                        *_stats_filters(Packet, channel_ids, portnum, from_node),
+                    )
+                )
+            ).scalar()
+            if partial:
+                period = start_time.strftime(time_format_sqlite)
+                counts[period] = counts.get(period, 0) + partial
+
+            data = [
+                {"period": period, "count": count}
+                for period, count in sorted(counts.items())
+                if count
+            ]
 
         return {
             "period_type": period_type,
@@ -394,6 +835,7 @@ async def get_packet_stats(
         }
 
 
+@singleflight.coalesce
 async def get_channels_in_period(period_type: str = "hour", length: int = 24):
     """
     Returns a sorted list of distinct channels used in packets over a given period.
@@ -411,21 +853,26 @@ async def get_channels_in_period(period_type: str = "hour", length: int = 24):
 
     start_us = now_us - delta_us
 
+    boundary_us = _rollup_boundary_us(start_us)
+
     async with database.async_session() as session:
-        stmt = (
-            select(Packet.channel)
-            .where(Packet.import_time_us >= start_us)
+        rolled = await session.execute(
+            select(PacketHourly.channel_id).where(PacketHourly.hour_us >= boundary_us).distinct()
+        )
+        raw = await session.execute(
+            select(Packet.channel_id)
+            .where(Packet.import_time_us >= start_us, Packet.import_time_us < boundary_us)
             .distinct()
-            .order_by(Packet.channel)
         )
 
-        result = await session.execute(stmt)
-
-        channels = [ch for ch in result.scalars().all() if ch is not None]
+        channel_ids = set(rolled.scalars().all())
+        channel_ids.update(raw.scalars().all())
+        channel_ids.discard(None)
 
-        return channels
+        return sorted(set(await CHANNEL_NAMES.names_for(session, channel_ids)))
 
 
+@singleflight.coalesce
 async def get_total_packet_count(
     period_type: str | None = None,
     length: int | None = None,
@@ -448,9 +895,7 @@ async def get_total_packet_count(
         and to_node is None
     ):
         async with database.async_session() as session:
-            q = select(func.count(Packet.id))
-            res = await session.execute(q)
-            return res.scalar() or 0
+            return await _rollup_total(session, False, None)
 
     # CASE 2: filtered mode -> compute time window using import_time_us
     now_us = int(datetime.now().timestamp() * 1_000_000)
@@ -468,10 +913,16 @@ async def get_total_packet_count(
         raise ValueError("period_type must be 'hour' or 'day'")
 
     async with database.async_session() as session:
+        channel_ids = await _channel_ids(session, channel)
+        if not to_node:
+            return await _rollup_total(
+                session, False, start_time_us, channel_ids=channel_ids, from_node=from_node
+            )
+
         q = select(func.count(Packet.id)).where(Packet.import_time_us >= start_time_us)
 
-        if channel:
-            q = q.where(func.lower(Packet.channel) == channel.lower())
+        if channel_ids is not None:
+            q = q.where(Packet.channel_id.in_(channel_ids))
         if from_node:
             q = q.where(Packet.from_node_id == from_node)
         if to_node:
@@ -481,6 +932,7 @@ async def get_total_packet_count(
         return res.scalar() or 0
 
 
+@singleflight.coalesce
 async def get_total_packet_seen_count(
     packet_id: int | None = None,
     period_type: str | None = None,
@@ -512,9 +964,7 @@ async def get_total_packet_seen_count(
         and to_node is None
     ):
         async with database.async_session() as session:
-            q = select(func.count(PacketSeen.packet_id))
-            res = await session.execute(q)
-            return res.scalar() or 0
+            return await _rollup_total(session, True, None)
 
     # Compute time window
     now_us = int(datetime.now().timestamp() * 1_000_000)
@@ -531,16 +981,22 @@ async def get_total_packet_seen_count(
     else:
         raise ValueError("period_type must be 'hour' or 'day'")
 
-    # JOIN Packet so we can apply identical filters
     async with database.async_session() as session:
+        channel_ids = await _channel_ids(session, channel)
+        if not to_node:
+            return await _rollup_total(
+                session, True, start_time_us, channel_ids=channel_ids, from_node=from_node
+            )
+
+        # JOIN Packet so we can apply identical filters
         q = (
             select(func.count(PacketSeen.packet_id))
             .join(Packet, Packet.id == PacketSeen.packet_id)
             .where(Packet.import_time_us >= start_time_us)
         )
 
-        if channel:
-            q = q.where(func.lower(Packet.channel) == channel.lower())
+        if channel_ids is not None:
+            q = q.where(Packet.channel_id.in_(channel_ids))
         if from_node:
             q = q.where(Packet.from_node_id == from_node)
         if to_node:
@@ -17,7 +17,17 @@ from jinja2 import Environment, PackageLoader, Undefined, select_autoescape
 from markupsafe import Markup
 
 from meshtastic.protobuf.portnums_pb2 import PortNum
-from meshview import config, database, decode_payload, migrations, models, store
+from meshview import (
+    config,
+    database,
+    decode_payload,
+    metrics,
+    migrations,
+    models,
+    payload_codec,
+    query_cache,
+    store,
+)
 from meshview.__version__ import (
     __version_string__,
 )
@@ -117,25 +127,14 @@ class Packet:
 
 
 async def build_trace(node_id):
-    """Build a recent GPS trace list for a node using position packets."""
-    trace = []
-    for raw_p in await store.get_packets_from(
-        node_id, PortNum.POSITION_APP, since=datetime.timedelta(hours=24)
-    ):
-        p = Packet.from_model(raw_p)
-        if not p.raw_payload or not p.raw_payload.latitude_i or not p.raw_payload.longitude_i:
-            continue
-        trace.append((p.raw_payload.latitude_i * 1e-7, p.raw_payload.longitude_i * 1e-7))
-
-    if not trace:
-        for raw_p in await store.get_packets_from(node_id, PortNum.POSITION_APP):
-            p = Packet.from_model(raw_p)
-            if not p.raw_payload or not p.raw_payload.latitude_i or not p.raw_payload.longitude_i:
-                continue
-            trace.append((p.raw_payload.latitude_i * 1e-7, p.raw_payload.longitude_i * 1e-7))
-            break
-
-    return trace
+    """Build a recent GPS trace list for a node from its stored position fixes."""
+    since_us = int((datetime.datetime.now() - datetime.timedelta(hours=24)).timestamp() * 1e6)
+    _, rows = await store.get_track(node_id, since=since_us)
+    if not rows:
+        # One bucket over the whole history keeps the first and the latest fix
+        _, rows = await store.get_track(node_id, buckets=1)
+        rows = rows[-1:]
+    return [(row.latitude_i * 1e-7, row.longitude_i * 1e-7) for row in rows]
 
 
 async def build_neighbors(node_id):
@@ -447,6 +446,13 @@ async def graph_traceroute(request):
     )
 
 
+async def handle_metrics(request):
+    return web.Response(
+        body=metrics.REGISTRY.render().encode("utf-8"),
+        headers={"Content-Type": metrics.CONTENT_TYPE},
+    )
+
+
 async def run_server():
     """Start the aiohttp web server after migrations are complete."""
     # Wait for database migrations to complete before starting web server
@@ -463,11 +469,25 @@ async def run_server():
         raise RuntimeError("Database schema version mismatch - migrations not complete")
 
     logger.info("Database schema verified - starting web server")
+    await store.load_payload_dictionaries()
+    try:
+        hot_window_packets = int(CONFIG["server"].get("hot_window_packets", 5000))
+    except ValueError:
+        hot_window_packets = 5000
+    api.start_packet_stream(hot_window_packets)
+    try:
+        query_cache.RESPONSES.max_bytes = (
+            int(CONFIG["server"].get("response_cache_mb", 32)) * 1024 * 1024
+        )
+    except ValueError:
+        pass
 
     app = web.Application()
     app.router.add_static("/static/", pathlib.Path(__file__).parent / "static")
     app.add_routes(api.routes)  # Add API routes
     app.add_routes(routes)  # Add main web routes
+    if CONFIG.get("metrics", {}).get("web_enabled", "False").lower() == "true":
+        app.router.add_get("/metrics", handle_metrics)
 
     # Check if access logging should be disabled
     enable_access_log = CONFIG.get("logging", {}).get("access_log", "False").lower() == "true"
@@ -490,5 +510,13 @@ async def run_server():
         # Display localhost instead of wildcard addresses for usability
         display_host = "localhost" if host in ("0.0.0.0", "*", "::") else host
         logger.info(f"Web server started at {protocol}://{display_host}:{port}")
-    while True:
-        await asyncio.sleep(3600)  # sleep forever
+    try:
+        while True:
+            # Compressed packets may reference dictionaries added since startup
+            await asyncio.sleep(payload_codec.DICTIONARY_REFRESH_INTERVAL)
+            try:
+                await store.load_payload_dictionaries()
+            except Exception as e:
+                logger.error(f"Error loading payload dictionaries: {e}")
+    finally:
+        await asyncio.shield(query_cache.DATA_VERSION.close())
@@ -1,21 +1,24 @@
 """API endpoints for MeshView."""
 
+import asyncio
 import datetime
 import json
 import logging
 import math
 import os
+import time
+from collections import deque
 
 from aiohttp import web
+from aiohttp_sse import sse_response
 from sqlalchemy import func, select
 
 from meshtastic.protobuf.portnums_pb2 import PortNum
-from meshview import database, decode_payload, store
+from meshview import database, decode_payload, metrics, notify, query_cache, store
 from meshview.__version__ import __version__, _git_revision_short, get_version_info
 from meshview.config import CONFIG
-from meshview.models import Node, NodePublicKey
+from meshview.models import NodePublicKey
 from meshview.models import Packet as PacketModel
-from meshview.models import PacketSeen as PacketSeenModel
 from meshview.radio.coverage import (
     DEFAULT_MAX_DBM,
     DEFAULT_MIN_DBM,
@@ -60,6 +63,48 @@ def _bearing_deg(lat1, lon1, lat2, lon2):
 
 OBSERVED_MAX_DISTANCE_KM = 50.0
 
+# /api/track reads up to this many fixes per returned point from the database
+TRACK_PRESELECT_FACTOR = 4
+
+
+def _thin_track(rows, max_points, min_distance_m):
+    """Reduce position fixes to at most ``max_points``, keeping the first and last.
+
+    Fixes closer than ``min_distance_m`` to the last kept one (a parked node's GPS
+    jitter) are dropped first. If the track is still too long it is cut into
+    ``max_points`` equal time buckets and the last fix in each bucket is kept.
+    """
+    if len(rows) <= 2:
+        return list(rows)
+
+    if min_distance_m > 0:
+        min_distance_km = min_distance_m / 1000.0
+        kept = [rows[0]]
+        for row in rows[1:-1]:
+            last = kept[-1]
+            if (
+                _haversine_km(
+                    last.latitude_i * 1e-7,
+                    last.longitude_i * 1e-7,
+                    row.latitude_i * 1e-7,
+                    row.longitude_i * 1e-7,
+                )
+                >= min_distance_km
+            ):
+                kept.append(row)
+        kept.append(rows[-1])
+        rows = kept
+
+    if len(rows) <= max_points:
+        return rows
+
+    start_us = rows[0].time_us
+    span_us = max(rows[-1].time_us - start_us, 1)
+    buckets = {}
+    for row in rows[1:-1]:
+        buckets[(row.time_us - start_us) * (max_points - 2) // span_us] = row
+    return [rows[0], *buckets.values(), rows[-1]]
+
 
 def init_api_module(packet_class, seq_regex, lang_dir):
     """Initialize API module with dependencies from main web module."""
@@ -69,7 +114,35 @@ def init_api_module(packet_class, seq_regex, lang_dir):
     LANG_DIR = lang_dir
 
 
+# Watermarks for query_cache.conditional: values that change whenever the
+# endpoint's response would.
+_STARTED_US = time.time_ns() // 1000  # config is only read at startup
+
+
+async def _nodes_watermark(request):
+    watermark = await store.get_nodes_watermark()
+    if request.query.get("days_active"):
+        # The days_active cutoff moves with time even when no node changes
+        return (*watermark, int(time.time()) // 60)
+    return watermark
+
+
+async def _stats_watermark(request):
+    # The stats window also moves on at each hour boundary
+    return await store.get_packets_watermark(), int(time.time()) // 3600
+
+
+async def _config_watermark(request):
+    return __version__, _STARTED_US
+
+
+async def _lang_watermark(request):
+    lang_file = _lang_file(request)
+    return lang_file, os.path.getmtime(lang_file)
+
+
 @routes.get("/api/channels")
+@query_cache.cached(ttl=300)
 async def api_channels(request: web.Request):
     period_type = request.query.get("period_type", "hour")
     length = int(request.query.get("length", 24))
@@ -82,6 +155,8 @@ async def api_channels(request: web.Request):
 
 
 @routes.get("/api/nodes")
+@query_cache.conditional(_nodes_watermark, max_age=30)
+@query_cache.cached(ttl=30)
 async def api_nodes(request):
     try:
         # Optional query parameters
@@ -131,6 +206,34 @@ async def api_nodes(request):
         return web.json_response({"error": "Failed to fetch nodes"}, status=500)
 
 
+def _packet_json(p):
+    """JSON shape of one packet in /api/packets and /api/stream/packets."""
+    packet_dict = {
+        "id": p.id,
+        "import_time_us": p.import_time_us,
+        "channel": p.channel,
+        "from_node_id": p.from_node_id,
+        "to_node_id": p.to_node_id,
+        "portnum": int(p.portnum),
+        "long_name": getattr(p.from_node, "long_name", ""),
+        "payload": (p.payload or "").strip(),
+        "to_long_name": getattr(p.to_node, "long_name", ""),
+    }
+
+    reply_id = getattr(
+        getattr(getattr(p, "raw_mesh_packet", None), "decoded", None),
+        "reply_id",
+        None,
+    )
+    if reply_id:
+        packet_dict["reply_id"] = reply_id
+    return packet_dict
+
+
+def _payloads_compressed():
+    return CONFIG.get("ingest", {}).get("payload_format", "full").strip().lower() == "compressed"
+
+
 @routes.get("/api/packets")
 async def api_packets(request):
     try:
@@ -138,6 +241,7 @@ async def api_packets(request):
         packet_id_str = request.query.get("packet_id")
         limit_str = request.query.get("limit", "50")
         since_str = request.query.get("since")
+        before_str = request.query.get("before")
         portnum_str = request.query.get("portnum")
         contains = request.query.get("contains")
 
@@ -184,6 +288,14 @@ async def api_packets(request):
             except ValueError:
                 logger.warning(f"Invalid 'since' value (expected microseconds): {since_str}")
 
+        # --- Parse before timestamp (paging back through older results) ---
+        before = None
+        if before_str:
+            try:
+                before = int(before_str)
+            except ValueError:
+                logger.warning(f"Invalid 'before' value (expected microseconds): {before_str}")
+
         # --- Parse portnum ---
         portnum = None
         if portnum_str:
@@ -215,28 +327,55 @@ async def api_packets(request):
             except ValueError:
                 logger.warning(f"Invalid node_id: {node_id_str}")
 
+        # --- Recent traffic is answered from memory when possible ---
+        if not contains and before is None:
+            # Text packets are filtered after the limit, as for the database below
+            packets_data = _hot_window_packets(
+                limit,
+                since,
+                _stream_filter(portnum, None, from_node_id, to_node_id, node_id, text_filter=False),
+            )
+            HOT_WINDOW_REQUESTS.inc("miss" if packets_data is None else "hit")
+            if packets_data is not None:
+                if portnum == PortNum.TEXT_MESSAGE_APP:
+                    packets_data = [p for p in packets_data if _shown_text(p)]
+                response = {"packets": packets_data}
+                if packets_data and packets_data[0]["import_time_us"]:
+                    response["latest_import_time"] = packets_data[0]["import_time_us"]
+                return web.json_response(response)
+
         # --- Fetch packets using explicit filters ---
-        contains_for_query = contains
-        if portnum == PortNum.TEXT_MESSAGE_APP and contains:
-            contains_for_query = None
-
-        packets = await store.get_packets(
-            from_node_id=from_node_id,
-            to_node_id=to_node_id,
-            node_id=node_id,
-            portnum=portnum,
-            after=since,
-            contains=contains_for_query,
-            limit=limit,
-        )
+        if contains and (
+            portnum == PortNum.TEXT_MESSAGE_APP or (portnum is None and _payloads_compressed())
+        ):
+            # Text search goes through the text_message index. Compressed payloads
+            # can't be matched with LIKE, so then any-portnum searches use it too.
+            packets = await store.search_text_messages(
+                contains,
+                from_node_id=from_node_id,
+                to_node_id=to_node_id,
+                node_id=node_id,
+                after=since,
+                before=before,
+                limit=limit,
+            )
+        else:
+            packets = await store.get_packets(
+                from_node_id=from_node_id,
+                to_node_id=to_node_id,
+                node_id=node_id,
+                portnum=portnum,
+                after=since,
+                before=before,
+                contains=contains,
+                limit=limit,
+            )
 
         ui_packets = [Packet.from_model(p) for p in packets]
 
         # --- Text message filtering ---
         if portnum == PortNum.TEXT_MESSAGE_APP:
             ui_packets = [p for p in ui_packets if p.payload and not SEQ_REGEX.fullmatch(p.payload)]
-            if contains:
-                ui_packets = [p for p in ui_packets if contains.lower() in p.payload.lower()]
 
         # --- Sort descending by import_time_us ---
         ui_packets.sort(
@@ -245,29 +384,7 @@ async def api_packets(request):
         ui_packets = ui_packets[:limit]
 
         # --- Build JSON output ---
-        packets_data = []
-        for p in ui_packets:
-            packet_dict = {
-                "id": p.id,
-                "import_time_us": p.import_time_us,
-                "channel": p.channel,
-                "from_node_id": p.from_node_id,
-                "to_node_id": p.to_node_id,
-                "portnum": int(p.portnum),
-                "long_name": getattr(p.from_node, "long_name", ""),
-                "payload": (p.payload or "").strip(),
-                "to_long_name": getattr(p.to_node, "long_name", ""),
-            }
-
-            reply_id = getattr(
-                getattr(getattr(p, "raw_mesh_packet", None), "decoded", None),
-                "reply_id",
-                None,
-            )
-            if reply_id:
-                packet_dict["reply_id"] = reply_id
-
-            packets_data.append(packet_dict)
+        packets_data = [_packet_json(p) for p in ui_packets]
 
         # --- Latest import_time_us for incremental fetch ---
         latest_import_time = None
@@ -287,7 +404,210 @@ async def api_packets(request):
         return web.json_response({"error": "Failed to fetch packets"}, status=500)
 
 
+# Live packet stream and hot window. One tail reader follows import_time_us and
+# fans each new packet out, decoded and serialized once, to every
+# /api/stream/packets client. The most recent packets stay in memory, where they
+# also answer /api/packets requests for recent traffic.
+STREAM_POLL_INTERVAL = 1  # seconds between tail reads
+STREAM_OVERLAP_US = 2_000_000  # re-read window for rows committed slightly out of order
+STREAM_READ_LIMIT = 500
+STREAM_RESUME_PACKETS = 1000  # recent packets kept for clients resuming from a cursor
+STREAM_QUEUE_SIZE = 500  # packets a client may fall behind before it is evicted
+STREAM_HEARTBEAT = 15  # seconds
+STREAM_SEND_TIMEOUT = 10  # seconds
+HOT_WINDOW_STALE_AFTER = 3 * STREAM_POLL_INTERVAL  # seconds without a successful read
+
+_recent_packets = deque(maxlen=STREAM_RESUME_PACKETS)  # (packet, serialized), oldest first
+_hot_window = False  # whether /api/packets may be answered from _recent_packets
+_complete_from_us = None  # the window holds every packet newer than this; None = all
+_last_read = 0.0  # time.monotonic() of the last successful tail read
+_follow_task = None
+
+HOT_WINDOW_REQUESTS = metrics.REGISTRY.counter(
+    "meshview_hot_window_requests_total",
+    "/api/packets list requests, by whether the in-memory window answered them",
+    ("result",),
+)
+metrics.REGISTRY.gauge(
+    "meshview_hot_window_packets", "Recent packets held in memory", fn=lambda: len(_recent_packets)
+)
+
+
+def _serialize_packets(rows):
+    items = []
+    for row in rows:
+        data = _packet_json(Packet.from_model(row))
+        items.append((data, json.dumps(data)))
+    return items
+
+
+async def follow_packets():
+    """Tail new packets into the stream; runs for the life of the web process."""
+    global _complete_from_us, _last_read
+    cursor = None
+    sent = {}  # packet id -> import_time_us, so the overlap window isn't re-sent
+    while True:
+        try:
+            if cursor is None:
+                # Prime the resume buffer; these are history, not news
+                rows = sorted(
+                    await store.get_packets(limit=_recent_packets.maxlen),
+                    key=lambda row: row.import_time_us or 0,
+                )
+                _recent_packets.extend(_serialize_packets(rows))
+                if len(rows) == _recent_packets.maxlen:
+                    _complete_from_us = rows[0].import_time_us or 0
+                cursor = max((row.import_time_us or 0 for row in rows), default=0)
+                sent = {row.id: row.import_time_us for row in rows}
+            else:
+                after = cursor - STREAM_OVERLAP_US
+                while True:
+                    rows = await store.get_packets_after(after, STREAM_READ_LIMIT)
+                    new_rows = [row for row in rows if row.id not in sent]
+                    for row in new_rows:
+                        sent[row.id] = row.import_time_us
+                    items = _serialize_packets(new_rows)
+                    _recent_packets.extend(items)
+                    notify.notify_packets(items)
+                    if rows:
+                        cursor = max(cursor, rows[-1].import_time_us)
+                    if len(rows) < STREAM_READ_LIMIT:
+                        break
+                    after = rows[-1].import_time_us
+                sent = {
+                    id_: time_us
+                    for id_, time_us in sent.items()
+                    if time_us >= cursor - STREAM_OVERLAP_US
+                }
+            if len(_recent_packets) == _recent_packets.maxlen:
+                # Rows can arrive slightly out of order, so only trust the window
+                # an overlap's width past its oldest entry
+                oldest_us = _recent_packets[0][0]["import_time_us"] or 0
+                _complete_from_us = max(_complete_from_us or 0, oldest_us + STREAM_OVERLAP_US)
+            _last_read = time.monotonic()
+        except Exception as e:
+            logger.error(f"Error following packets: {e}")
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
+
+
+def start_packet_stream(hot_window_packets=0):
+    """Start the tail reader; called by web.py once the database is ready.
+
+    With ``hot_window_packets`` > 0, that many recent packets are kept and used to
+    answer /api/packets; otherwise only enough for the stream to resume from.
+    """
+    global _follow_task, _hot_window, _recent_packets
+    if _follow_task is None:
+        _hot_window = hot_window_packets > 0
+        _recent_packets = deque(maxlen=max(hot_window_packets, STREAM_RESUME_PACKETS))
+        _follow_task = asyncio.create_task(follow_packets())
+
+
+def _hot_window_packets(limit, since, matches):
+    """Newest ``limit`` packets newer than ``since`` that ``matches`` accepts, from the
+    hot window; None when the window can't tell it has all of them."""
+    if not _hot_window or time.monotonic() - _last_read > HOT_WINDOW_STALE_AFTER:
+        return None
+    found = [
+        packet
+        for packet, _ in _recent_packets
+        if (since is None or (packet["import_time_us"] or 0) > since) and matches(packet)
+    ]
+    # Enough matches means the newest ones are all here; otherwise older packets
+    # outside the window might match too
+    covered = _complete_from_us is None or (since is not None and since >= _complete_from_us)
+    if len(found) < limit and not covered:
+        return None
+    found.sort(key=lambda p: p["import_time_us"] or 0, reverse=True)
+    return found[:limit]
+
+
+def _shown_text(packet):
+    # Same as /api/packets: skip empty and "seq N" text packets
+    return bool(packet["payload"]) and not SEQ_REGEX.fullmatch(packet["payload"])
+
+
+def _stream_filter(portnum, channel, from_node_id, to_node_id, node_id, text_filter=True):
+    def matches(packet):
+        if portnum is not None and packet["portnum"] != portnum:
+            return False
+        if channel is not None and packet["channel"] != channel:
+            return False
+        if from_node_id is not None and packet["from_node_id"] != from_node_id:
+            return False
+        if to_node_id is not None and packet["to_node_id"] != to_node_id:
+            return False
+        if node_id is not None and node_id not in (packet["from_node_id"], packet["to_node_id"]):
+            return False
+        if text_filter and portnum == PortNum.TEXT_MESSAGE_APP:
+            return _shown_text(packet)
+        return True
+
+    return matches
+
+
+@routes.get("/api/stream/packets")
+async def api_stream_packets(request):
+    filters = {}
+    for name, base in (
+        ("portnum", 10),
+        ("from_node_id", 0),
+        ("to_node_id", 0),
+        ("node_id", 0),
+    ):
+        value = request.query.get(name)
+        try:
+            filters[name] = int(value, base) if value else None
+        except ValueError:
+            return web.json_response({"error": f"Invalid {name}"}, status=400)
+    matches = _stream_filter(channel=request.query.get("channel") or None, **filters)
+
+    # Resume after the last event the client saw (EventSource sends it on reconnect)
+    cursor_str = request.headers.get("Last-Event-ID") or request.query.get("since")
+    try:
+        cursor = int(cursor_str) if cursor_str else None
+    except ValueError:
+        return web.json_response({"error": "Invalid since"}, status=400)
+
+    with notify.subscribe_packets(matches, STREAM_QUEUE_SIZE) as subscription:
+        # Subscribed first, so nothing falls between the backlog and live packets.
+        # Resuming only covers the recent buffer; the database isn't queried.
+        backlog = []
+        if cursor is not None:
+            backlog = [
+                item
+                for item in _recent_packets
+                if (item[0]["import_time_us"] or 0) > cursor and matches(item[0])
+            ]
+        backlog_ids = {item[0]["id"] for item in backlog}
+
+        async with sse_response(
+            request, ping_interval=STREAM_HEARTBEAT, send_timeout=STREAM_SEND_TIMEOUT
+        ) as response:
+            for packet, serialized in backlog:
+                await response.send(serialized, id=str(packet["import_time_us"]), event="packet")
+
+            while True:
+                try:
+                    packet, serialized = await asyncio.wait_for(
+                        subscription.queue.get(), STREAM_HEARTBEAT
+                    )
+                except TimeoutError:
+                    if not response.is_connected():
+                        break
+                    continue
+                if subscription.evicted:
+                    # Too far behind; the client reconnects and resumes from its cursor
+                    break
+                if packet["id"] in backlog_ids:
+                    continue
+                await response.send(serialized, id=str(packet["import_time_us"]), event="packet")
+    return response
+
+
 @routes.get("/api/stats")
+@query_cache.conditional(_stats_watermark, max_age=60)
+@query_cache.cached(ttl=60)
 async def api_stats(request):
     """
     Enhanced stats endpoint:
@@ -373,6 +693,7 @@ async def api_stats(request):
 
 
 @routes.get("/api/stats/count")
+@query_cache.cached(ttl=30)
 async def api_stats_count(request):
     """
     Returns packet and packet_seen totals.
@@ -453,8 +774,8 @@ async def api_stats_count(request):
 
 
 @routes.get("/api/edges")
+@query_cache.cached(ttl=60)
 async def api_edges(request):
-    since = datetime.datetime.now() - datetime.timedelta(hours=12)
     filter_type = request.query.get("type")
 
     # NEW → optional single-node filter
@@ -466,57 +787,48 @@ async def api_edges(request):
         except ValueError:
             return web.json_response({"error": "node_id must be integer"}, status=400)
 
-    edges = {}
-    traceroute_count = 0
-    edges_added_tr = 0
-    edges_added_neighbor = 0
-
-    # --- Traceroute edges ---
-    if filter_type in (None, "traceroute"):
-        async for tr in store.get_traceroutes(since):
-            traceroute_count += 1
-
-            try:
-                route = decode_payload.decode_payload(PortNum.TRACEROUTE_APP, tr.route)
-            except Exception:
-                continue
-
-            path = [tr.packet.from_node_id] + list(route.route)
-            path.append(tr.packet.to_node_id if tr.done else tr.gateway_node_id)
-
-            for a, b in zip(path, path[1:], strict=False):
-                if (a, b) not in edges:
-                    edges[(a, b)] = "traceroute"
-                    edges_added_tr += 1
-
-    # --- Neighbor edges ---
-    if filter_type in (None, "neighbor"):
-        packets = await store.get_packets(portnum=71)
-        for packet in packets:
-            try:
-                _, neighbor_info = decode_payload.decode(packet)
-            except Exception:
-                continue
-
-            for node in neighbor_info.neighbors:
-                edge = (node.node_id, packet.from_node_id)
-                if edge not in edges:
-                    edges[edge] = "neighbor"
-                    edges_added_neighbor += 1
+    try:
+        if "since" in request.query:
+            since = int(request.query["since"])
+        else:
+            since = int((datetime.datetime.now() - datetime.timedelta(hours=12)).timestamp() * 1e6)
+            # Whole minutes, so concurrent requests make identical (coalescable) queries
+            since -= since % 60_000_000
+        until = int(request.query["until"]) if "until" in request.query else None
+    except ValueError:
+        return web.json_response(
+            {"error": "since and until must be timestamps in microseconds"}, status=400
+        )
 
-    # Convert to list
-    edges_list = [
-        {"from": frm, "to": to, "type": edge_type} for (frm, to), edge_type in edges.items()
-    ]
+    try:
+        rows = await store.get_edges(
+            since=since, until=until, edge_type=filter_type, node_id=node_filter
+        )
+    except Exception:
+        logger.exception("Error in /api/edges")
+        return web.json_response({"error": "Failed to fetch edges"}, status=500)
 
-    # NEW → apply node_id filtering
-    if node_filter is not None:
-        edges_list = [e for e in edges_list if e["from"] == node_filter or e["to"] == node_filter]
+    # One edge per node pair; a traceroute sighting wins over a neighbor report
+    edges = {}
+    for edge in sorted(rows, key=lambda e: e.type != "traceroute"):
+        edges.setdefault(
+            (edge.from_node_id, edge.to_node_id),
+            {
+                "from": edge.from_node_id,
+                "to": edge.to_node_id,
+                "type": edge.type,
+                "first_seen_us": edge.first_seen_us,
+                "last_seen_us": edge.last_seen_us,
+                "count": edge.count,
+                "last_snr": edge.last_snr,
+            },
+        )
 
-    return web.json_response({"edges": edges_list})
+    return web.json_response({"edges": list(edges.values())})
 
 
 @routes.get("/api/config")
+@query_cache.conditional(_config_watermark, max_age=300)
 async def api_config(request):
     try:
         # ------------------ Helpers ------------------
@@ -619,15 +931,24 @@ async def api_config(request):
         return web.json_response({"error": str(e)}, status=500)
 
 
-@routes.get("/api/lang")
-async def api_lang(request):
+def _lang_code(request):
     # Language from ?lang=xx, fallback to config, then to "en"
-    lang_code = request.query.get("lang") or CONFIG.get("site", {}).get("language", "en")
-    section = request.query.get("section")
+    return request.query.get("lang") or CONFIG.get("site", {}).get("language", "en")
+
 
-    lang_file = os.path.join(LANG_DIR, f"{lang_code}.json")
+def _lang_file(request):
+    lang_file = os.path.join(LANG_DIR, f"{_lang_code(request)}.json")
     if not os.path.exists(lang_file):
         lang_file = os.path.join(LANG_DIR, "en.json")
+    return lang_file
+
+
+@routes.get("/api/lang")
+@query_cache.conditional(_lang_watermark, max_age=3600)
+async def api_lang(request):
+    lang_code = _lang_code(request)
+    section = request.query.get("section")
+    lang_file = _lang_file(request)
 
     # Cache by file + mtime to avoid re-reading on every request
     try:
@@ -764,6 +1085,92 @@ async def api_packets_seen(request):
         )
 
 
+@routes.get("/api/telemetry/{node_id}")
+async def api_telemetry(request):
+    try:
+        node_id = int(request.match_info["node_id"], 0)
+    except (KeyError, ValueError):
+        return web.json_response({"error": "Invalid or missing node_id"}, status=400)
+
+    try:
+        since = int(request.query["since"]) if "since" in request.query else None
+        until = int(request.query["until"]) if "until" in request.query else None
+    except ValueError:
+        return web.json_response(
+            {"error": "since and until must be timestamps in microseconds"}, status=400
+        )
+
+    try:
+        limit = min(max(int(request.query.get("limit", "500")), 1), 5000)
+    except ValueError:
+        limit = 500
+
+    metric_param = request.query.get("metric", "")
+    metric_names = [m.strip() for m in metric_param.split(",") if m.strip()]
+
+    try:
+        rows = await store.get_telemetry(
+            node_id, metrics=metric_names, since=since, until=until, limit=limit
+        )
+    except Exception:
+        logger.exception("Error in /api/telemetry")
+        return web.json_response({"error": "Failed to fetch telemetry"}, status=500)
+
+    series = {}
+    for metric, time_us, value in rows:
+        series.setdefault(metric, []).append([time_us, value])
+
+    return web.json_response({"node_id": node_id, "metrics": series})
+
+
+@routes.get("/api/track/{node_id}")
+async def api_track(request):
+    try:
+        node_id = int(request.match_info["node_id"], 0)
+    except (KeyError, ValueError):
+        return web.json_response({"error": "Invalid or missing node_id"}, status=400)
+
+    try:
+        since = int(request.query["since"]) if "since" in request.query else None
+        until = int(request.query["until"]) if "until" in request.query else None
+    except ValueError:
+        return web.json_response(
+            {"error": "since and until must be timestamps in microseconds"}, status=400
+        )
+
+    try:
+        max_points = min(max(int(request.query.get("max_points", "500")), 2), 5000)
+    except ValueError:
+        max_points = 500
+
+    try:
+        min_distance = max(float(request.query.get("min_distance", "10")), 0.0)
+    except ValueError:
+        min_distance = 10.0
+
+    try:
+        total, rows = await store.get_track(
+            node_id, since=since, until=until, buckets=max_points * TRACK_PRESELECT_FACTOR
+        )
+    except Exception:
+        logger.exception("Error in /api/track")
+        return web.json_response({"error": "Failed to fetch track"}, status=500)
+
+    points = [
+        [
+            row.time_us,
+            round(row.latitude_i * 1e-7, 7),
+            round(row.longitude_i * 1e-7, 7),
+            row.altitude,
+            row.precision_bits,
+            row.sats_in_view,
+        ]
+        for row in _thin_track(rows, max_points, min_distance)
+    ]
+
+    return web.json_response({"node_id": node_id, "total_points": total, "points": points})
+
+
 @routes.get("/api/traceroute/{packet_id}")
 async def api_traceroute(request):
     packet_id = int(request.match_info['packet_id'])
@@ -880,6 +1287,7 @@ async def api_traceroute(request):
 
 
 @routes.get("/api/stats/top")
+@query_cache.cached(ttl=120)
 async def api_stats_top(request):
     """
     Returns nodes sorted by SEEN (high → low) with pagination.
@@ -892,54 +1300,7 @@ async def api_stats_top(request):
     limit = min(int(request.query.get("limit", 20)), 100)
     offset = int(request.query.get("offset", 0))
 
-    multiplier = 3600 if period_type == "hour" else 86400
-    window_us = length * multiplier * 1_000_000
-
-    max_packet_import = select(func.max(PacketModel.import_time_us)).scalar_subquery()
-    max_seen_import = select(func.max(PacketSeenModel.import_time_us)).scalar_subquery()
-
-    sent_cte = (
-        select(PacketModel.from_node_id.label("node_id"), func.count().label("sent"))
-        .where(PacketModel.import_time_us >= max_packet_import - window_us)
-        .group_by(PacketModel.from_node_id)
-        .cte("sent")
-    )
-
-    seen_cte = (
-        select(PacketModel.from_node_id.label("node_id"), func.count().label("seen"))
-        .select_from(PacketSeenModel)
-        .join(PacketModel, PacketModel.id == PacketSeenModel.packet_id)
-        .where(PacketSeenModel.import_time_us >= max_seen_import - window_us)
-        .group_by(PacketModel.from_node_id)
-        .cte("seen")
-    )
-
-    query = (
-        select(
-            Node.node_id,
-            Node.long_name,
-            Node.short_name,
-            Node.channel,
-            func.coalesce(sent_cte.c.sent, 0).label("sent"),
-            func.coalesce(seen_cte.c.seen, 0).label("seen"),
-        )
-        .select_from(Node)
-        .outerjoin(sent_cte, sent_cte.c.node_id == Node.node_id)
-        .outerjoin(seen_cte, seen_cte.c.node_id == Node.node_id)
-        .order_by(func.coalesce(seen_cte.c.seen, 0).desc())
-        .limit(limit)
-        .offset(offset)
-    )
-
-    count_query = select(func.count()).select_from(Node)
-
-    if channel:
-        query = query.where(Node.channel == channel)
-        count_query = count_query.where(Node.channel == channel)
-
-    async with database.async_session() as session:
-        rows = (await session.execute(query)).all()
-        total = (await session.execute(count_query)).scalar() or 0
+    rows, total = await store.get_top_nodes_by_seen(period_type, length, channel, limit, offset)
 
     nodes = []
     for r in rows:
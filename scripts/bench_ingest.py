@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Benchmark MQTT envelope ingestion against a pre-populated database.
+
+Usage:
+    ./env/bin/python scripts/bench_ingest.py --database sqlite+aiosqlite:///bench.db
+
+The database is seeded with --seed-rows packets (and one packet_seen row each) the
+first time it is used, then --envelopes synthetic envelopes are written through
+mqtt_store in the selected --mode. About a third of the envelopes are extra uplinks
+of an earlier packet from another gateway, as on a busy broker.
+
+To compare two revisions, run the script from each checkout against copies of the
+same seeded database file.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from meshtastic.protobuf.mesh_pb2 import Position, User  # noqa: E402
+from meshtastic.protobuf.mqtt_pb2 import ServiceEnvelope  # noqa: E402
+from meshtastic.protobuf.portnums_pb2 import PortNum  # noqa: E402
+from meshtastic.protobuf.telemetry_pb2 import Telemetry  # noqa: E402
+from meshview import models, mqtt_database, mqtt_store  # noqa: E402
+
+NODE_COUNT = 2000
+GATEWAY_COUNT = 200
+SEED_CHUNK = 50_000
+
+
+async def seed(rows):
+    async with mqtt_database.async_session() as session:
+        existing = (await session.execute(select(func.count(models.Packet.id)))).scalar()
+    if existing >= rows:
+        print(f"Database already holds {existing} packets, skipping seed")
+        return
+
+    print(f"Seeding {rows - existing} packets...")
+    now_us = int(time.time() * 1_000_000)
+    rng = random.Random(1)
+    topic = "msh/US/bench/2/e/LongFast/!00000001"
+    await mqtt_store.CHANNELS.resolve(["LongFast"])
+    await mqtt_store.TOPICS.resolve([topic])
+    channel_id = mqtt_store.CHANNELS.ids["LongFast"]
+    topic_id = mqtt_store.TOPICS.ids[topic]
+    for start in range(existing, rows, SEED_CHUNK):
+        packets = []
+        seen = []
+        for i in range(start, min(start + SEED_CHUNK, rows)):
+            packet_id = 1_000_000_000 + i
+            import_time_us = now_us - (rows - i) * 1_000_000
+            packets.append(
+                {
+                    "id": packet_id,
+                    "portnum": PortNum.TEXT_MESSAGE_APP,
+                    "from_node_id": rng.randrange(NODE_COUNT),
+                    "to_node_id": 0xFFFFFFFF,
+                    "payload": rng.randbytes(60),
+                    "import_time_us": import_time_us,
+                    "channel_id": channel_id,
+                }
+            )
+            seen.append(
+                {
+                    "packet_id": packet_id,
+                    "node_id": rng.randrange(GATEWAY_COUNT),
+                    "rx_time": import_time_us // 1_000_000,
+                    "topic_id": topic_id,
+                    "channel_id": channel_id,
+                    "import_time_us": import_time_us,
+                }
+            )
+        async with mqtt_database.async_session() as session:
+            await session.execute(insert(models.Packet), packets)
+            await session.execute(insert(models.PacketSeen), seen)
+            await session.commit()
+
+    async with mqtt_database.async_session() as session:
+        await session.execute(
+            insert(models.Node),
+            [
+                {"id": f"!{n:08x}", "node_id": n, "long_name": f"Node {n}", "last_seen_us": now_us}
+                for n in range(NODE_COUNT)
+            ],
+        )
+        await session.commit()
+
+
+def synthetic_envelopes(count):
+    rng = random.Random(2)
+    envelopes = []
+    for i in range(count):
+        if envelopes and rng.random() < 0.33:
+            # Extra uplink of a recent packet through another gateway
+            env = ServiceEnvelope()
+            env.CopyFrom(rng.choice(envelopes[-50:])[1])
+            env.gateway_id = f"!{rng.randrange(GATEWAY_COUNT):08x}"
+            envelopes.append((f"msh/US/bench/2/e/LongFast/{env.gateway_id}", env))
+            continue
+
+        env = ServiceEnvelope(
+            channel_id="LongFast", gateway_id=f"!{rng.randrange(GATEWAY_COUNT):08x}"
+        )
+        packet = env.packet
+        packet.id = 2_000_000_000 + i
+        from_node = rng.randrange(NODE_COUNT)
+        setattr(packet, "from", from_node)
+        packet.to = 0xFFFFFFFF
+        packet.rx_time = int(time.time())
+        packet.hop_limit = 3
+        packet.hop_start = 3
+
+        kind = rng.random()
+        if kind < 0.4:
+            packet.decoded.portnum = PortNum.POSITION_APP
+            packet.decoded.payload = Position(
+                latitude_i=377_000_000 + rng.randrange(100_000),
+                longitude_i=-1_220_000_000 - rng.randrange(100_000),
+            ).SerializeToString()
+        elif kind < 0.7:
+            telemetry = Telemetry(time=packet.rx_time)
+            telemetry.device_metrics.battery_level = rng.randrange(100)
+            packet.decoded.portnum = PortNum.TELEMETRY_APP
+            packet.decoded.payload = telemetry.SerializeToString()
+        elif kind < 0.85:
+            packet.decoded.portnum = PortNum.NODEINFO_APP
+            packet.decoded.payload = User(
+                id=f"!{from_node:08x}",
+                long_name=f"Node {from_node}",
+                short_name="BN",
+                public_key=from_node.to_bytes(32, "little"),
+            ).SerializeToString()
+        else:
+            packet.decoded.portnum = PortNum.TEXT_MESSAGE_APP
+            packet.decoded.payload = f"bench message {i}".encode()
+        envelopes.append((f"msh/US/bench/2/e/LongFast/{env.gateway_id}", env))
+    return envelopes
+
+
+async def run(mode, envelopes, batch_size):
+    start = time.perf_counter()
+    if mode == "direct":
+        for topic, env in envelopes:
+            await mqtt_store.process_envelope(topic, env)
+    else:
+        for offset in range(0, len(envelopes), batch_size):
+            batch = mqtt_store.IngestBatch()
+            for topic, env in envelopes[offset : offset + batch_size]:
+                mqtt_store.collect_envelope(batch, topic, env)
+            await mqtt_store.write_batch(batch)
+    await mqtt_store.NODE_CACHE.flush()
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark MQTT envelope ingestion")
+    parser.add_argument("--database", default="sqlite+aiosqlite:///bench.db")
+    parser.add_argument("--seed-rows", type=int, default=1_000_000)
+    parser.add_argument("--envelopes", type=int, default=20_000)
+    parser.add_argument("--mode", choices=("direct", "batch"), default="direct")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    mqtt_database.init_database(args.database)
+    await mqtt_database.create_tables()
+    await seed(args.seed_rows)
+    await mqtt_store.load_node_cache()
+
+    envelopes = synthetic_envelopes(args.envelopes)
+    elapsed = await run(args.mode, envelopes, args.batch_size)
+    print(
+        f"{args.mode}: {len(envelopes)} envelopes in {elapsed:.2f}s "
+        f"({len(envelopes) / elapsed:.0f} envelopes/sec)"
+    )
+    await mqtt_database.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Replay a raw MQTT capture through the real decode and ingest path.
+
+Usage:
+    ./env/bin/python scripts/replay_capture.py capture.bin --database sqlite+aiosqlite:///replay.db
+
+Record a capture by setting ``capture_file`` in the [mqtt] section of config.ini.
+Messages are decrypted with the keys from --config (default config.ini), the same
+as the live reader, then written through mqtt_store in the selected --mode. Point
+--database at a scratch SQLite file or Postgres database; it is created if needed.
+
+By default the capture is replayed as fast as possible. --speed 1 keeps the
+original pacing, --speed 10 replays ten times faster.
+
+Latency is measured per envelope, from the raw message leaving the capture to the
+commit that wrote it.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a raw MQTT capture into a database")
+    parser.add_argument("capture", help="Capture file written by the MQTT reader")
+    parser.add_argument("--database", default="sqlite+aiosqlite:///replay.db")
+    parser.add_argument("--config", default="config.ini", help="config.ini with the MQTT keys")
+    parser.add_argument("--mode", choices=("batch", "direct"), default="batch")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--speed", type=float, default=0, help="Pacing multiplier (0 = as fast as possible)"
+    )
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many messages")
+    return parser.parse_args()
+
+
+# meshview.config parses the command line when imported and would answer --help
+# with its own usage, so this script's arguments are parsed first.
+if __name__ == "__main__":
+    ARGS = parse_args()
+
+from meshview import capture, mqtt_database, mqtt_ingest, mqtt_reader, mqtt_store  # noqa: E402
+
+# id(topic) -> (topic, time it left the capture). The topic string object travels
+# unchanged from the capture through decoding to the write, so it identifies the
+# message in both the inline and the process-pool decode paths.
+arrivals = {}
+latencies = []
+
+
+def record_written(topics):
+    now = time.perf_counter()
+    for topic in topics:
+        entry = arrivals.pop(id(topic), None)
+        if entry is not None:
+            latencies.append(now - entry[1])
+
+
+class ReplayWriter(mqtt_ingest.BatchWriter):
+    async def flush(self, items):
+        await super().flush(items)
+        record_written(topic for topic, _ in items)
+
+
+async def replay_messages(path, speed, limit):
+    first_recv = None
+    start = time.perf_counter()
+    for count, (recv_time, topic, payload) in enumerate(capture.read_capture(path)):
+        if limit and count >= limit:
+            return
+        if speed:
+            if first_recv is None:
+                first_recv = recv_time
+            delay = (recv_time - first_recv) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        arrivals[id(topic)] = (topic, time.perf_counter())
+        yield topic, payload
+
+
+async def run(args):
+    messages = replay_messages(args.capture, args.speed, args.limit)
+    envelopes = 0
+    start = time.perf_counter()
+
+    if args.mode == "direct":
+        async for topic, env in mqtt_reader.decode_messages(messages):
+            await mqtt_store.process_envelope(topic, env)
+            record_written((topic,))
+            envelopes += 1
+    else:
+        writer = ReplayWriter(batch_size=args.batch_size)
+        writer_task = asyncio.create_task(writer.run())
+        async for topic, env in mqtt_reader.decode_messages(messages):
+            await writer.put(topic, env)
+            envelopes += 1
+        while not writer.queue.empty() or writer.lag():
+            await asyncio.sleep(0.01)
+        writer_task.cancel()
+        await asyncio.gather(writer_task, return_exceptions=True)
+
+    await mqtt_store.NODE_CACHE.flush()
+    return envelopes, time.perf_counter() - start
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+async def main(args):
+    mqtt_database.init_database(args.database)
+    await mqtt_database.create_tables()
+    await mqtt_store.load_node_cache()
+
+    envelopes, elapsed = await run(args)
+    arrivals.clear()
+
+    print(
+        f"{args.mode}: {mqtt_reader.STATS.received} messages, {envelopes} envelopes "
+        f"in {elapsed:.2f}s ({envelopes / elapsed:.0f} envelopes/sec)"
+    )
+    print(
+        f"latency p50 {percentile(latencies, 50) * 1000:.1f} ms, "
+        f"p99 {percentile(latencies, 99) * 1000:.1f} ms"
+    )
+    print(f"decode: {mqtt_reader.STATS.summary()}")
+    await mqtt_database.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(ARGS))
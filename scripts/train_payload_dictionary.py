@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Train a preset dictionary for compressed packet payloads from stored traffic.
+
+Usage:
+    ./env/bin/python scripts/train_payload_dictionary.py --database sqlite+aiosqlite:///packets.db
+
+The newest --samples packets are reduced to their compact form and split in two:
+the dictionary is built from one half and measured on the other, so the reported
+ratio is what new traffic should see. Unless --dry-run is given, the dictionary is
+stored in payload_dictionary. startdb.py starts compressing with it (payload_format
+= compressed) a few minutes later, once the web server has had time to load it.
+
+Retrain when the mix of traffic changes; rows keep referencing the dictionary they
+were written with, so old dictionaries must stay in the table.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.protobuf.message import DecodeError  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from meshview import models, mqtt_database, payload_codec  # noqa: E402
+
+
+async def load_samples(limit):
+    stmt = (
+        select(
+            models.Packet.id,
+            models.Packet.payload,
+            models.Packet.from_node_id,
+            models.Packet.to_node_id,
+        )
+        .order_by(models.Packet.import_time_us.desc())
+        .limit(limit)
+    )
+    async with mqtt_database.async_session() as session:
+        await payload_codec.load_dictionaries(session)
+        rows = (await session.execute(stmt)).all()
+
+    samples = []
+    stored = 0
+    for packet_id, payload, from_node_id, to_node_id in rows:
+        if not payload:
+            continue
+        try:
+            packet = payload_codec.decode(payload, packet_id, from_node_id, to_node_id)
+        except DecodeError:
+            continue
+        samples.append(payload_codec.compact(packet).SerializeToString())
+        stored += len(payload)
+    return samples, stored
+
+
+def deflated_size(samples, zdict=None):
+    total = 0
+    for body in samples:
+        if zdict:
+            compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=zdict)
+        else:
+            compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+        compressed = len(compressor.compress(body) + compressor.flush())
+        # Mirror payload_codec.compress: keep whichever of the two forms is smaller
+        total += min(payload_codec.DEFLATE_HEADER.size + compressed, 2 + len(body))
+    return total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Train a packet payload dictionary")
+    parser.add_argument("--database", default="sqlite+aiosqlite:///packets.db")
+    parser.add_argument("--samples", type=int, default=50_000, help="Recent packets to use")
+    parser.add_argument(
+        "--size", type=int, default=payload_codec.MAX_DICTIONARY_SIZE, help="Dictionary bytes"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Report sizes without saving")
+    args = parser.parse_args()
+
+    mqtt_database.init_database(args.database)
+    samples, stored = await load_samples(args.samples)
+    if len(samples) < 100:
+        print(f"Only {len(samples)} packets to sample from, not enough to train on")
+        await mqtt_database.engine.dispose()
+        return
+
+    training, held_out = samples[::2], samples[1::2]
+    started = time.perf_counter()
+    zdict = payload_codec.train_dictionary(
+        training, min(args.size, payload_codec.MAX_DICTIONARY_SIZE)
+    )
+    elapsed = time.perf_counter() - started
+
+    compact = sum(2 + len(body) for body in held_out)
+    plain = deflated_size(held_out)
+    trained = deflated_size(held_out, zdict)
+    print(f"{len(samples)} packets, {stored} bytes as stored")
+    print(f"dictionary: {len(zdict)} bytes from {len(training)} packets in {elapsed:.1f}s")
+    print(f"held out {len(held_out)} packets:")
+    print(f"  compact             {compact:>10} bytes")
+    print(f"  deflate             {plain:>10} bytes ({plain / compact:.0%})")
+    print(f"  deflate+dictionary  {trained:>10} bytes ({trained / compact:.0%})")
+
+    if not args.dry_run and zdict:
+        async with mqtt_database.async_session() as session:
+            dictionary = models.PayloadDictionary(
+                created_us=int(time.time() * 1_000_000), data=zdict
+            )
+            session.add(dictionary)
+            await session.commit()
+            print(f"saved as payload dictionary {dictionary.id}")
+    await mqtt_database.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,17 +1,35 @@
 import asyncio
 import datetime
+import functools
 import gzip
 import json
 import logging
+import os
 import shutil
+import sqlite3
+import time
 from pathlib import Path
 
-from sqlalchemy import delete
+from aiohttp import web
+from google.protobuf.message import DecodeError
+from sqlalchemy import delete, select, tuple_, update
 from sqlalchemy.engine.url import make_url
 
-from meshview import migrations, models, mqtt_database, mqtt_reader, mqtt_store
+from meshview import (
+    dedupe,
+    metrics,
+    migrations,
+    models,
+    mqtt_database,
+    mqtt_ingest,
+    mqtt_reader,
+    mqtt_store,
+    partitions,
+    payload_codec,
+)
 from meshview.config import CONFIG
 from meshview.deps import check_optional_deps
+from meshview.spool import Spool
 
 # -------------------------
 # Basic logging configuration
@@ -21,6 +39,7 @@ logging.basicConfig(
     format="%(asctime)s %(filename)s:%(lineno)d [pid:%(process)d] %(levelname)s - %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S",
 )
+logger = logging.getLogger(__name__)
 
 # -------------------------
 # Logging for cleanup
@@ -52,70 +71,220 @@ def get_int(config, section, key, default=0):
 # -------------------------
 # Shared DB lock
 # -------------------------
-db_lock = asyncio.Lock()
+class TimedLock(asyncio.Lock):
+    """asyncio.Lock that knows how long its current holder has had it."""
+
+    held_since = None
+
+    async def acquire(self):
+        await super().acquire()
+        self.held_since = time.perf_counter()
+        return True
+
+    def release(self):
+        self.held_since = None
+        super().release()
+
+    def held_for(self):
+        """Seconds the lock has been held (0 when free)."""
+        if self.held_since is None:
+            return 0.0
+        return time.perf_counter() - self.held_since
+
+
+db_lock = TimedLock()
 
 
 # -------------------------
 # Database backup function
 # -------------------------
-async def backup_database(database_url: str, backup_dir: str = ".") -> None:
-    """
-    Create a compressed backup of the database file.
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.01  # seconds between backup steps
+BACKUP_COMPRESS_LEVEL = 9
+LOOP_LAG_SAMPLE_INTERVAL = 0.1  # seconds
 
-    Args:
-        database_url: SQLAlchemy connection string
-        backup_dir: Directory to store backups (default: current directory)
+
+async def _watch_loop_lag(lags):
+    """Record how late each wakeup is; this is the delay ingestion sees."""
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(LOOP_LAG_SAMPLE_INTERVAL)
+        lags.append(time.monotonic() - started - LOOP_LAG_SAMPLE_INTERVAL)
+
+
+def _sqlite_snapshot(db_file, target, pages_per_step, step_sleep):
+    """Copy a consistent snapshot of ``db_file`` into ``target`` (runs in a thread).
+
+    The source keeps a read transaction open for the whole copy. In WAL mode that
+    doesn't block writers, and every step then reads the same snapshot; without
+    it the backup restarts whenever ingestion commits and may never finish.
+    Returns the number of pages copied.
     """
-    try:
-        url = make_url(database_url)
-        if not url.drivername.startswith("sqlite"):
-            cleanup_logger.warning("Backup only supported for SQLite databases")
-            return
+    source = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    destination = sqlite3.connect(target)
+    pages = 0
 
-        if not url.database or url.database == ":memory:":
-            cleanup_logger.error("Could not extract database path from connection string")
-            return
+    def progress(status, remaining, total):
+        nonlocal pages
+        pages = total
 
-        db_file = Path(url.database)
-        if not db_file.exists():
-            cleanup_logger.error(f"Database file not found: {db_file}")
-            return
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT 1 FROM sqlite_master LIMIT 1")
+        source.backup(destination, pages=pages_per_step, progress=progress, sleep=step_sleep)
+        source.execute("COMMIT")
+    finally:
+        destination.close()
+        source.close()
+    return pages
 
-        # Create backup directory if it doesn't exist
-        backup_path = Path(backup_dir)
-        backup_path.mkdir(parents=True, exist_ok=True)
 
-        # Generate backup filename with timestamp
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"{db_file.stem}_backup_{timestamp}.db.gz"
-        backup_file = backup_path / backup_filename
+def _compress_file(source, target, level):
+    with open(source, "rb") as f_in:
+        with gzip.open(target, "wb", compresslevel=level) as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
 
-        cleanup_logger.info(f"Creating backup: {backup_file}")
 
-        # Copy and compress the database file
-        with open(db_file, 'rb') as f_in:
-            with gzip.open(backup_file, 'wb', compresslevel=9) as f_out:
-                shutil.copyfileobj(f_in, f_out)
+async def _backup_sqlite(url, backup_path, timestamp, pages_per_step, step_sleep):
+    if not url.database or url.database == ":memory:":
+        cleanup_logger.error("Could not extract database path from connection string")
+        return None
 
-        # Get file sizes for logging
-        original_size = db_file.stat().st_size / (1024 * 1024)  # MB
-        compressed_size = backup_file.stat().st_size / (1024 * 1024)  # MB
-        compression_ratio = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
+    db_file = Path(url.database)
+    if not db_file.exists():
+        cleanup_logger.error(f"Database file not found: {db_file}")
+        return None
 
+    snapshot = backup_path / f"{db_file.stem}_backup_{timestamp}.db.partial"
+    backup_file = backup_path / f"{db_file.stem}_backup_{timestamp}.db.gz"
+    cleanup_logger.info(f"Creating backup: {backup_file}")
+    try:
+        started = time.monotonic()
+        pages = await asyncio.to_thread(
+            _sqlite_snapshot, db_file, snapshot, pages_per_step, step_sleep
+        )
+        copied = time.monotonic()
+        size = snapshot.stat().st_size
         cleanup_logger.info(
-            f"Backup created successfully: {backup_file.name} "
-            f"({original_size:.2f} MB -> {compressed_size:.2f} MB, "
+            f"Snapshot of {pages} pages ({size / 1_048_576:.2f} MB) taken in "
+            f"{copied - started:.1f}s ({size / 1_048_576 / max(copied - started, 1e-6):.1f} MB/s)"
+        )
+
+        await asyncio.to_thread(_compress_file, snapshot, backup_file, BACKUP_COMPRESS_LEVEL)
+        compressed = time.monotonic() - copied
+        compressed_size = backup_file.stat().st_size
+        compression_ratio = (1 - compressed_size / size) * 100 if size > 0 else 0
+        cleanup_logger.info(
+            f"Compressed to {compressed_size / 1_048_576:.2f} MB in {compressed:.1f}s "
+            f"({size / 1_048_576 / max(compressed, 1e-6):.1f} MB/s, "
             f"{compression_ratio:.1f}% compression)"
         )
+    finally:
+        snapshot.unlink(missing_ok=True)
+    return backup_file
+
+
+async def _backup_postgresql(url, backup_path, timestamp):
+    """Stream ``pg_dump --format=custom`` (compressed, consistent) into the backup file."""
+    backup_file = backup_path / f"{url.database}_backup_{timestamp}.dump"
+    args = ["pg_dump", "--format=custom", "--no-password", "--dbname", url.database]
+    if url.host:
+        args += ["--host", url.host]
+    if url.port:
+        args += ["--port", str(url.port)]
+    if url.username:
+        args += ["--username", url.username]
+    env = dict(os.environ)
+    if url.password:
+        env["PGPASSWORD"] = url.password
+
+    cleanup_logger.info(f"Creating backup: {backup_file}")
+    started = time.monotonic()
+    try:
+        with open(backup_file, "wb") as f_out:
+            # pg_dump writes straight to the file; the event loop only waits on it
+            process = await asyncio.create_subprocess_exec(
+                *args, stdout=f_out, stderr=asyncio.subprocess.PIPE, env=env
+            )
+            _, stderr = await process.communicate()
+    except FileNotFoundError:
+        cleanup_logger.error("pg_dump not found; install the PostgreSQL client tools")
+        backup_file.unlink(missing_ok=True)
+        return None
+    if process.returncode != 0:
+        cleanup_logger.error(f"pg_dump failed: {stderr.decode(errors='replace').strip()}")
+        backup_file.unlink(missing_ok=True)
+        return None
+
+    elapsed = time.monotonic() - started
+    size = backup_file.stat().st_size
+    cleanup_logger.info(
+        f"Dump of {size / 1_048_576:.2f} MB written in {elapsed:.1f}s "
+        f"({size / 1_048_576 / max(elapsed, 1e-6):.1f} MB/s)"
+    )
+    return backup_file
+
+
+async def backup_database(
+    database_url: str,
+    backup_dir: str = ".",
+    pages_per_step: int = BACKUP_PAGES_PER_STEP,
+    step_sleep: float = BACKUP_STEP_SLEEP,
+) -> None:
+    """
+    Create a compressed backup of the database without pausing ingestion.
+
+    SQLite is copied with the online backup API in a thread, ``pages_per_step``
+    pages at a time, and then gzipped in a thread. PostgreSQL is dumped with
+    pg_dump.
+
+    Args:
+        database_url: SQLAlchemy connection string
+        backup_dir: Directory to store backups (default: current directory)
+        pages_per_step: SQLite pages copied per backup step (-1 copies all at once)
+        step_sleep: Seconds to sleep between SQLite backup steps
+    """
+    lags = []
+    watcher = asyncio.create_task(_watch_loop_lag(lags))
+    try:
+        url = make_url(database_url)
+        backup_path = Path(backup_dir)
+        backup_path.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        if url.drivername.startswith("sqlite"):
+            backup_file = await _backup_sqlite(
+                url, backup_path, timestamp, pages_per_step, step_sleep
+            )
+        elif url.drivername.startswith("postgresql"):
+            backup_file = await _backup_postgresql(url, backup_path, timestamp)
+        else:
+            cleanup_logger.warning(f"Backup not supported for {url.drivername} databases")
+            return
+
+        if backup_file is not None:
+            cleanup_logger.info(
+                f"Backup created successfully: {backup_file.name}; ingestion delayed by "
+                f"at most {max(lags, default=0) * 1000:.0f} ms "
+                f"({sum(lags):.2f}s in total)"
+            )
 
     except Exception as e:
         cleanup_logger.error(f"Error creating database backup: {e}")
+    finally:
+        watcher.cancel()
 
 
 # -------------------------
 # Database backup scheduler
 # -------------------------
-async def daily_backup_at(hour: int = 2, minute: int = 0, backup_dir: str = "."):
+async def daily_backup_at(
+    hour: int = 2,
+    minute: int = 0,
+    backup_dir: str = ".",
+    pages_per_step: int = BACKUP_PAGES_PER_STEP,
+    step_sleep: float = BACKUP_STEP_SLEEP,
+):
     while True:
         now = datetime.datetime.now()
         next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
@@ -126,18 +295,105 @@ async def daily_backup_at(hour: int = 2, minute: int = 0, backup_dir: str = ".")
         await asyncio.sleep(delay)
 
         database_url = CONFIG["database"]["connection_string"]
-        await backup_database(database_url, backup_dir)
+        await backup_database(database_url, backup_dir, pages_per_step, step_sleep)
 
 
 # -------------------------
-# Database cleanup using ORM
+# Database cleanup in bounded batches
 # -------------------------
+CLEANUP_PROGRESS_INTERVAL = 30  # seconds between progress log lines per table
+
+
+async def delete_expired(model, time_column, cutoff_us, batch_size, rows_per_second):
+    """Delete rows of ``model`` with ``time_column < cutoff_us``, one short transaction
+    per ``batch_size`` rows, so ingestion can write between batches.
+
+    ``rows_per_second`` caps the delete rate (0 means unthrottled).
+    """
+    table = model.__table__
+    primary_key = list(table.primary_key.columns)
+    expired = select(*primary_key).where(time_column < cutoff_us).limit(batch_size)
+    if len(primary_key) == 1:
+        stmt = delete(table).where(primary_key[0].in_(expired))
+    else:
+        stmt = delete(table).where(tuple_(*primary_key).in_(expired))
+
+    total = 0
+    started = time.monotonic()
+    last_report = started
+    while True:
+        batch_started = time.monotonic()
+        async with mqtt_database.async_session() as session:
+            result = await session.execute(stmt)
+            await session.commit()
+        deleted = result.rowcount
+        total += deleted
+        if deleted < batch_size:
+            break
+
+        now = time.monotonic()
+        if now - last_report >= CLEANUP_PROGRESS_INTERVAL:
+            cleanup_logger.info(
+                f"{table.name}: deleted {total} rows so far ({total / (now - started):.0f} rows/sec)"
+            )
+            last_report = now
+
+        # Sleep off whatever is left of this batch's share of the rate budget
+        pause = deleted / rows_per_second - (now - batch_started) if rows_per_second else 0
+        await asyncio.sleep(max(pause, 0))
+
+    elapsed = time.monotonic() - started
+    cleanup_logger.info(f"Deleted {total} rows from {table.name} in {elapsed:.1f}s")
+    return total
+
+
+async def reclaim_free_pages(pages_per_step: int, interval: float):
+    """Return SQLite's free pages to the filesystem with PRAGMA incremental_vacuum.
+
+    Each step frees at most ``pages_per_step`` pages in its own short write, then
+    sleeps ``interval`` seconds, so ingestion and readers carry on in between.
+    Requires auto_vacuum=INCREMENTAL (see mqtt_database.enable_incremental_vacuum).
+    """
+    free, page_size = await mqtt_database.free_pages()
+    cleanup_logger.info(
+        f"Free pages before reclaim: {free} ({free * page_size / 1_048_576:.1f} MB)"
+    )
+    total = 0
+    started = time.monotonic()
+    last_report = started
+    while True:
+        freed = await mqtt_database.incremental_vacuum(pages_per_step)
+        total += freed
+        if freed < pages_per_step:
+            break
+
+        now = time.monotonic()
+        if now - last_report >= CLEANUP_PROGRESS_INTERVAL:
+            cleanup_logger.info(
+                f"Reclaimed {total} pages ({total * page_size / 1_048_576:.1f} MB) so far"
+            )
+            last_report = now
+        await asyncio.sleep(interval)
+
+    elapsed = time.monotonic() - started
+    remaining, _ = await mqtt_database.free_pages()
+    cleanup_logger.info(
+        f"Reclaimed {total} pages ({total * page_size / 1_048_576:.1f} MB) in {elapsed:.1f}s, "
+        f"{remaining} free pages left"
+    )
+    return total
+
+
 async def daily_cleanup_at(
     hour: int = 2,
     minute: int = 0,
     days_to_keep: int = 14,
     vacuum_db: bool = True,
     wait_for_backup: bool = False,
+    batch_size: int = 5000,
+    rows_per_second: int = 20000,
+    incremental_vacuum_pages: int = 0,
+    incremental_vacuum_interval: float = 1,
 ):
     while True:
         now = datetime.datetime.now()
@@ -160,63 +416,154 @@ async def daily_cleanup_at(
         cleanup_logger.info(f"Running cleanup for records older than {cutoff_dt.isoformat()}...")
 
         try:
-            async with db_lock:  # Pause ingestion
-                cleanup_logger.info("Ingestion paused for cleanup.")
-
-                async with mqtt_database.async_session() as session:
-                    # -------------------------
-                    # Packet
-                    # -------------------------
-                    result = await session.execute(
-                        delete(models.Packet).where(models.Packet.import_time_us < cutoff_us)
-                    )
-                    cleanup_logger.info(f"Deleted {result.rowcount} rows from Packet")
-
-                    # -------------------------
-                    # PacketSeen
-                    # -------------------------
-                    result = await session.execute(
-                        delete(models.PacketSeen).where(
-                            models.PacketSeen.import_time_us < cutoff_us
-                        )
-                    )
-                    cleanup_logger.info(f"Deleted {result.rowcount} rows from PacketSeen")
-
-                    # -------------------------
-                    # Traceroute
-                    # -------------------------
-                    result = await session.execute(
-                        delete(models.Traceroute).where(
-                            models.Traceroute.import_time_us < cutoff_us
-                        )
-                    )
-                    cleanup_logger.info(f"Deleted {result.rowcount} rows from Traceroute")
-
-                    # -------------------------
-                    # Node
-                    # -------------------------
-                    result = await session.execute(
-                        delete(models.Node).where(models.Node.last_seen_us < cutoff_us)
-                    )
-                    cleanup_logger.info(f"Deleted {result.rowcount} rows from Node")
-
-                    await session.commit()
-
-                if vacuum_db and mqtt_database.engine.dialect.name == "sqlite":
-                    cleanup_logger.info("Running VACUUM...")
+            if mqtt_database.engine.dialect.name == "postgresql":
+                # Whole days go with their partitions; the deletes below only
+                # find the rest (DEFAULT partitions and unpartitioned tables).
+                async with mqtt_database.engine.begin() as conn:
+                    dropped = await partitions.drop_partitions_before(conn, cutoff_us)
+                if dropped:
+                    cleanup_logger.info(f"Dropped partitions: {', '.join(dropped)}")
+
+            # Rows referencing packet go first so the foreign keys stay satisfied
+            # between batches. Ingestion keeps running throughout.
+            for model, time_column in (
+                (models.PacketSeen, models.PacketSeen.import_time_us),
+                (models.Traceroute, models.Traceroute.import_time_us),
+                (models.Telemetry, models.Telemetry.time_us),
+                (models.Position, models.Position.time_us),
+                (models.Edge, models.Edge.last_seen_us),
+                (models.TextMessage, models.TextMessage.time_us),
+                (models.PacketHourly, models.PacketHourly.hour_us),
+                (models.Packet, models.Packet.import_time_us),
+                (models.Node, models.Node.last_seen_us),
+            ):
+                await delete_expired(model, time_column, cutoff_us, batch_size, rows_per_second)
+            mqtt_store.NODE_CACHE.evict_older_than(cutoff_us)
+
+            if incremental_vacuum_pages and mqtt_database.engine.dialect.name == "sqlite":
+                await reclaim_free_pages(incremental_vacuum_pages, incremental_vacuum_interval)
+
+            if vacuum_db and mqtt_database.engine.dialect.name == "sqlite":
+                # VACUUM rewrites the whole file, so ingestion waits for it
+                async with db_lock:
+                    cleanup_logger.info("Ingestion paused for VACUUM...")
                     async with mqtt_database.engine.begin() as conn:
                         await conn.exec_driver_sql("VACUUM;")
-                    cleanup_logger.info("VACUUM completed.")
-                elif vacuum_db:
-                    cleanup_logger.info("VACUUM skipped (not supported for this database).")
+                    cleanup_logger.info("VACUUM completed, ingestion resumed.")
+            elif vacuum_db:
+                cleanup_logger.info("VACUUM skipped (not supported for this database).")
 
-                cleanup_logger.info("Cleanup completed successfully.")
-                cleanup_logger.info("Ingestion resumed after cleanup.")
+            cleanup_logger.info("Cleanup completed successfully.")
 
         except Exception as e:
             cleanup_logger.error(f"Error during cleanup: {e}")
 
 
+# -------------------------
+# PostgreSQL partitions
+# -------------------------
+PARTITION_CHECK_INTERVAL = 3600  # seconds
+
+
+async def maintain_partitions():
+    """Keep the upcoming daily partitions created (PostgreSQL only)."""
+    while True:
+        try:
+            async with mqtt_database.engine.begin() as conn:
+                created = await partitions.create_partitions(
+                    conn, datetime.datetime.now(datetime.UTC).date()
+                )
+            if created:
+                logger.info(f"Created partitions: {', '.join(created)}")
+        except Exception as e:
+            logger.error(f"Error creating partitions: {e}")
+        await asyncio.sleep(PARTITION_CHECK_INTERVAL)
+
+
+# -------------------------
+# Packet payload format
+# -------------------------
+async def refresh_payload_dictionaries(interval: int):
+    """Pick up dictionaries added by scripts/train_payload_dictionary.py."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with mqtt_database.async_session() as session:
+                await payload_codec.load_dictionaries(session)
+        except Exception as e:
+            logger.error(f"Error loading payload dictionaries: {e}")
+
+
+async def rewrite_payloads(batch_size: int, rows_per_second: int):
+    """Rewrite stored packet payloads that aren't in the configured format.
+
+    Walks packet by id, one short transaction per ``batch_size`` rows so ingestion
+    can write between batches. ``rows_per_second`` caps the scan rate (0 means
+    unthrottled). Space freed in SQLite is reused by new rows; it only shrinks the
+    file after a VACUUM.
+    """
+    packet = models.Packet
+    stmt = (
+        select(packet.id, packet.payload, packet.from_node_id, packet.to_node_id)
+        .order_by(packet.id)
+        .limit(batch_size)
+    )
+
+    last_id = None
+    scanned = rewritten = saved = 0
+    started = time.monotonic()
+    last_report = started
+    logger.info(f"Rewriting packet payloads as {payload_codec.WRITE_FORMAT}...")
+    try:
+        while True:
+            batch_started = time.monotonic()
+            async with mqtt_database.async_session() as session:
+                batch_stmt = stmt if last_id is None else stmt.where(packet.id > last_id)
+                rows = (await session.execute(batch_stmt)).all()
+                updates = []
+                for packet_id, payload, from_node_id, to_node_id in rows:
+                    if not payload_codec.needs_rewrite(payload):
+                        continue
+                    try:
+                        mesh_packet = payload_codec.decode(
+                            payload, packet_id, from_node_id, to_node_id
+                        )
+                    except DecodeError:
+                        continue
+                    new_payload = payload_codec.encode(mesh_packet)
+                    if new_payload != payload:
+                        updates.append({"id": packet_id, "payload": new_payload})
+                        saved += len(payload) - len(new_payload)
+                if updates:
+                    await session.execute(update(packet), updates)
+                    await session.commit()
+            scanned += len(rows)
+            rewritten += len(updates)
+            if len(rows) < batch_size:
+                break
+            last_id = rows[-1].id
+
+            now = time.monotonic()
+            if now - last_report >= CLEANUP_PROGRESS_INTERVAL:
+                logger.info(
+                    f"Payload rewrite: {rewritten} of {scanned} rows rewritten so far, "
+                    f"{saved / 1_000_000:.1f} MB saved ({scanned / (now - started):.0f} rows/sec)"
+                )
+                last_report = now
+
+            pause = len(rows) / rows_per_second - (now - batch_started) if rows_per_second else 0
+            await asyncio.sleep(max(pause, 0))
+    except Exception as e:
+        logger.error(f"Error rewriting packet payloads: {e}")
+        return
+
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Payload rewrite finished: {rewritten} of {scanned} rows rewritten, "
+        f"{saved / 1_000_000:.1f} MB saved in {elapsed:.1f}s"
+    )
+
+
 # -------------------------
 # MQTT loading
 # -------------------------
@@ -226,12 +573,129 @@ async def load_database_from_mqtt(
     topics: list,
     mqtt_user: str | None = None,
     mqtt_passwd: str | None = None,
+    writer: mqtt_ingest.BatchWriter | None = None,
+    spool: Spool | None = None,
+    spool_threshold: float = 2.0,
 ):
     async for topic, env in mqtt_reader.get_topic_envelopes(
         mqtt_server, mqtt_port, topics, mqtt_user, mqtt_passwd
     ):
-        async with db_lock:  # Block if cleanup is running
-            await mqtt_store.process_envelope(topic, env)
+        # Once anything is spooled, everything goes through the spool until it
+        # drains, so envelopes reach the database in arrival order.
+        if spool is not None and (spool.depth or ingest_is_behind(writer, spool_threshold)):
+            spool.append(topic, env)
+            continue
+
+        if spool is not None and writer is None:
+            # Wait for the lock no longer than the threshold, then spool instead
+            if not await process_direct(topic, env, spool_threshold - db_lock.held_for()):
+                spool.append(topic, env)
+            continue
+
+        await deliver_envelope(writer, topic, env)
+
+
+def ingest_is_behind(writer, threshold):
+    if writer is not None:
+        return writer.is_behind(threshold)
+    return db_lock.held_for() > threshold
+
+
+async def deliver_envelope(writer, topic, env):
+    if writer is not None:
+        await writer.put(topic, env)
+        return
+
+    await process_direct(topic, env)
+
+
+async def process_direct(topic, env, timeout=None):
+    """Write ``env`` under ``db_lock`` (held by VACUUM and node cache flushes).
+
+    Returns False without writing if the lock isn't free within ``timeout`` seconds.
+    """
+    try:
+        async with asyncio.timeout(timeout):
+            await db_lock.acquire()
+    except TimeoutError:
+        return False
+    try:
+        await mqtt_store.process_envelope(topic, env)
+    finally:
+        db_lock.release()
+    return True
+
+
+# -------------------------
+# Metrics
+# -------------------------
+async def serve_metrics(host: str, port: int):
+    async def handle_metrics(request):
+        return web.Response(
+            body=metrics.REGISTRY.render().encode("utf-8"),
+            headers={"Content-Type": metrics.CONTENT_TYPE},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def register_ingest_metrics(writer, spool):
+    if writer is not None:
+        metrics.REGISTRY.gauge(
+            "meshview_ingest_queue_depth",
+            "Envelopes waiting for the batch writer",
+            fn=writer.queue.qsize,
+        )
+        metrics.REGISTRY.gauge(
+            "meshview_ingest_flush_lag_seconds",
+            "How long the batch write in progress has been running",
+            fn=writer.lag,
+        )
+        metrics.REGISTRY.counter(
+            "meshview_ingest_flushed_envelopes_total",
+            "Envelopes written by the batch writer",
+            fn=lambda: writer.flushed_envelopes,
+        )
+        metrics.REGISTRY.counter(
+            "meshview_ingest_failed_batches_total",
+            "Batch writes that failed and were retried envelope by envelope",
+            fn=lambda: writer.failed_batches,
+        )
+    if spool is not None:
+        metrics.REGISTRY.gauge(
+            "meshview_spool_depth", "Envelopes waiting in the on-disk spool", fn=lambda: spool.depth
+        )
+        metrics.REGISTRY.gauge(
+            "meshview_spool_age_seconds", "Age of the oldest spooled envelope", fn=spool.age
+        )
+
+
+async def log_ingest_stats(interval: int, spool: Spool | None = None):
+    """Log a one-line ingest summary every ``interval`` seconds."""
+    last_count = 0
+    last_time = time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        count = sum(mqtt_reader.MESSAGES.values.values())
+        now = time.monotonic()
+        rate = (count - last_count) / (now - last_time)
+        logger.info(f"Processed {count} messages so far ({rate:.2f} msg/sec over {interval}s)")
+        logger.info(f"Decode stage: {mqtt_reader.STATS.summary()}")
+        if mqtt_reader.KEYRING is not None:
+            logger.info(f"Keyring: {mqtt_reader.KEYRING.summary()}")
+        logger.info(f"Dedupe: {dedupe.UPLINKS.summary()}")
+        if spool is not None:
+            logger.info(f"Spool: {spool.summary()}")
+        last_count, last_time = count, now
 
 
 # -------------------------
@@ -239,7 +703,6 @@ async def load_database_from_mqtt(
 # -------------------------
 async def main():
     check_optional_deps()
-    logger = logging.getLogger(__name__)
 
     # Initialize database
     database_url = CONFIG["database"]["connection_string"]
@@ -252,6 +715,8 @@ async def main():
     await migrations.set_migration_in_progress(mqtt_database.engine, True)
     logger.info("Migration status set to 'in progress'")
 
+    incremental_vacuum = get_bool(CONFIG, "cleanup", "incremental_vacuum", False)
+
     try:
         # Check if migrations are needed before running them
         logger.info("Checking for pending database migrations...")
@@ -267,8 +732,20 @@ async def main():
         await mqtt_database.create_tables()
         logger.info("Database tables created")
 
-        # Load MQTT gateway cache after DB init/migrations
-        await mqtt_store.load_gateway_cache()
+        if incremental_vacuum and mqtt_database.engine.dialect.name == "sqlite":
+            # One full VACUUM switches an existing file over; later starts skip it
+            started = time.monotonic()
+            if await mqtt_database.enable_incremental_vacuum():
+                cleanup_logger.info(
+                    f"Converted database to auto_vacuum=INCREMENTAL in "
+                    f"{time.monotonic() - started:.1f}s"
+                )
+
+        # Warm the node cache after DB init/migrations
+        await mqtt_store.load_node_cache()
+
+        async with mqtt_database.async_session() as session:
+            await payload_codec.load_dictionaries(session)
 
     finally:
         # Clear migration in progress flag
@@ -285,13 +762,79 @@ async def main():
     vacuum_db = get_bool(CONFIG, "cleanup", "vacuum", False)
     cleanup_hour = get_int(CONFIG, "cleanup", "hour", 2)
     cleanup_minute = get_int(CONFIG, "cleanup", "minute", 0)
+    cleanup_batch_size = max(get_int(CONFIG, "cleanup", "batch_size", 5000), 1)
+    cleanup_rows_per_second = max(get_int(CONFIG, "cleanup", "rows_per_second", 20000), 0)
+    incremental_vacuum_pages = (
+        max(get_int(CONFIG, "cleanup", "incremental_vacuum_pages", 1000), 1)
+        if incremental_vacuum
+        else 0
+    )
+    incremental_vacuum_interval = (
+        max(get_int(CONFIG, "cleanup", "incremental_vacuum_interval_ms", 1000), 0) / 1000
+    )
 
     backup_enabled = get_bool(CONFIG, "cleanup", "backup_enabled", False)
     backup_dir = CONFIG.get("cleanup", {}).get("backup_dir", "./backups")
     backup_hour = get_int(CONFIG, "cleanup", "backup_hour", cleanup_hour)
     backup_minute = get_int(CONFIG, "cleanup", "backup_minute", cleanup_minute)
+    backup_pages_per_step = get_int(
+        CONFIG, "cleanup", "backup_pages_per_step", BACKUP_PAGES_PER_STEP
+    )
+    backup_step_sleep = max(get_int(CONFIG, "cleanup", "backup_step_sleep_ms", 10), 0) / 1000
+
+    ingest_mode = CONFIG.get("ingest", {}).get("mode", "direct").strip().lower()
+    if ingest_mode not in mqtt_ingest.INGEST_MODES:
+        logger.warning(f"Unknown ingest mode '{ingest_mode}', falling back to 'direct'")
+        ingest_mode = "direct"
+    dialect = mqtt_database.engine.dialect.name
+    if ingest_mode == "batch" and dialect not in mqtt_store.BATCH_DIALECTS:
+        logger.error(
+            f"Batch ingest needs SQLite or PostgreSQL; set [ingest] mode = direct for {dialect}"
+        )
+        raise RuntimeError(f"Ingest mode 'batch' is not supported on {dialect}")
+
+    writer = None
+    if ingest_mode == "batch":
+        writer = mqtt_ingest.BatchWriter(
+            batch_size=max(get_int(CONFIG, "ingest", "batch_size", 500), 1),
+            flush_interval=get_int(CONFIG, "ingest", "flush_interval_ms", 250) / 1000,
+            queue_size=max(get_int(CONFIG, "ingest", "queue_size", 5000), 1),
+            lock=db_lock,
+        )
+
+    node_flush_interval = max(get_int(CONFIG, "ingest", "node_flush_interval", 5), 1)
+    mqtt_store.NODE_CACHE.last_seen_interval_us = (
+        get_int(CONFIG, "ingest", "node_last_seen_interval", 60) * 1_000_000
+    )
+    spool = None
+    spool_dir = CONFIG.get("ingest", {}).get("spool_dir", "").strip()
+    spool_threshold = get_int(CONFIG, "ingest", "spool_threshold_ms", 2000) / 1000
+    if spool_dir:
+        spool = Spool(spool_dir)
+
+    metrics_enabled = get_bool(CONFIG, "metrics", "enabled", False)
+    metrics_host = CONFIG.get("metrics", {}).get("host", "127.0.0.1")
+    metrics_port = get_int(CONFIG, "metrics", "port", 9464)
+    stats_log_interval = get_int(CONFIG, "metrics", "log_interval", 3600)
+    register_ingest_metrics(writer, spool)
+
+    dedupe.UPLINKS.configure(
+        ttl=get_int(CONFIG, "ingest", "dedupe_window", 600),
+        max_entries=get_int(CONFIG, "ingest", "dedupe_max_entries", 200_000),
+    )
+
+    payload_format = CONFIG.get("ingest", {}).get("payload_format", "full").strip().lower()
+    if payload_format not in payload_codec.PAYLOAD_FORMATS:
+        logger.warning(f"Unknown payload format '{payload_format}', falling back to 'full'")
+        payload_format = "full"
+    payload_codec.WRITE_FORMAT = payload_format
+    rewrite_payloads_enabled = get_bool(CONFIG, "ingest", "rewrite_payloads", False)
+    rewrite_rows_per_second = max(get_int(CONFIG, "ingest", "rewrite_rows_per_second", 5000), 0)
 
     logger.info(f"Starting MQTT ingestion from {CONFIG['mqtt']['server']}:{CONFIG['mqtt']['port']}")
+    logger.info(f"Ingest mode: {ingest_mode}, payload format: {payload_format}")
+    if spool is not None:
+        logger.info(f"Spooling to {spool.data_path} when the writer is {spool_threshold}s behind")
     if cleanup_enabled:
         logger.info(
             f"Daily cleanup enabled: keeping {cleanup_days} days of data at {cleanup_hour:02d}:{cleanup_minute:02d}"
@@ -302,6 +845,28 @@ async def main():
         )
 
     async with asyncio.TaskGroup() as tg:
+        if writer is not None:
+            tg.create_task(writer.run())
+        tg.create_task(mqtt_ingest.flush_node_cache(node_flush_interval, db_lock))
+        tg.create_task(refresh_payload_dictionaries(payload_codec.DICTIONARY_REFRESH_INTERVAL))
+        if mqtt_database.engine.dialect.name == "postgresql":
+            tg.create_task(maintain_partitions())
+        if rewrite_payloads_enabled:
+            tg.create_task(rewrite_payloads(cleanup_batch_size, rewrite_rows_per_second))
+        if metrics_enabled:
+            tg.create_task(serve_metrics(metrics_host, metrics_port))
+        if stats_log_interval > 0:
+            tg.create_task(log_ingest_stats(stats_log_interval, spool))
+        if spool is not None:
+            tg.create_task(
+                mqtt_ingest.drain_spool(
+                    spool,
+                    functools.partial(deliver_envelope, writer),
+                    functools.partial(ingest_is_behind, writer, spool_threshold),
+                    writer.wait_flushed if writer is not None else None,
+                )
+            )
+
         tg.create_task(
             load_database_from_mqtt(
                 CONFIG["mqtt"]["server"],
@@ -309,12 +874,23 @@ async def main():
                 mqtt_topics,
                 mqtt_user,
                 mqtt_passwd,
+                writer,
+                spool,
+                spool_threshold,
             )
         )
 
         # Start backup task if enabled
         if backup_enabled:
-            tg.create_task(daily_backup_at(backup_hour, backup_minute, backup_dir))
+            tg.create_task(
+                daily_backup_at(
+                    backup_hour,
+                    backup_minute,
+                    backup_dir,
+                    backup_pages_per_step,
+                    backup_step_sleep,
+                )
+            )
 
         # Start cleanup task if enabled (waits for backup if both run at same time)
         if cleanup_enabled:
@@ -325,7 +901,15 @@ async def main():
             )
             tg.create_task(
                 daily_cleanup_at(
-                    cleanup_hour, cleanup_minute, cleanup_days, vacuum_db, wait_for_backup
+                    cleanup_hour,
+                    cleanup_minute,
+                    cleanup_days,
+                    vacuum_db,
+                    wait_for_backup,
+                    cleanup_batch_size,
+                    cleanup_rows_per_second,
+                    incremental_vacuum_pages,
+                    incremental_vacuum_interval,
                 )
             )
 
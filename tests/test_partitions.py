@@ -0,0 +1,179 @@
+"""Partitioning migration and maintenance against a real PostgreSQL database.
+
+Set MESHVIEW_TEST_POSTGRES_URL to a scratch database, e.g.
+``postgresql+asyncpg://postgres@localhost/meshview_test``; its public schema is
+dropped and recreated by every test.
+"""
+
+import asyncio
+import datetime
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from alembic import command
+from meshview import migrations, mqtt_store, partitions
+from meshview.models import Base, Channel, Node, Packet, PacketSeen, Topic, Traceroute
+
+URL = os.environ.get("MESHVIEW_TEST_POSTGRES_URL")
+
+pytestmark = pytest.mark.skipif(not URL, reason="MESHVIEW_TEST_POSTGRES_URL is not set")
+
+# The revision before partitioning; the full chain needs pg_trgm, so the tables it
+# touches are created from the models and stamped instead.
+BEFORE = "f3c8a6e1d4b9"
+
+TODAY = datetime.datetime.now(datetime.UTC).date()
+TOMORROW = TODAY + datetime.timedelta(days=1)
+HOUR_US = 3600 * 1_000_000
+OLD_US = int(datetime.datetime(2020, 1, 1, tzinfo=datetime.UTC).timestamp()) * 1_000_000
+TOMORROW_US = partitions._day_start_us(TOMORROW)
+FAR_AHEAD_US = partitions._day_start_us(TODAY + datetime.timedelta(days=365))
+
+
+def _run(coro_fn):
+    async def run():
+        engine = create_async_engine(URL, poolclass=NullPool)
+        try:
+            async with engine.begin() as conn:
+                return await coro_fn(conn)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+async def _create_schema(conn):
+    await conn.exec_driver_sql("DROP SCHEMA public CASCADE")
+    await conn.exec_driver_sql("CREATE SCHEMA public")
+    tables = [model.__table__ for model in (Node, Channel, Topic, Packet, PacketSeen, Traceroute)]
+    await conn.run_sync(Base.metadata.create_all, tables=tables)
+
+    await conn.execute(
+        Packet.__table__.insert(),
+        [{"id": 1, "import_time_us": OLD_US}, {"id": 2, "import_time_us": OLD_US + HOUR_US}],
+    )
+    await conn.execute(
+        PacketSeen.__table__.insert(),
+        [
+            {"packet_id": 1, "node_id": 10, "rx_time": 100, "import_time_us": OLD_US},
+            # Stored before import_time_us existed: takes its packet's time
+            {"packet_id": 2, "node_id": 10, "rx_time": 200, "import_time_us": None},
+            # A gateway clock far ahead lands in DEFAULT
+            {"packet_id": 2, "node_id": 11, "rx_time": 300, "import_time_us": FAR_AHEAD_US},
+        ],
+    )
+    await conn.execute(
+        Traceroute.__table__.insert(),
+        [
+            {"packet_id": 1, "route": b"", "import_time_us": OLD_US},
+            {"packet_id": 2, "route": b"", "import_time_us": None},
+            {"packet_id": None, "route": b"", "import_time_us": None},
+        ],
+    )
+
+
+def _prepare():
+    _run(_create_schema)
+    command.stamp(migrations.get_alembic_config(URL), BEFORE)
+    command.upgrade(migrations.get_alembic_config(URL), "a5d1e9c3f7b2")
+
+
+async def _placement(conn, table, key):
+    result = await conn.execute(
+        text(f"SELECT {key}, tableoid::regclass::text FROM {table} ORDER BY {key}")
+    )
+    return result.all()
+
+
+async def _primary_key(conn, table):
+    result = await conn.execute(
+        text(
+            "SELECT a.attname FROM pg_index i JOIN pg_attribute a "
+            "ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+            "WHERE i.indrelid = CAST(:table AS regclass) AND i.indisprimary ORDER BY a.attname"
+        ),
+        {"table": table},
+    )
+    return result.scalars().all()
+
+
+def test_upgrade_keeps_rows_and_downgrade_restores_tables():
+    _prepare()
+    legacy = f"before{TOMORROW:%Y%m%d}"
+
+    async def check_upgraded(conn):
+        assert await _placement(conn, "packet_seen", "rx_time") == [
+            (100, f"packet_seen_{legacy}"),
+            (200, f"packet_seen_{legacy}"),
+            (300, "packet_seen_default"),
+        ]
+        result = await conn.execute(text("SELECT import_time_us FROM traceroute ORDER BY id"))
+        assert result.scalars().all() == [OLD_US, OLD_US + HOUR_US, 0]
+        assert await _primary_key(conn, "packet_seen") == [
+            "import_time_us",
+            "node_id",
+            "packet_id",
+            "rx_time",
+        ]
+        assert await _primary_key(conn, "traceroute") == ["id", "import_time_us"]
+
+        # New rows keep serial ids and go to the daily partitions
+        assert len(await partitions.create_partitions(conn, TODAY)) == 2 * partitions.DAYS_AHEAD
+        await conn.execute(
+            Traceroute.__table__.insert(), {"packet_id": 1, "import_time_us": TOMORROW_US}
+        )
+        assert (await _placement(conn, "traceroute", "id"))[-1] == (
+            4,
+            f"traceroute_p{TOMORROW:%Y%m%d}",
+        )
+
+    _run(check_upgraded)
+    command.downgrade(migrations.get_alembic_config(URL), BEFORE)
+
+    async def check_downgraded(conn):
+        result = await conn.execute(text("SELECT count(*) FROM pg_inherits"))
+        assert result.scalar() == 0
+        result = await conn.execute(text("SELECT count(*) FROM packet_seen"))
+        assert result.scalar() == 3
+        result = await conn.execute(text("SELECT id FROM traceroute ORDER BY id"))
+        assert result.scalars().all() == [1, 2, 3, 4]
+        assert await _primary_key(conn, "packet_seen") == ["node_id", "packet_id", "rx_time"]
+        assert await _primary_key(conn, "traceroute") == ["id"]
+
+    _run(check_downgraded)
+
+
+def test_repeated_receptions_are_skipped():
+    _prepare()
+
+    async def check(conn):
+        await partitions.create_partitions(conn, TODAY)
+        session = AsyncSession(bind=conn)
+        repeated = {"packet_id": 1, "node_id": 10, "rx_time": 100, "import_time_us": TOMORROW_US}
+        new = {"packet_id": 1, "node_id": 12, "rx_time": 100, "import_time_us": TOMORROW_US}
+        assert await mqtt_store._unstored_receptions(session, [repeated, new]) == [new]
+        assert await mqtt_store._insert_or_ignore(session, PacketSeen, None, new)
+        assert await mqtt_store._unstored_receptions(session, [new]) == []
+
+    _run(check)
+
+
+def test_drop_partitions_before_drops_only_expired_ranges():
+    _prepare()
+
+    async def check(conn):
+        await partitions.create_partitions(conn, TODAY)
+        dropped = await partitions.drop_partitions_before(conn, TOMORROW_US)
+        assert sorted(dropped) == [
+            f"packet_seen_before{TOMORROW:%Y%m%d}",
+            f"traceroute_before{TOMORROW:%Y%m%d}",
+        ]
+        # The daily partition for tomorrow ends a day later and stays
+        assert await partitions.drop_partitions_before(conn, TOMORROW_US + HOUR_US) == []
+        assert await _placement(conn, "packet_seen", "rx_time") == [(300, "packet_seen_default")]
+
+    _run(check)
@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+from meshview import query_cache
+
+
+def _get(handler, etag=None):
+    headers = {"If-None-Match": f'"{etag}"'} if etag else {}
+    return asyncio.run(handler(make_mocked_request("GET", "/api/nodes", headers=headers)))
+
+
+def test_etag_matches_body_when_data_changes_within_ttl(monkeypatch):
+    async def unchanged_version():
+        return 1
+
+    monkeypatch.setattr(query_cache, "RESPONSES", query_cache.ResponseCache())
+    monkeypatch.setattr(query_cache.DATA_VERSION, "current", unchanged_version)
+
+    data = {"nodes": ["a"], "last_seen": 100}
+
+    async def watermark(request):
+        return data["last_seen"]
+
+    @query_cache.conditional(watermark, max_age=30)
+    @query_cache.cached(ttl=3600)
+    async def handler(request):
+        return web.json_response({"nodes": data["nodes"]})
+
+    first = _get(handler)
+    assert first.status == 200
+    assert json.loads(first.body) == {"nodes": ["a"]}
+    assert _get(handler, first.etag.value).status == 304
+
+    # A node changes while the first body is still within its TTL
+    data.update(nodes=["a", "b"], last_seen=200)
+
+    second = _get(handler, first.etag.value)
+    assert second.status == 200
+    assert second.etag != first.etag
+    assert json.loads(second.body) == {"nodes": ["a", "b"]}
+    assert _get(handler, second.etag.value).status == 304
+
+    # Without a validator the cached body is the current one too
+    third = _get(handler)
+    assert third.etag == second.etag
+    assert json.loads(third.body) == {"nodes": ["a", "b"]}